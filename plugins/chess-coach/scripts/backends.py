@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+backends.py — Evaluation backends: the built-in search or an external UCI engine.
+
+Library module (no CLI). Imported by review.py, coach.py and pgn_adapter.py
+(--engine) and by bench.py. A backend answers one question, the multi-PV
+query common.get_top_moves answers:
+
+    backend = get_backend(None)                 # built-in minimax (default)
+    backend = get_backend("stockfish", size=4)  # pool of 4 warm UCI processes
+    backend.top_moves(board, depth=12, n=3)     # [{"move", "score", "pv"}, ...]
+
+Scores are White-perspective centipawns, mates encoded as common.py does
+(±(MATE_SCORE - plies)), so callers cannot tell the backends apart.
+
+UciBackend keeps up to `size` engine processes alive between requests.
+A request checks one out (waiting at most `timeout` seconds), sends
+position + go, and checks it back in. A process is health-checked at
+checkout: it is replaced if it has exited, and pinged with isready if it
+has been idle longer than HEALTH_INTERVAL. A search that overruns
+`timeout` is sent stop; if the engine does not answer within STOP_GRACE
+it is killed and replaced, and EngineError is raised.
+
+Every backend records per-request latency; stats() reports it.
+"""
+
+import atexit
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common import MATE_SCORE, search_root
+
+import chess
+
+DEFAULT_TIMEOUT = 30.0    # seconds per request (checkout + search)
+HANDSHAKE_TIMEOUT = 10.0
+HEALTH_INTERVAL = 60.0    # ping processes idle longer than this before use
+STOP_GRACE      = 2.0     # seconds to wait for bestmove after stop
+LATENCY_SAMPLES = 1000
+
+
+class EngineError(Exception):
+    """The external engine failed, timed out or could not be started."""
+
+
+# ---------------------------------------------------------------------------
+# Latency bookkeeping
+# ---------------------------------------------------------------------------
+class _Stats:
+    def __init__(self):
+        self.latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {"requests": 0, "errors": 0}
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float | None) -> None:
+        with self.lock:
+            self.counters["requests"] += 1
+            if seconds is None:
+                self.counters["errors"] += 1
+            else:
+                self.latencies.append(seconds)
+
+    def report(self) -> dict:
+        with self.lock:
+            samples = sorted(self.latencies)
+            counters = dict(self.counters)
+
+        def pick(q: float) -> float | None:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+
+        return {**counters, "p50_ms": pick(0.50), "p99_ms": pick(0.99),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 1) if samples else None}
+
+
+# ---------------------------------------------------------------------------
+# Built-in search
+# ---------------------------------------------------------------------------
+class PythonBackend:
+    """common.py's minimax, in-process."""
+
+    name = "python"
+
+    def __init__(self):
+        self._stats = _Stats()
+
+    def top_moves(self, board: chess.Board, depth: int, n: int,
+                  moves: list[chess.Move] | None = None, tt: dict | None = None) -> list[dict]:
+        start = time.perf_counter()
+        lines = search_root(board.copy(), depth, moves, tt, n=max(n, 1))
+        lines.sort(key=lambda line: line[1], reverse=board.turn == chess.WHITE)
+        self._stats.record(time.perf_counter() - start)
+        return [{"move": m, "score": s, "pv": pv} for m, s, pv in lines[:max(n, 0)]]
+
+    def stats(self) -> dict:
+        return {"backend": self.name, **self._stats.report()}
+
+    def close(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# UCI engine processes
+# ---------------------------------------------------------------------------
+def uci_score(tokens: list[str], turn: chess.Color) -> int | None:
+    """`score cp X` / `score mate N` (mover's view) as a White-perspective common.py score."""
+    if "score" not in tokens:
+        return None
+    i = tokens.index("score")
+    kind, value = tokens[i + 1], int(tokens[i + 2])
+    if kind == "cp":
+        score = value
+    elif kind == "mate":
+        # mate N: mover mates in N moves (2N-1 plies); -N / 0: mover is mated in 2N plies
+        score = MATE_SCORE - (2 * value - 1) if value > 0 else -(MATE_SCORE + 2 * value)
+    else:
+        return None
+    return score if turn == chess.WHITE else -score
+
+
+def _parse_pv(board: chess.Board, ucis: list[str]) -> list[chess.Move]:
+    """Leading legal prefix of a pv (engines may print moves we cannot follow)."""
+    b, pv = board.copy(stack=False), []
+    for uci in ucis:
+        try:
+            move = chess.Move.from_uci(uci)
+        except ValueError:
+            break
+        if move not in b.legal_moves:
+            break
+        pv.append(move)
+        b.push(move)
+    return pv
+
+
+class UciProcess:
+    """One long-lived engine process. Not thread-safe: used by one request at a time."""
+
+    def __init__(self, command: list[str], options: dict | None = None):
+        self.command = command
+        try:
+            self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        except OSError as e:
+            raise EngineError(f"Cannot start engine {command[0]}: {e}") from e
+        self.lines: queue.Queue = queue.Queue()
+        threading.Thread(target=self._pump, daemon=True).start()
+        self.engine_options: set[str] = set()
+        self.multipv  = 1
+        self.last_used = time.monotonic()
+
+        self.send("uci")
+        for line in self.read_until("uciok", time.monotonic() + HANDSHAKE_TIMEOUT):
+            if line.startswith("option name "):
+                self.engine_options.add(line[12:].split(" type ")[0].strip().lower())
+        for name, value in (options or {}).items():
+            self.send(f"setoption name {name} value {value}")
+        self.ping(HANDSHAKE_TIMEOUT)
+
+    def _pump(self) -> None:
+        for line in self.proc.stdout:
+            self.lines.put(line.strip())
+        self.lines.put(None)   # EOF
+
+    def send(self, line: str) -> None:
+        try:
+            self.proc.stdin.write(line + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise EngineError(f"Engine exited: {e}") from e
+
+    def read_until(self, prefix: str, deadline: float) -> list[str]:
+        """Lines up to and including the first one starting with `prefix`."""
+        lines = []
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"No '{prefix}' from engine") from None
+            if line is None:
+                raise EngineError("Engine exited")
+            lines.append(line)
+            if line.startswith(prefix):
+                return lines
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def ping(self, timeout: float) -> None:
+        self.send("isready")
+        try:
+            self.read_until("readyok", time.monotonic() + timeout)
+        except TimeoutError as e:
+            raise EngineError(str(e)) from e
+
+    def analyse(self, board: chess.Board, depth: int | None, movetime: int | None,
+                n: int, moves: list[chess.Move] | None, timeout: float) -> list[dict]:
+        n = n if "multipv" in self.engine_options else 1
+        if n != self.multipv:
+            self.send(f"setoption name MultiPV value {n}")
+            self.multipv = n
+        root  = board.root()
+        stack = " ".join(m.uci() for m in board.move_stack)
+        self.send(f"position fen {root.fen()}" + (f" moves {stack}" if stack else ""))
+        go = f"go depth {depth}" if movetime is None else f"go movetime {movetime}"
+        if moves:
+            go += " searchmoves " + " ".join(m.uci() for m in moves)
+        self.send(go)
+
+        try:
+            output = self.read_until("bestmove", time.monotonic() + timeout)
+        except TimeoutError:
+            self.send("stop")
+            try:
+                output = self.read_until("bestmove", time.monotonic() + STOP_GRACE)
+            except TimeoutError:
+                raise EngineError(f"Engine did not answer within {timeout:g}s") from None
+        self.last_used = time.monotonic()
+
+        # Latest exact-score line per multipv slot
+        slots: dict[int, dict] = {}
+        for line in output:
+            tokens = line.split()
+            if tokens[:1] != ["info"] or "pv" not in tokens:
+                continue
+            if "lowerbound" in tokens or "upperbound" in tokens:
+                continue
+            score = uci_score(tokens, board.turn)
+            pv    = _parse_pv(board, tokens[tokens.index("pv") + 1:])
+            if score is None or not pv:
+                continue
+            slot = int(tokens[tokens.index("multipv") + 1]) if "multipv" in tokens else 1
+            slots[slot] = {"move": pv[0], "score": score, "pv": pv}
+        if not slots:
+            raise EngineError(f"Engine returned no scored lines: {output[-1]}")
+        return [slots[k] for k in sorted(slots)][:n]
+
+    def close(self) -> None:
+        if self.alive():
+            try:
+                self.send("quit")
+                self.proc.wait(timeout=1)
+            except (EngineError, subprocess.TimeoutExpired):
+                pass
+        if self.alive():
+            self.proc.kill()
+            self.proc.wait()
+
+
+class UciBackend:
+    """
+    A pool of up to `size` warm UCI processes.
+    depth / movetime (ms), when set, replace the depth callers ask for; a
+    built-in depth of 2 means little to a real engine.
+    """
+
+    def __init__(self, command: str | list[str], size: int = 1, timeout: float = DEFAULT_TIMEOUT,
+                 depth: int | None = None, movetime: int | None = None,
+                 options: dict | None = None):
+        self.command  = shlex.split(command) if isinstance(command, str) else list(command)
+        self.name     = f"uci:{os.path.basename(self.command[0])}"
+        self.size     = max(1, size)
+        self.timeout  = timeout
+        self.depth    = depth
+        self.movetime = movetime
+        self.options  = options or {}
+        self._idle: deque[UciProcess] = deque()
+        self._started = 0
+        self._cond    = threading.Condition()
+        self._stats   = _Stats()
+        self.restarts = 0
+        self._closed  = False
+
+    # -- Pool ----------------------------------------------------------------
+    def _checkout(self, deadline: float) -> UciProcess:
+        with self._cond:
+            while not self._idle and self._started >= self.size:
+                if self._closed or not self._cond.wait(max(0.0, deadline - time.monotonic())):
+                    raise EngineError("No engine process available")
+            if self._idle:
+                engine = self._idle.pop()   # most recently used: warmest caches
+            else:
+                engine = None
+                self._started += 1
+        if engine is None:
+            try:
+                return UciProcess(self.command, self.options)
+            except Exception:
+                self._discard(None)
+                raise
+        return self._healthy(engine)
+
+    def _healthy(self, engine: UciProcess) -> UciProcess:
+        """The engine itself, or a fresh replacement if it died or stopped answering."""
+        try:
+            if not engine.alive():
+                raise EngineError("Engine exited")
+            if time.monotonic() - engine.last_used > HEALTH_INTERVAL:
+                engine.ping(HANDSHAKE_TIMEOUT)
+                engine.last_used = time.monotonic()
+            return engine
+        except EngineError:
+            engine.close()
+            self.restarts += 1
+            try:
+                return UciProcess(self.command, self.options)
+            except Exception:
+                self._discard(None)
+                raise
+
+    def _checkin(self, engine: UciProcess) -> None:
+        with self._cond:
+            if self._closed:
+                engine.close()
+                self._started -= 1
+            else:
+                self._idle.append(engine)
+            self._cond.notify()
+
+    def _discard(self, engine: UciProcess | None) -> None:
+        if engine is not None:
+            engine.close()
+            self.restarts += 1
+        with self._cond:
+            self._started -= 1
+            self._cond.notify()
+
+    # -- Queries -------------------------------------------------------------
+    def top_moves(self, board: chess.Board, depth: int, n: int,
+                  moves: list[chess.Move] | None = None, tt: dict | None = None) -> list[dict]:
+        start    = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        try:
+            engine = self._checkout(deadline)
+        except EngineError:
+            self._stats.record(None)
+            raise
+        try:
+            lines = engine.analyse(board, self.depth or depth, self.movetime, n, moves,
+                                   max(0.1, deadline - time.monotonic()))
+        except Exception as e:
+            # Timed out, died or printed something unparseable: never pool it again
+            self._discard(engine)
+            self._stats.record(None)
+            if isinstance(e, EngineError):
+                raise
+            raise EngineError(f"Unreadable engine output: {e}") from e
+        self._checkin(engine)
+        self._stats.record(time.perf_counter() - start)
+        return lines
+
+    def stats(self) -> dict:
+        with self._cond:
+            pool = {"size": self.size, "running": self._started, "idle": len(self._idle)}
+        return {"backend": self.name, **self._stats.report(), "restarts": self.restarts, **pool}
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._started -= len(idle)
+            self._cond.notify_all()
+        for engine in idle:
+            engine.close()
+
+
+# ---------------------------------------------------------------------------
+# Shared instances
+# ---------------------------------------------------------------------------
+_BACKENDS: dict[str, PythonBackend | UciBackend] = {}
+_BACKENDS_LOCK = threading.Lock()
+
+
+def get_backend(engine: str | None = None, size: int = 1, **options) -> PythonBackend | UciBackend:
+    """
+    The process-wide backend for an --engine value: None or "python" is the
+    built-in search, anything else a UCI engine command line. Repeated
+    calls share one warm pool (grown to the largest `size` asked for).
+    """
+    key = engine or "python"
+    with _BACKENDS_LOCK:
+        backend = _BACKENDS.get(key)
+        if backend is None:
+            backend = PythonBackend() if key == "python" else UciBackend(key, size, **options)
+            _BACKENDS[key] = backend
+        elif isinstance(backend, UciBackend):
+            backend.size = max(backend.size, size)
+        return backend
+
+
+@atexit.register
+def close_backends() -> None:
+    with _BACKENDS_LOCK:
+        for backend in _BACKENDS.values():
+            backend.close()
+        _BACKENDS.clear()
@@ -0,0 +1,704 @@
+#!/usr/bin/env python3
+"""
+bench.py — Performance benchmarks for the chess-coach engine.
+
+Commands:
+  mate     [--checks-only] [--node-limit N]   Solve time on the mate-in-3/4 set
+  bitbase  [--probes N] [--generate TABLES]    Probe throughput (and generation time)
+  explorer [--games N] [--lookups N]           Explorer index build rate and lookup latency
+  profile  [--procs N] [--updates N]           profile.py update throughput under lock contention
+  store    [--users N] [--procs N] [--ops N]   Multi-user profile store read/write mix, bulk recommend
+  sessions [--games N] [--plies N] [--hot N]   In-process hosting: AI-vs-AI games through SessionManager
+  server   [--games N] [--plies N] [--workers N]
+                                               Load test: concurrent games against server.py over HTTP,
+                                               p50/p99 move and ai_move latency
+  backends [--engine CMD] [--positions N] [--depth D] [--engine-depth D] [--threads N]
+                                               Per-backend analysis latency: built-in search vs. a
+                                               pooled UCI engine on the same positions
+  search   [--positions N] [--depth D] [--terms T,...]
+                                               Search nps, static-eval cost per leaf and
+                                               pawn-hash hit rate on fixed random positions,
+                                               with only the listed eval terms switched on
+  perft    [--depth D]                         Move generation + make/unmake: SearchBoard vs. chess.Board
+                                               on the standard perft positions (leaf counts must agree)
+  uci      [--base MS] [--inc MS] [--plies N] [--persona ID]
+                                               uci.py self-play under a real clock: nps, time used
+                                               per move vs. the clock, flag falls
+
+All output: JSON to stdout.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mate import MateSolver
+import bitbase
+import explorer
+import profile as player_profile
+import profile_store
+from sessions import SessionManager
+from backends import get_backend
+from searchboard import SearchBoard, perft
+from common import evaluate, static_eval, eval_terms, search_root, SearchControl, PAWN_HASH, pawn_hash_stats, \
+    EVAL_SWITCHES
+
+import chess
+
+# ---------------------------------------------------------------------------
+# Mate test set: (FEN, mate length in moves)
+# ---------------------------------------------------------------------------
+MATE_SET: list[tuple[str, int]] = [
+    ("1k6/8/3K4/4Q3/8/8/8/8 w - - 0 1",                 3),
+    ("8/8/3Q4/8/8/4K3/6k1/8 w - - 0 1",                 3),
+    ("8/k7/2K5/8/8/8/2R5/8 w - - 0 1",                  3),
+    ("8/8/6Q1/1k6/8/2K5/8/8 w - - 0 1",                 3),
+    ("r6k/6pp/8/6N1/2Q5/8/5PPP/6K1 w - - 0 1",          4),   # Philidor's legacy
+    ("8/8/8/8/K1R5/8/k7/8 w - - 0 1",                   4),
+    ("8/8/6K1/8/8/8/1Q6/3k4 w - - 0 1",                 4),
+    ("5Q2/8/3K4/1k6/8/8/8/8 w - - 0 1",                 4),
+    ("4Q3/8/8/8/5k2/8/5K2/8 w - - 0 1",                 4),
+]
+
+
+def cmd_mate(args) -> dict:
+    results = []
+    total_time  = 0.0
+    total_nodes = 0
+    solved      = 0
+    for fen, expected in MATE_SET:
+        board  = chess.Board(fen)
+        solver = MateSolver(checks_only=args.checks_only, node_limit=args.node_limit)
+        start  = time.perf_counter()
+        line   = solver.solve(board, expected)
+        elapsed = time.perf_counter() - start
+        found  = (len(line) + 1) // 2 if line else None
+        solved += found == expected
+        total_time  += elapsed
+        total_nodes += solver.nodes
+        results.append({
+            "fen":      fen,
+            "expected": expected,
+            "found":    found,
+            "nodes":    solver.nodes,
+            "time_ms":  round(elapsed * 1000, 1),
+        })
+    return {
+        "ok":          True,
+        "checks_only": args.checks_only,
+        "solved":      solved,
+        "positions":   len(MATE_SET),
+        "total_ms":    round(total_time * 1000, 1),
+        "nodes":       total_nodes,
+        "nps":         int(total_nodes / total_time) if total_time else 0,
+        "results":     results,
+    }
+
+
+def _random_endgames(count: int, seed: int = 0) -> list[chess.Board]:
+    """Random legal KPK/KRK/KQK positions (either side strong, either to move)."""
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        board = chess.Board(None)
+        strong = rng.choice(chess.COLORS)
+        squares = rng.sample(chess.SQUARES, 3)
+        board.set_piece_at(squares[0], chess.Piece(chess.KING, strong))
+        board.set_piece_at(squares[1], chess.Piece(chess.KING, not strong))
+        board.set_piece_at(squares[2], chess.Piece(
+            rng.choice([chess.PAWN, chess.ROOK, chess.QUEEN]), strong))
+        board.turn = rng.choice(chess.COLORS)
+        if board.is_valid():
+            boards.append(board)
+    return boards
+
+
+def cmd_bitbase(args) -> dict:
+    result: dict = {"ok": True}
+
+    if args.generate:
+        with tempfile.TemporaryDirectory(prefix="bitbase_") as tmp:
+            lookup: dict = {}
+            tables = []
+            for name in args.generate.split(","):
+                tables.append(bitbase.generate(name.strip(), tmp, lookup))
+                lookup[name.strip()] = bitbase.open_bitbase(name.strip(), [tmp])
+            for t in tables:
+                t.pop("path")
+            result["generation"] = tables
+
+    boards = _random_endgames(args.probes)
+    covered = sum(bitbase.probe(b) is not None for b in boards)   # also warms the mmap cache
+    if not covered:
+        return {"ok": False, "error": "No bitbase files found; run bitbase.py generate first."}
+
+    start = time.perf_counter()
+    for b in boards:
+        bitbase.probe(b)
+    probe_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for b in boards:
+        evaluate(b)
+    eval_time = time.perf_counter() - start
+
+    result.update({
+        "probes":            len(boards),
+        "covered":           covered,
+        "probes_per_sec":    int(len(boards) / probe_time),
+        "us_per_probe":      round(probe_time / len(boards) * 1e6, 2),
+        "evals_per_sec":     int(len(boards) / eval_time),
+    })
+    return result
+
+
+def _random_game(rng: random.Random, plies: int) -> dict:
+    board = chess.Board()
+    moves = []
+    for _ in range(plies):
+        legal = list(board.legal_moves)
+        if not legal:
+            break
+        move = rng.choice(legal)
+        moves.append(move.uci())
+        board.push(move)
+    return {"moves_uci": moves, "result": rng.choice(["1-0", "0-1", "1/2-1/2"]),
+            "players": {"white": f"p{rng.randrange(20)}", "black": f"p{rng.randrange(20)}"}}
+
+
+def cmd_explorer(args) -> dict:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory(prefix="explorer_") as tmp:
+        conn = explorer.connect(os.path.join(tmp, "explorer.db"))
+        games = [_random_game(rng, explorer.EXPLORER_PLIES) for _ in range(args.games)]
+
+        start = time.perf_counter()
+        for g in games:
+            explorer.index_game(conn, g)
+        index_time = time.perf_counter() - start
+        rows = conn.execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+
+        # Probe positions that are in the index, a few plies deep
+        boards = []
+        for g in rng.sample(games, min(args.lookups, len(games))):
+            board = chess.Board()
+            for uci in g["moves_uci"][:rng.randrange(1, 12)]:
+                board.push_uci(uci)
+            boards.append(board)
+        start = time.perf_counter()
+        for b in boards:
+            explorer.explore(conn, b)
+        lookup_time = time.perf_counter() - start
+
+    return {
+        "ok":             True,
+        "games":          len(games),
+        "rows":           rows,
+        "games_per_sec":  int(len(games) / index_time),
+        "lookups":        len(boards),
+        "ms_per_lookup":  round(lookup_time / len(boards) * 1000, 3),
+    }
+
+
+def _update_worker(job: tuple[str, int]) -> None:
+    tmp, updates = job
+    args = argparse.Namespace(
+        state=os.path.join(tmp, "game.json"), profile=os.path.join(tmp, "profile.json"),
+        games_dir=os.path.join(tmp, "games"), explorer_db=os.path.join(tmp, "explorer.db"),
+        user=None, store=None)
+    for _ in range(updates):
+        if not player_profile.cmd_update(args)["ok"]:
+            raise RuntimeError("update failed")
+
+
+def cmd_profile(args) -> dict:
+    """Many processes finishing games at once against one profile and archive."""
+    game = _random_game(random.Random(0), 40)
+    board = chess.Board()
+    game["color"], game["move_records"] = "white", []
+    for uci in game["moves_uci"]:
+        before = evaluate(board)
+        board.push_uci(uci)
+        game["move_records"].append({"player": "black" if board.turn else "white",
+                                     "score_before_cp": before, "score_after_cp": evaluate(board)})
+
+    with tempfile.TemporaryDirectory(prefix="profile_") as tmp:
+        with open(os.path.join(tmp, "game.json"), "w") as f:
+            json.dump(game, f)
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.procs) as pool:
+            pool.map(_update_worker, [(tmp, args.updates)] * args.procs)
+        elapsed = time.perf_counter() - start
+        played   = player_profile.load_profile(os.path.join(tmp, "profile.json"))["games_played"]
+        archived = len(os.listdir(os.path.join(tmp, "games")))
+
+    expected = args.procs * args.updates
+    return {
+        "ok":               played == expected == archived,
+        "procs":            args.procs,
+        "updates":          expected,
+        "games_played":     played,
+        "archived":         archived,
+        "lost_updates":     expected - played,
+        "updates_per_sec":  int(expected / elapsed),
+    }
+
+
+def _store_worker(job: tuple[str, int, int, int]) -> tuple[int, int]:
+    """Mixed load: one write (append an ELO) per ten reads, over random users."""
+    path, users, ops, seed = job
+    rng  = random.Random(seed)
+    conn = profile_store.connect(path)
+    writes = 0
+    for i in range(ops):
+        user = f"u{rng.randrange(users)}"
+        if i % 10 == 0:
+            with profile_store.transaction(conn):
+                profile = profile_store.load(conn, user) or player_profile.new_profile()
+                profile["games_played"] += 1
+                profile["elo_history"].append(rng.randrange(600, 2000))
+                profile_store.save(conn, user, profile)
+            writes += 1
+        else:
+            profile_store.load(conn, user)
+    return ops - writes, writes
+
+
+def cmd_store(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="store_") as tmp:
+        path = os.path.join(tmp, "profiles.db")
+        conn = profile_store.connect(path)
+        with profile_store.transaction(conn):
+            for u in range(args.users):
+                profile_store.save(conn, f"u{u}", player_profile.new_profile())
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.procs) as pool:
+            counts = pool.map(_store_worker, [(path, args.users, args.ops, seed)
+                                              for seed in range(args.procs)])
+        elapsed = time.perf_counter() - start
+        reads  = sum(r for r, _ in counts)
+        writes = sum(w for _, w in counts)
+        played = conn.execute("SELECT SUM(games_played) FROM players").fetchone()[0]
+
+        users = [f"u{u}" for u in range(args.users)]
+        start = time.perf_counter()
+        found = profile_store.load_many(conn, users)
+        bulk_time = time.perf_counter() - start
+
+    return {
+        "ok":              played == writes and len(found) == args.users,
+        "users":           args.users,
+        "procs":           args.procs,
+        "reads_per_sec":   int(reads / elapsed),
+        "writes_per_sec":  int(writes / elapsed),
+        "lost_writes":     writes - played,
+        "bulk_load_ms":    round(bulk_time * 1000, 1),
+    }
+
+
+def cmd_sessions(args) -> dict:
+    """Many concurrent AI-vs-AI games, one thread per game, sharing one manager."""
+    with tempfile.TemporaryDirectory(prefix="sessions_") as tmp:
+        with SessionManager(tmp, max_hot=args.hot, workers=args.workers) as mgr:
+            def play(game_id: str) -> None:
+                mgr.run(game_id, "new_game", level="beginner")
+                for _ in range(args.plies):
+                    if not mgr.run(game_id, "ai_move")["ok"]:
+                        break
+
+            threads = [threading.Thread(target=play, args=(f"g{i}",)) for i in range(args.games)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            moves = sum(mgr.run(f"g{i}", "status")["move_count"] for i in range(args.games))
+            stats = mgr.stats()
+
+    return {
+        "ok":             True,
+        "games":          args.games,
+        "moves":          moves,
+        "moves_per_sec":  round(moves / elapsed, 1),
+        **stats,
+    }
+
+
+async def _http(reader, writer, method: str, path: str, body: dict | None = None) -> dict:
+    """One keep-alive JSON request to server.py."""
+    payload = json.dumps(body or {}).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+    await writer.drain()
+    await reader.readline()                          # status line
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+async def _server_game(port: int, plies: int, seed: int, latencies: dict) -> int:
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    game = await _http(reader, writer, "POST", "/games", {"level": "beginner"})
+    path = f"/games/{game['game_id']}"
+    board, played = chess.Board(), 0
+    for _ in range(plies // 2):
+        move = rng.choice(list(board.legal_moves))
+        for command, body in (("move", {"move": move.uci()}), ("ai_move", {})):
+            start = time.perf_counter()
+            result = await _http(reader, writer, "POST", f"{path}/{command}", body)
+            latencies[command].append(time.perf_counter() - start)
+            if not result["ok"]:
+                raise RuntimeError(result["error"])
+            board.push_uci(result["move_uci"])
+            played += 1
+            if board.is_game_over():
+                break
+        if board.is_game_over():
+            break
+    writer.close()
+    return played
+
+
+def _percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+
+    return {"count": len(samples), "p50_ms": pick(0.50), "p99_ms": pick(0.99),
+            "max_ms": round(samples[-1] * 1000, 1)}
+
+
+def cmd_server(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="server_") as tmp:
+        cmd = [sys.executable, os.path.join(os.path.dirname(__file__), "server.py"),
+               "--port", "0", "--spill-dir", tmp, "--hot", str(args.hot)]
+        if args.workers is not None:
+            cmd += ["--workers", str(args.workers)]
+        server = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        try:
+            port = json.loads(server.stdout.readline())["port"]
+            latencies: dict[str, list[float]] = {"move": [], "ai_move": []}
+
+            async def run_all():
+                return await asyncio.gather(*(_server_game(port, args.plies, seed, latencies)
+                                              for seed in range(args.games)))
+
+            start = time.perf_counter()
+            plies = sum(asyncio.run(run_all()))
+            elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    return {
+        "ok":            True,
+        "games":         args.games,
+        "plies":         plies,
+        "requests_per_sec": round((len(latencies["move"]) + len(latencies["ai_move"])) / elapsed, 1),
+        "move":          _percentiles(latencies["move"]),
+        "ai_move":       _percentiles(latencies["ai_move"]),
+    }
+
+
+def _random_positions(count: int, min_plies: int = 4, max_plies: int = 40) -> list[chess.Board]:
+    rng    = random.Random(0)
+    boards = []
+    while len(boards) < count:
+        board = chess.Board()
+        for uci in _random_game(rng, rng.randrange(min_plies, max_plies))["moves_uci"]:
+            board.push_uci(uci)
+        if not board.is_game_over():
+            boards.append(board)
+    return boards
+
+
+def cmd_backends(args) -> dict:
+    boards = _random_positions(args.positions)
+
+    result = {"ok": True, "positions": len(boards)}
+    runs = [("python", get_backend(), args.depth)]
+    if args.engine:
+        runs.append(("engine", get_backend(args.engine, size=args.threads), args.engine_depth))
+    for label, backend, depth in runs:
+        backend.top_moves(boards[0], depth, 1)   # warm-up: process start, handshake
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(lambda b: backend.top_moves(b, depth, 1), boards))
+        elapsed = time.perf_counter() - start
+        result[label] = {**backend.stats(), "depth": depth,
+                         "positions_per_sec": round(len(boards) / elapsed, 1)}
+    return result
+
+
+def cmd_search(args) -> dict:
+    terms = [t for t in args.terms.split(",") if t] if args.terms is not None else list(EVAL_SWITCHES)
+    unknown = set(terms) - set(EVAL_SWITCHES)
+    if unknown:
+        return {"ok": False, "error": f"Unknown eval terms: {', '.join(sorted(unknown))}"}
+    for term in EVAL_SWITCHES:
+        EVAL_SWITCHES[term] = term in terms
+
+    boards = _random_positions(args.positions, 6, 60)
+    PAWN_HASH.clear()
+    pawn_hash_stats.update(hits=0, misses=0)
+    ctl    = SearchControl()
+    start  = time.perf_counter()
+    for board in boards:
+        search_root(board.copy(), args.depth, tt={}, ctl=ctl)
+    elapsed = time.perf_counter() - start
+    probes  = pawn_hash_stats["hits"] + pawn_hash_stats["misses"]
+    hit_rate = pawn_hash_stats["hits"] / probes if probes else 0.0
+
+    # Static eval: evaluate() from scratch, and as a search leaf (static_eval
+    # with incremental terms) with the pawn hash warm and cold
+    reps  = max(1, 2000 // len(boards))
+    leaf  = [eval_terms(b) for b in boards]
+    runs  = {
+        "evaluate_us":      lambda: [evaluate(b) for b in boards],
+        "eval_terms_us":    lambda: [eval_terms(b) for b in boards],
+        "leaf_hit_us":      lambda: [static_eval(b, t) for b, t in zip(boards, leaf)],
+        "leaf_miss_us":     lambda: [(PAWN_HASH.clear(), static_eval(b, t)) for b, t in zip(boards, leaf)],
+    }
+    timings = {}
+    for label, run in runs.items():
+        start = time.perf_counter()
+        for _ in range(reps):
+            run()
+        timings[label] = round((time.perf_counter() - start) / (reps * len(boards)) * 1e6, 1)
+    return {
+        "ok":            True,
+        "positions":     len(boards),
+        "depth":         args.depth,
+        "terms":         terms,
+        "nodes":         ctl.nodes,
+        "seconds":       round(elapsed, 2),
+        "nps":           round(ctl.nodes / elapsed),
+        "pawn_hash":     {"probes": probes, "hit_rate": round(hit_rate, 4)},
+        **timings,
+    }
+
+
+PERFT_FENS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+]
+
+
+def _board_perft(board: chess.Board, depth: int) -> int:
+    """perft with chess.Board, making every move as the search used to (no bulk leaf counting)."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += _board_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def cmd_perft(args) -> dict:
+    result = {"ok": True, "depth": args.depth}
+    counts = {}
+    for label, run in (("searchboard", lambda fen: perft(SearchBoard(chess.Board(fen)), args.depth)),
+                       ("chess_board", lambda fen: _board_perft(chess.Board(fen), args.depth))):
+        start = time.perf_counter()
+        counts[label] = [run(fen) for fen in PERFT_FENS]
+        elapsed = time.perf_counter() - start
+        result[label] = {"leaves": sum(counts[label]), "seconds": round(elapsed, 2),
+                         "leaves_per_sec": round(sum(counts[label]) / elapsed)}
+    result["counts_agree"] = counts["searchboard"] == counts["chess_board"]
+
+    # make/unmake of every pseudo-legal move, both boards
+    board  = chess.Board(PERFT_FENS[1])
+    search = SearchBoard(board)
+    moves  = search.pseudo_legal_moves()
+    board_moves = list(board.pseudo_legal_moves)
+    reps   = 2000
+    start  = time.perf_counter()
+    for _ in range(reps):
+        for move in moves:
+            search.push(move)
+            search.pop()
+    result["searchboard"]["push_pop_us"] = round((time.perf_counter() - start) / (reps * len(moves)) * 1e6, 2)
+    start  = time.perf_counter()
+    for _ in range(reps):
+        for move in board_moves:
+            board.push(move)
+            board.pop()
+    result["chess_board"]["push_pop_us"] = round((time.perf_counter() - start) / (reps * len(board_moves)) * 1e6, 2)
+    return result
+
+
+def _uci_go(proc, board: chess.Board, clocks: dict, inc: int) -> tuple[str, float, dict]:
+    """Send position + go with the current clocks; returns (bestmove, seconds, last info)."""
+    moves = " ".join(m.uci() for m in board.move_stack)
+    proc.stdin.write(f"position startpos moves {moves}\n" if moves else "position startpos\n")
+    proc.stdin.write(f"go wtime {clocks[chess.WHITE]} btime {clocks[chess.BLACK]} "
+                     f"winc {inc} binc {inc}\n")
+    proc.stdin.flush()
+    start, info = time.perf_counter(), {}
+    while True:
+        line = proc.stdout.readline().split()
+        if line[:1] == ["info"] and "nps" in line:
+            info = {"depth": int(line[line.index("depth") + 1]),
+                    "nodes": int(line[line.index("nodes") + 1]),
+                    "nps":   int(line[line.index("nps") + 1])}
+        elif line[:1] == ["bestmove"]:
+            return line[1], time.perf_counter() - start, info
+
+
+def cmd_uci(args) -> dict:
+    proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), "uci.py")],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+    if args.persona:
+        proc.stdin.write(f"setoption name Persona value {args.persona}\n")
+    proc.stdin.write("ucinewgame\n")
+    board  = chess.Board()
+    clocks = {chess.WHITE: args.base, chess.BLACK: args.base}
+    used, nps, depths, flags = [], [], [], 0
+    try:
+        while len(board.move_stack) < args.plies and not board.is_game_over():
+            turn = board.turn
+            share = 1 / 30 * clocks[turn] + 0.75 * args.inc   # uci.py's nominal budget, for comparison
+            best, seconds, info = _uci_go(proc, board, clocks, args.inc)
+            clocks[turn] -= int(seconds * 1000)
+            if clocks[turn] < 0:
+                flags += 1
+                clocks[turn] = 0
+            clocks[turn] += args.inc
+            board.push_uci(best)
+            used.append(round(seconds * 1000 / share, 2) if share else 0)
+            if info:
+                nps.append(info["nps"])
+                depths.append(info["depth"])
+        proc.stdin.write("quit\n")
+        proc.stdin.flush()
+    finally:
+        proc.wait(timeout=30)
+
+    return {
+        "ok":             True,
+        "plies":          len(board.move_stack),
+        "time_control":   f"{args.base / 1000:g}+{args.inc / 1000:g}",
+        "nps_median":     sorted(nps)[len(nps) // 2] if nps else 0,
+        "depth_avg":      round(sum(depths) / len(depths), 2) if depths else 0,
+        "budget_used":    {"median": sorted(used)[len(used) // 2], "max": max(used)} if used else {},
+        "flag_falls":     flags,
+        "clock_left_ms":  {"white": clocks[chess.WHITE], "black": clocks[chess.BLACK]},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+def main():
+    p = argparse.ArgumentParser(description="Engine benchmarks")
+    sub = p.add_subparsers(dest="command")
+
+    mt = sub.add_parser("mate")
+    mt.add_argument("--checks-only", action="store_true",
+                    help="Restrict the mating side to checks")
+    mt.add_argument("--node-limit",  type=int, default=None)
+
+    bb = sub.add_parser("bitbase")
+    bb.add_argument("--probes",   type=int, default=20000)
+    bb.add_argument("--generate", default=None,
+                    help="Also time generation of these tables, e.g. kqk,krk,kpk")
+
+    ex = sub.add_parser("explorer")
+    ex.add_argument("--games",   type=int, default=5000)
+    ex.add_argument("--lookups", type=int, default=2000)
+
+    pf = sub.add_parser("profile")
+    pf.add_argument("--procs",   type=int, default=8)
+    pf.add_argument("--updates", type=int, default=25,
+                    help="Updates per process")
+
+    st = sub.add_parser("store")
+    st.add_argument("--users", type=int, default=5000)
+    st.add_argument("--procs", type=int, default=8)
+    st.add_argument("--ops",   type=int, default=2000,
+                    help="Operations per process (1 write per 10)")
+
+    ss = sub.add_parser("sessions")
+    ss.add_argument("--games",   type=int, default=32)
+    ss.add_argument("--plies",   type=int, default=10)
+    ss.add_argument("--hot",     type=int, default=8,
+                    help="Sessions kept in memory (the rest spill to disk)")
+    ss.add_argument("--workers", type=int, default=None,
+                    help="Search processes (default: CPU count; 0 = search in-thread)")
+
+    sv = sub.add_parser("server")
+    sv.add_argument("--games",   type=int, default=128)
+    sv.add_argument("--plies",   type=int, default=10)
+    sv.add_argument("--hot",     type=int, default=256)
+    sv.add_argument("--workers", type=int, default=None,
+                    help="Server search processes (default: CPU count)")
+
+    be = sub.add_parser("backends")
+    be.add_argument("--engine",       default=None, help="UCI engine command to compare")
+    be.add_argument("--positions",    type=int, default=50)
+    be.add_argument("--depth",        type=int, default=2, help="Built-in search depth")
+    be.add_argument("--engine-depth", type=int, default=12)
+    be.add_argument("--threads",      type=int, default=1,
+                    help="Concurrent requests (= engine processes in the pool)")
+
+    se = sub.add_parser("search")
+    se.add_argument("--positions", type=int, default=12)
+    se.add_argument("--depth",     type=int, default=3)
+    se.add_argument("--terms",     default=None,
+                    help="Comma-separated eval terms to keep on (default: all; '' = none)")
+
+    pt = sub.add_parser("perft")
+    pt.add_argument("--depth", type=int, default=3)
+
+    uc = sub.add_parser("uci")
+    uc.add_argument("--base",    type=int, default=10000, help="Clock per side (ms)")
+    uc.add_argument("--inc",     type=int, default=100,   help="Increment per move (ms)")
+    uc.add_argument("--plies",   type=int, default=40)
+    uc.add_argument("--persona", default=None)
+
+    args = p.parse_args()
+    if not args.command:
+        p.print_help()
+        sys.exit(1)
+
+    dispatch = {
+        "mate":     cmd_mate,
+        "bitbase":  cmd_bitbase,
+        "explorer": cmd_explorer,
+        "profile":  cmd_profile,
+        "store":    cmd_store,
+        "sessions": cmd_sessions,
+        "server":   cmd_server,
+        "backends": cmd_backends,
+        "search":   cmd_search,
+        "perft":    cmd_perft,
+        "uci":      cmd_uci,
+    }
+    result = dispatch[args.command](args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
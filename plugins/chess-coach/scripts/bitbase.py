@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+bitbase.py — Win/draw endgame bitbases (KPK, KRK, KQK, KBNK).
+
+Commands:
+  generate  [--tables kqk,krk,kpk] [--output-dir DIR]   Build bitbase files
+  probe     --fen FEN                                  Look up a position
+
+All output: JSON to stdout.
+
+Also imported by common.py (probe) and bench.py.
+
+Tables are normalised so the side with the extra material is White. One
+bit per position: 1 = the strong side wins, 0 = draw (or illegal). The bare
+king can never win, so the bit is the full game-theoretic result.
+
+Index layout (most significant first):
+  side to move (0 = strong side, 1 = bare king) | strong king | bare king | pieces...
+with 6 bits per square, so a 3-piece table holds 2 * 64^3 positions.
+
+Generation is retrograde: checkmates (and, for KPK, winning promotions into
+the KQK/KRK tables) seed a queue; un-moving from each won position marks
+strong-side predecessors as won and counts down the bare king's escapes.
+
+File format: 16-byte header (b"CCBB", table name padded to 8 bytes, uint32
+position count) followed by the bit-packed results. Files are memory-mapped,
+so a probe is a single byte read.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import deque
+
+import chess
+
+TABLES: dict[str, tuple[int, ...]] = {
+    "kpk":  (chess.PAWN,),
+    "krk":  (chess.ROOK,),
+    "kqk":  (chess.QUEEN,),
+    "kbnk": (chess.BISHOP, chess.KNIGHT),
+}
+# KPK promotes into these, so they must be generated first
+DEPENDENCIES = {"kpk": ("kqk", "krk")}
+
+BUNDLED_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data", "bitbases"))
+USER_DIR    = os.path.expanduser("~/.chess_coach/bitbases")
+
+MAGIC       = b"CCBB"
+HEADER      = struct.Struct("<4s8sI")
+HEADER_SIZE = HEADER.size
+
+
+# ---------------------------------------------------------------------------
+# Attack helpers (strong side only; the bare king is handled separately)
+# ---------------------------------------------------------------------------
+def _piece_attacks(piece_type: int, square: int, occupied: int) -> int:
+    if piece_type == chess.PAWN:
+        return chess.BB_PAWN_ATTACKS[chess.WHITE][square]
+    if piece_type == chess.KNIGHT:
+        return chess.BB_KNIGHT_ATTACKS[square]
+    if piece_type == chess.KING:
+        return chess.BB_KING_ATTACKS[square]
+    mask = 0
+    if piece_type in (chess.BISHOP, chess.QUEEN):
+        mask |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    if piece_type in (chess.ROOK, chess.QUEEN):
+        mask |= (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                 | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    return mask
+
+
+def _strong_attacks(wk: int, pieces: tuple[int, ...], squares: list[int], occupied: int) -> int:
+    mask = chess.BB_KING_ATTACKS[wk]
+    for pt, sq in zip(pieces, squares):
+        mask |= _piece_attacks(pt, sq, occupied)
+    return mask
+
+
+# ---------------------------------------------------------------------------
+# Generator
+# ---------------------------------------------------------------------------
+class _Generator:
+    def __init__(self, name: str, lookup: dict[str, "Bitbase"]):
+        self.name   = name
+        self.pieces = TABLES[name]
+        self.k      = len(self.pieces)
+        self.shift  = 6 * (2 + self.k)          # position of the side-to-move bit
+        self.size   = 2 << self.shift
+        self.lookup = lookup
+
+    def encode(self, stm: int, wk: int, bk: int, squares: list[int]) -> int:
+        idx = (stm << 6 | wk) << 6 | bk
+        for sq in squares:
+            idx = idx << 6 | sq
+        return idx
+
+    def decode(self, idx: int) -> tuple[int, int, int, list[int]]:
+        squares = [0] * self.k
+        for i in range(self.k - 1, -1, -1):
+            squares[i] = idx & 63
+            idx >>= 6
+        bk = idx & 63
+        idx >>= 6
+        return idx >> 6, idx & 63, bk, squares
+
+    def legal(self, stm: int, wk: int, bk: int, squares: list[int]) -> bool:
+        occupied = chess.BB_SQUARES[wk] | chess.BB_SQUARES[bk]
+        for pt, sq in zip(self.pieces, squares):
+            bit = chess.BB_SQUARES[sq]
+            if occupied & bit:
+                return False
+            if pt == chess.PAWN and bit & chess.BB_BACKRANKS:
+                return False
+            occupied |= bit
+        if chess.BB_KING_ATTACKS[wk] & chess.BB_SQUARES[bk]:
+            return False
+        if stm == 0 and _strong_attacks(wk, self.pieces, squares, occupied) & chess.BB_SQUARES[bk]:
+            return False   # bare king in check with the strong side to move
+        return True
+
+    def _bare_king_moves(self, wk, bk, squares) -> tuple[int, bool, bool]:
+        """(quiet legal moves, has a legal capture, in check) for the bare king."""
+        occupied = chess.BB_SQUARES[wk]
+        for sq in squares:
+            occupied |= chess.BB_SQUARES[sq]
+        in_check = bool(_strong_attacks(wk, self.pieces, squares, occupied) & chess.BB_SQUARES[bk])
+        quiet, capture = 0, False
+        for to in chess.scan_forward(chess.BB_KING_ATTACKS[bk] & ~chess.BB_SQUARES[wk]):
+            if to in squares:
+                # Capture: the captured piece no longer attacks
+                rest_p = [p for p, s in zip(self.pieces, squares) if s != to]
+                rest_s = [s for s in squares if s != to]
+                occ = occupied & ~chess.BB_SQUARES[to]
+                if not _strong_attacks(wk, tuple(rest_p), rest_s, occ) & chess.BB_SQUARES[to]:
+                    capture = True
+            elif not _strong_attacks(wk, self.pieces, squares, occupied) & chess.BB_SQUARES[to]:
+                quiet += 1
+        return quiet, capture, in_check
+
+    def _promotion_wins(self, wk, bk, squares) -> bool:
+        """KPK only: does a promotion reach a won KQK/KRK position?"""
+        pawn = squares[0]
+        to = pawn + 8
+        if to > 63 or to in (wk, bk):
+            return False
+        for name in ("kqk", "krk"):
+            table = self.lookup[name]
+            idx = (((1 << 6 | wk) << 6 | bk) << 6) | to
+            if table.bit(idx):
+                return True
+        return False
+
+    def run(self) -> bytearray:
+        size, half = self.size, self.size // 2
+        won    = bytearray(size)
+        counts = bytearray(half)      # remaining non-losing moves, bare king to move
+        queue: deque[int] = deque()
+
+        # Seed: checkmates (bare king to move) and winning promotions
+        for idx in range(half, size):
+            stm, wk, bk, squares = self.decode(idx)
+            if not self.legal(stm, wk, bk, squares):
+                continue
+            quiet, capture, in_check = self._bare_king_moves(wk, bk, squares)
+            if quiet == 0 and not capture:
+                if in_check:
+                    won[idx] = 1
+                    queue.append(idx)
+                continue
+            # A safe capture always draws, so it can never be counted down
+            counts[idx - half] = quiet + (1 if capture else 0)
+
+        if self.pieces == (chess.PAWN,):
+            for idx in range(half):
+                stm, wk, bk, squares = self.decode(idx)
+                if squares[0] >= 48 and self.legal(stm, wk, bk, squares):
+                    if self._promotion_wins(wk, bk, squares):
+                        won[idx] = 1
+                        queue.append(idx)
+
+        while queue:
+            idx = queue.popleft()
+            stm, wk, bk, squares = self.decode(idx)
+            if stm == 1:
+                for pred in self._strong_unmoves(wk, bk, squares):
+                    if not won[pred]:
+                        won[pred] = 1
+                        queue.append(pred)
+            else:
+                for pred in self._bare_unmoves(wk, bk, squares):
+                    if won[pred]:
+                        continue
+                    c = counts[pred - half] - 1
+                    counts[pred - half] = c
+                    if c == 0:
+                        won[pred] = 1
+                        queue.append(pred)
+        return won
+
+    def _strong_unmoves(self, wk, bk, squares):
+        """Strong-side-to-move predecessors of a bare-king-to-move position."""
+        occupied = chess.BB_SQUARES[wk] | chess.BB_SQUARES[bk]
+        for sq in squares:
+            occupied |= chess.BB_SQUARES[sq]
+        # King un-moves
+        for frm in chess.scan_forward(chess.BB_KING_ATTACKS[wk] & ~occupied):
+            if self.legal(0, frm, bk, squares):
+                yield self.encode(0, frm, bk, squares)
+        # Piece un-moves
+        for i, (pt, sq) in enumerate(zip(self.pieces, squares)):
+            if pt == chess.PAWN:
+                origins = []
+                if sq - 8 >= 8 and not occupied & chess.BB_SQUARES[sq - 8]:
+                    origins.append(sq - 8)
+                    if chess.square_rank(sq) == 3 and not occupied & chess.BB_SQUARES[sq - 16]:
+                        origins.append(sq - 16)
+            else:
+                origins = chess.scan_forward(_piece_attacks(pt, sq, occupied) & ~occupied)
+            for frm in origins:
+                prev = list(squares)
+                prev[i] = frm
+                if self.legal(0, wk, bk, prev):
+                    yield self.encode(0, wk, bk, prev)
+
+    def _bare_unmoves(self, wk, bk, squares):
+        """Bare-king-to-move predecessors of a strong-side-to-move position."""
+        occupied = chess.BB_SQUARES[wk]
+        for sq in squares:
+            occupied |= chess.BB_SQUARES[sq]
+        for frm in chess.scan_forward(chess.BB_KING_ATTACKS[bk] & ~occupied):
+            if self.legal(1, wk, frm, squares):
+                yield self.encode(1, wk, frm, squares)
+
+
+def generate(name: str, output_dir: str, lookup: dict[str, "Bitbase"] | None = None) -> dict:
+    """Generate one table into output_dir. Returns timing and win statistics."""
+    lookup = dict(lookup or {})
+    for dep in DEPENDENCIES.get(name, ()):
+        if dep not in lookup:
+            table = open_bitbase(dep, [output_dir])
+            if table is None:
+                generate(dep, output_dir, lookup)
+                table = open_bitbase(dep, [output_dir])
+            lookup[dep] = table
+
+    gen   = _Generator(name, lookup)
+    start = time.perf_counter()
+    won   = gen.run()
+    elapsed = time.perf_counter() - start
+
+    packed = bytearray((gen.size + 7) // 8)
+    for idx in range(gen.size):
+        if won[idx]:
+            packed[idx >> 3] |= 1 << (idx & 7)
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{name}.bb")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, name.encode().ljust(8, b"\0"), gen.size))
+        f.write(packed)
+    os.replace(tmp, path)
+    _cache.pop(name, None)
+
+    return {
+        "table":     name,
+        "positions": gen.size,
+        "wins":      sum(won),
+        "bytes":     HEADER_SIZE + len(packed),
+        "seconds":   round(elapsed, 2),
+        "path":      path,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Probing
+# ---------------------------------------------------------------------------
+class Bitbase:
+    """A memory-mapped bitbase file."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mm   = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, name, size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a bitbase file")
+        self.name = name.rstrip(b"\0").decode()
+        self.size = size
+
+    def bit(self, idx: int) -> bool:
+        return bool(self._mm[HEADER_SIZE + (idx >> 3)] >> (idx & 7) & 1)
+
+
+_cache: dict[str, Bitbase | None] = {}
+
+
+def open_bitbase(name: str, dirs: list[str] | None = None) -> Bitbase | None:
+    """Load (once) the named table from the user or bundled dir; None if absent."""
+    if dirs is None and name in _cache:
+        return _cache[name]
+    table = None
+    for directory in dirs or [USER_DIR, BUNDLED_DIR]:
+        path = os.path.join(directory, f"{name}.bb")
+        if os.path.exists(path):
+            table = Bitbase(path)
+            break
+    if dirs is None:
+        _cache[name] = table
+    return table
+
+
+def material_key(board: chess.Board) -> tuple[str, chess.Color] | None:
+    """(table name, strong color) if the position belongs to a bitbase table."""
+    if chess.popcount(board.occupied) > 4:
+        return None
+    for strong in chess.COLORS:
+        if board.occupied_co[not strong] != board.kings & board.occupied_co[not strong]:
+            continue
+        extra = [board.piece_type_at(sq) for sq in
+                 chess.scan_forward(board.occupied_co[strong] & ~board.kings)]
+        for name, pieces in TABLES.items():
+            if sorted(extra) == sorted(pieces):
+                return name, strong
+    return None
+
+
+def probe(board: chess.Board) -> tuple[chess.Color, bool] | None:
+    """
+    Probe the bitbases. Returns (strong color, strong side wins) or None when
+    the material is not covered or the table file is not available.
+    """
+    key = material_key(board)
+    if key is None:
+        return None
+    name, strong = key
+    table = open_bitbase(name)
+    if table is None:
+        return None
+
+    flip = 0 if strong == chess.WHITE else 56
+    wk = board.king(strong) ^ flip
+    bk = board.king(not strong) ^ flip
+    idx = (0 if board.turn == strong else 1) << 6 | wk
+    idx = idx << 6 | bk
+    for pt in TABLES[name]:
+        sq = chess.lsb(board.pieces_mask(pt, strong)) ^ flip
+        idx = idx << 6 | sq
+    return strong, table.bit(idx)
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+def cmd_generate(args) -> dict:
+    names = [n.strip().lower() for n in args.tables.split(",") if n.strip()]
+    unknown = [n for n in names if n not in TABLES]
+    if unknown:
+        return {"ok": False, "error": f"Unknown tables: {', '.join(unknown)}"}
+    lookup: dict[str, Bitbase] = {}
+    results = []
+    for name in names:
+        results.append(generate(name, args.output_dir, lookup))
+        lookup[name] = open_bitbase(name, [args.output_dir])
+    return {"ok": True, "tables": results}
+
+
+def cmd_probe(args) -> dict:
+    board  = chess.Board(args.fen)
+    result = probe(board)
+    if result is None:
+        return {"ok": True, "fen": board.fen(), "covered": False}
+    strong, wins = result
+    return {
+        "ok":      True,
+        "fen":     board.fen(),
+        "covered": True,
+        "strong":  "white" if strong == chess.WHITE else "black",
+        "result":  "win" if wins else "draw",
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Endgame bitbases")
+    sub = p.add_subparsers(dest="command")
+
+    gn = sub.add_parser("generate")
+    gn.add_argument("--tables",     default="kqk,krk,kpk",
+                    help="Comma-separated tables: kpk, krk, kqk, kbnk")
+    gn.add_argument("--output-dir", default=USER_DIR)
+
+    pr = sub.add_parser("probe")
+    pr.add_argument("--fen", required=True)
+
+    args = p.parse_args()
+    if not args.command:
+        p.print_help()
+        sys.exit(1)
+    if hasattr(args, "output_dir"):
+        args.output_dir = os.path.expanduser(args.output_dir)
+
+    dispatch = {
+        "generate": cmd_generate,
+        "probe":    cmd_probe,
+    }
+    result = dispatch[args.command](args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+book.py — Polyglot opening books.
+
+Commands:
+  build  (--games-dir DIR --actor NAME | --pgn FILE --player NAME)
+         [--output FILE] [--plies N] [--min-count N]     Compile a .bin book
+  probe  --book FILE --fen FEN                            List book moves
+
+All output: JSON to stdout.
+
+Also imported by engine.py (ai_move --book) and persona.py.
+
+Books use the standard Polyglot layout: 16-byte big-endian entries
+(zobrist key, move, weight, learn) sorted by key, so any Polyglot reader can
+use them. Probing memory-maps the file and binary-searches the key
+(chess.polyglot.MemoryMappedReader), one O(log n) seek per position.
+
+The builder counts how often the player chose each move in each position
+within the first --plies half-moves; the count is the Polyglot weight, so
+book moves are picked in proportion to the player's own habits.
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import struct
+import sys
+from collections import Counter
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+USER_DIR = os.path.expanduser("~/.chess_coach/books")
+
+ENTRY      = struct.Struct(">QHHI")   # key, move, weight, learn
+MAX_WEIGHT = 0xFFFF
+BOOK_PLIES = 20
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+def encode_move(board: chess.Board, move: chess.Move) -> int:
+    """Polyglot move bits: to square, from square << 6, promotion << 12."""
+    to_square = move.to_square
+    if board.is_castling(move):
+        # Polyglot encodes castling as the king capturing its own rook
+        rank = chess.square_rank(move.from_square)
+        to_square = chess.square(7 if board.is_kingside_castling(move) else 0, rank)
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | move.from_square << 6 | promotion << 12
+
+
+def count_moves(games: list[tuple[list[str], set[bool]]], plies: int) -> Counter:
+    """
+    games: (moves_uci, colors to record) pairs.
+    Returns Counter{(zobrist key, polyglot move): times played}.
+    """
+    counts: Counter = Counter()
+    for moves_uci, colors in games:
+        board = chess.Board()
+        for uci in moves_uci[:plies]:
+            move = chess.Move.from_uci(uci)
+            if move not in board.legal_moves:
+                break
+            if board.turn in colors:
+                counts[chess.polyglot.zobrist_hash(board), encode_move(board, move)] += 1
+            board.push(move)
+    return counts
+
+
+def write_book(counts: Counter, path: str, min_count: int = 1) -> int:
+    """Write entries sorted by key (heaviest move first); returns the entry count."""
+    top = max(counts.values(), default=1)
+    scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1.0
+    entries = sorted(
+        ((key, move, max(1, int(n * scale))) for (key, move), n in counts.items() if n >= min_count),
+        key=lambda e: (e[0], -e[2], e[1]),
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        for key, move, weight in entries:
+            f.write(ENTRY.pack(key, move, weight, 0))
+    os.replace(path + ".tmp", path)   # readers never see a half-written book
+    return len(entries)
+
+
+def games_from_archive(games_dir: str, actor: str) -> list[tuple[list[str], set[bool]]]:
+    """Game JSONs (engine state files) in which `actor` played at least one move."""
+    games = []
+    for path in sorted(glob.glob(os.path.join(games_dir, "*.json"))):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        colors = {r.get("player") == "white" for r in state.get("move_records", [])
+                  if r.get("actor") == actor}
+        if colors:
+            games.append((state.get("moves_uci", []), colors))
+    return games
+
+
+def games_from_pgn(pgn_path: str, player: str) -> list[tuple[list[str], set[bool]]]:
+    """Mainlines of PGN games whose White or Black header contains `player`."""
+    games = []
+    with open(pgn_path, encoding="utf-8", errors="replace") as f:
+        while (game := chess.pgn.read_game(f)) is not None:
+            colors = {color for color, tag in ((chess.WHITE, "White"), (chess.BLACK, "Black"))
+                      if player.lower() in game.headers.get(tag, "").lower()}
+            if colors:
+                games.append(([m.uci() for m in game.mainline_moves()], colors))
+    return games
+
+
+def build(games: list[tuple[list[str], set[bool]]], path: str,
+          plies: int = BOOK_PLIES, min_count: int = 1) -> dict:
+    counts  = count_moves(games, plies)
+    entries = write_book(counts, path, min_count)
+    return {"path": path, "games": len(games), "entries": entries,
+            "positions": len({key for key, _ in counts})}
+
+
+# ---------------------------------------------------------------------------
+# Probing
+# ---------------------------------------------------------------------------
+# path -> ((mtime_ns, size), reader): a rebuilt book is reopened on the next probe
+_readers: dict[str, tuple[tuple[int, int], chess.polyglot.MemoryMappedReader]] = {}
+
+
+def resolve_book(path: str) -> str:
+    """Existing paths are used as given; bare names resolve against the user book dir."""
+    path = os.path.expanduser(path)
+    if os.path.isabs(path) or os.path.exists(path):
+        return path
+    return os.path.join(USER_DIR, path)
+
+
+def open_book(path: str) -> chess.polyglot.MemoryMappedReader | None:
+    """
+    Memory-map the book at `path`, once per version of the file (mtime and
+    size); None if missing or unreadable. Failures are not cached, so a book
+    created later is picked up.
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp  = (st.st_mtime_ns, st.st_size)
+    cached = _readers.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        reader = chess.polyglot.open_reader(path)
+    except (OSError, ValueError):
+        return None
+    # The old reader is not closed: another thread may still be probing it
+    _readers[path] = (stamp, reader)
+    return reader
+
+
+def book_move(path: str, board: chess.Board, rng: random.Random | None = None) -> chess.Move | None:
+    """Weighted random book move for the position, or None when out of book."""
+    reader = open_book(path)
+    if reader is None:
+        return None
+    try:
+        return reader.weighted_choice(board, random=rng).move
+    except IndexError:
+        return None
+
+
+def book_entries(path: str, board: chess.Board) -> list[dict]:
+    reader = open_book(path)
+    if reader is None:
+        return []
+    entries = list(reader.find_all(board))
+    total = sum(e.weight for e in entries) or 1
+    return [{"move_san": board.san(e.move), "move_uci": e.move.uci(),
+             "weight": e.weight, "share": round(e.weight / total, 3)} for e in entries]
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+def cmd_build(args) -> dict:
+    if args.pgn:
+        if not args.player:
+            return {"ok": False, "error": "--pgn requires --player"}
+        games, name = games_from_pgn(args.pgn, args.player), args.player
+    elif args.actor:
+        games, name = games_from_archive(args.games_dir, args.actor), args.actor
+    else:
+        return {"ok": False, "error": "Give --actor (games archive) or --pgn with --player"}
+    if not games:
+        return {"ok": False, "error": f"No games found for '{name}'"}
+    output = args.output or os.path.join(USER_DIR, f"{name.lower().replace(' ', '_')}.bin")
+    return {"ok": True, **build(games, output, args.plies, args.min_count)}
+
+
+def cmd_probe(args) -> dict:
+    if open_book(args.book) is None:
+        return {"ok": False, "error": f"Cannot open book {args.book}"}
+    board = chess.Board(args.fen)
+    return {"ok": True, "fen": board.fen(), "moves": book_entries(args.book, board)}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Polyglot opening books")
+    sub = p.add_subparsers(dest="command")
+
+    bd = sub.add_parser("build")
+    bd.add_argument("--games-dir", default="~/.chess_coach/games")
+    bd.add_argument("--actor",     default=None,
+                    help="Actor name in the games archive (move_records[].actor)")
+    bd.add_argument("--pgn",       default=None)
+    bd.add_argument("--player",    default=None,
+                    help="Player name to match in PGN White/Black headers")
+    bd.add_argument("--output",    default=None,
+                    help=f"Book file (default: {USER_DIR}/<name>.bin)")
+    bd.add_argument("--plies",     type=int, default=BOOK_PLIES)
+    bd.add_argument("--min-count", type=int, default=1,
+                    help="Drop moves played fewer times than this")
+
+    pr = sub.add_parser("probe")
+    pr.add_argument("--book", required=True)
+    pr.add_argument("--fen",  default=chess.STARTING_FEN)
+
+    args = p.parse_args()
+    if not args.command:
+        p.print_help()
+        sys.exit(1)
+    for attr in ("games_dir", "pgn", "output", "book"):
+        if getattr(args, attr, None):
+            setattr(args, attr, os.path.expanduser(getattr(args, attr)))
+
+    dispatch = {
+        "build": cmd_build,
+        "probe": cmd_probe,
+    }
+    result = dispatch[args.command](args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
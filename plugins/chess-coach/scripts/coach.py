@@ -3,10 +3,16 @@
 coach.py — Move evaluation and coaching annotation.
 
 Commands:
-  evaluate_user  --state FILE --move <uci>   Evaluate a user move before committing
+  evaluate_user  --state FILE --move <uci> [--engine CMD]  Evaluate a user move before committing
+  analyze        --state FILE [--multipv N] [--depth D] [--engine CMD]
+                                             Top-N engine lines for the position
+  find_mate      --state FILE [--max N] [--checks-only]  Search for a forced mate
   explain_ai     --state FILE                Explain the last AI move
   annotate       --state FILE --move_idx N --text "..."  Save coaching text to a record
 
+--engine runs the searches on a UCI engine (e.g. --engine stockfish)
+instead of the built-in minimax; see backends.py.
+
 All output: JSON to stdout.
 Coaching text is stored back into state['move_records'][n]['coaching'].
 """
@@ -15,16 +21,24 @@ import argparse
 import json
 import os
 import sys
+import time
 
 sys.path.insert(0, os.path.dirname(__file__))
 from common import (
-    evaluate, score_to_winrate, get_best_move, minimax,
-    classify_move, board_from_state, detect_opening,
-    PIECE_VALUES,
+    evaluate, score_to_winrate, pv_to_san,
+    classify_move, board_from_state, opening_step,
 )
+from backends import get_backend, EngineError
+from tactics import detect_motifs, new_motifs, color_name
+from mate import find_mate, is_mating_move, MateSolver
 
 import chess
 
+# Missed-mate detection in evaluate_user: forcing (all-checks) mates only,
+# with a node budget so coaching stays interactive.
+MATE_COACH_MOVES = 3
+MATE_COACH_NODES = 20000
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -46,16 +60,12 @@ def cp_fmt(score: int, turn: chess.Color) -> str:
     return f"{adj / 100:+.2f}"
 
 
-def hanging_pieces(board: chess.Board, our_color: chess.Color) -> list[str]:
-    """Return names of our pieces that are attacked and undefended."""
-    opp = not our_color
-    result = []
-    for sq in chess.SQUARES:
-        piece = board.piece_at(sq)
-        if piece and piece.color == our_color:
-            if board.is_attacked_by(opp, sq) and not board.is_attacked_by(our_color, sq):
-                result.append(f"{chess.piece_name(piece.piece_type)} on {chess.square_name(sq)}")
-    return result
+def tactic_lines(motifs: list[dict], our_color: chess.Color, limit: int = 3) -> list[str]:
+    """Turn motifs into coaching lines: threats against us first, then our chances."""
+    ours    = color_name(our_color)
+    threats = [f"⚠️  {m['text']}" for m in motifs if m["side"] != ours]
+    chances = [f"🎯 {m['text']}" for m in motifs if m["side"] == ours]
+    return (threats + chances)[:limit]
 
 
 def opening_hint(moves_san: list[str], move_san: str, board_before: chess.Board, move: chess.Move) -> list[str]:
@@ -63,11 +73,13 @@ def opening_hint(moves_san: list[str], move_san: str, board_before: chess.Board,
     hints = []
     move_num = len(moves_san)  # 0-indexed before this move
 
-    # Detect named opening
-    tentative = moves_san + [move_san]
-    opening = detect_opening(tentative)
-    if opening:
-        hints.append(f"Opening: {opening}")
+    # Name the opening when this move reaches a named ECO position
+    board_after = board_before.copy(stack=False)
+    board_after.push(move)
+    _, named = opening_step(board_after)
+    if named:
+        eco, name = named
+        hints.append(f"Opening: {name} ({eco})")
         return hints  # opening name is sufficient context
 
     # Generic principles for first 10 half-moves
@@ -100,26 +112,43 @@ def cmd_evaluate_user(args) -> dict:
     Evaluate a user move before it is committed to state.
     Provides: quality label, win-rate change, best alternative.
     """
-    state      = load_state(args.state)
+    try:
+        return evaluate_user(load_state(args.state), args.move, get_backend(args.engine))
+    except EngineError as e:
+        return {"ok": False, "error": str(e)}
+
+
+def evaluate_user(state: dict, move_uci: str, backend=None) -> dict:
+    """
+    evaluate_user on a state dict (also run in server.py's search pool).
+    backend: a backends.py backend for the searches (default: built-in).
+    """
+    backend    = backend or get_backend()
     board_pre  = board_from_state(state)
     turn_before = board_pre.turn
 
-    move = chess.Move.from_uci(args.move)
+    try:
+        move = chess.Move.from_uci(move_uci)
+    except ValueError:
+        move = None
     if move not in board_pre.legal_moves:
-        return {"ok": False, "error": f"Illegal move: {args.move}"}
+        return {"ok": False, "error": f"Illegal move: {move_uci}"}
 
     move_san      = board_pre.san(move)
     score_before  = evaluate(board_pre)
     wr_before     = score_to_winrate(score_before, chess.WHITE)
 
-    # Best move from this position
-    best_move, _ = get_best_move(board_pre, depth=2)
-    best_san      = board_pre.san(best_move) if best_move else None
-
-    # Score after best move
-    board_pre.push(best_move)
-    best_score_after = evaluate(board_pre)
-    board_pre.pop()
+    # The engine's best line, then the user's move on its own at the same
+    # depth (sharing the table), so both are compared on the same searched
+    # footing without paying for exact scores of every legal move.
+    tt        = {}
+    best_line = backend.top_moves(board_pre, depth=2, n=1, tt=tt)[0]
+    best_move = best_line["move"]
+    best_san  = board_pre.san(best_move)
+    best_searched = best_line["score"]
+    user_line = best_line if move == best_move else \
+        backend.top_moves(board_pre, depth=2, n=1, moves=[move], tt=tt)[0]
+    user_searched = user_line["score"]
 
     # Score after user move
     board_after = board_from_state(state)
@@ -130,13 +159,21 @@ def cmd_evaluate_user(args) -> dict:
     # CP delta from the moving side's perspective
     if turn_before == chess.WHITE:
         delta_user = score_after - score_before
-        delta_best = best_score_after - score_before
+        missed_cp  = best_searched - user_searched
     else:
         delta_user = -(score_after - score_before)
-        delta_best = -(best_score_after - score_before)
+        missed_cp  = user_searched - best_searched
 
     quality, icon = classify_move(delta_user)
-    missed_cp     = delta_best - delta_user   # how much better the best move was
+
+    # Was there a forced mate the user did not play?
+    missed_mate = None
+    mate_line   = find_mate(board_pre, MATE_COACH_MOVES, checks_only=True,
+                            node_limit=MATE_COACH_NODES)
+    if mate_line and move != mate_line[0]:
+        n = (len(mate_line) + 1) // 2
+        if not is_mating_move(board_pre, move, n, checks_only=True):
+            missed_mate = {"mate_in": n, "line_san": pv_to_san(board_pre, mate_line)}
 
     # ── Build coaching lines ──────────────────────────────────────────────
     lines = []
@@ -150,7 +187,10 @@ def cmd_evaluate_user(args) -> dict:
         f"Eval: {cp_fmt(score_after, turn_before)}"
     )
 
-    if best_move and best_move.uci() == args.move:
+    if missed_mate:
+        lines.append(f"💀 You missed mate in {missed_mate['mate_in']}: "
+                     f"{' '.join(missed_mate['line_san'])}")
+    elif best_move == move or missed_cp <= 0:
         lines.append("⭐ Best move — engine's top choice!")
     elif missed_cp > 20:
         lines.append(f"💡 Better: {best_san}  (gains ~{missed_cp / 100:.1f} more pawns)")
@@ -160,10 +200,9 @@ def cmd_evaluate_user(args) -> dict:
     o_hints = opening_hint(state.get("moves_san", []), move_san, board_hint, move)
     lines.extend(o_hints)
 
-    # Hanging piece warnings after user move
-    hangers = hanging_pieces(board_after, turn_before)
-    for h in hangers[:2]:
-        lines.append(f"⚠️  Your {h} is undefended!")
+    # Tactical motifs created by the user move (threats against the user first)
+    tactics = new_motifs(detect_motifs(board_pre), detect_motifs(board_after))
+    lines.extend(tactic_lines(tactics, turn_before))
 
     coaching_text = "\n".join(lines)
 
@@ -177,12 +216,74 @@ def cmd_evaluate_user(args) -> dict:
         "winrate_before":  wr_before,
         "winrate_after":   wr_after,
         "best_move_san":   best_san,
+        "best_score_cp":   best_searched,
+        "user_score_cp":   user_searched,
         "missed_cp":       missed_cp,
+        "missed_mate":     missed_mate,
+        "tactics":         tactics,
         "coaching_text":   coaching_text,
         "coaching_lines":  lines,
     }
 
 
+def cmd_analyze(args) -> dict:
+    """
+    Report the top-N engine lines for the current position (multi-PV).
+    Scores are searched, White-perspective centipawns.
+    """
+    state = load_state(args.state)
+    board = board_from_state(state)
+
+    if board.is_game_over():
+        return {"ok": False, "error": "Game is already over."}
+
+    try:
+        top = get_backend(args.engine).top_moves(board, args.depth, args.multipv)
+    except EngineError as e:
+        return {"ok": False, "error": str(e)}
+
+    lines = []
+    for rank, line in enumerate(top, start=1):
+        lines.append({
+            "rank":          rank,
+            "move_san":      board.san(line["move"]),
+            "move_uci":      line["move"].uci(),
+            "score_cp":      line["score"],
+            "winrate_white": score_to_winrate(line["score"], chess.WHITE),
+            "pv_san":        pv_to_san(board, line["pv"]),
+            "pv_uci":        [m.uci() for m in line["pv"]],
+        })
+
+    return {
+        "ok":    True,
+        "fen":   board.fen(),
+        "turn":  "white" if board.turn == chess.WHITE else "black",
+        "depth": args.depth,
+        "lines": lines,
+    }
+
+
+def cmd_find_mate(args) -> dict:
+    """Search the current position for a forced mate of at most --max moves."""
+    state = load_state(args.state)
+    board = board_from_state(state)
+
+    solver = MateSolver(checks_only=args.checks_only, node_limit=args.node_limit)
+    start  = time.perf_counter()
+    line   = solver.solve(board, args.max)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "ok":       True,
+        "fen":      board.fen(),
+        "mate_in":  (len(line) + 1) // 2 if line else None,
+        "line_san": pv_to_san(board, line) if line else [],
+        "line_uci": [m.uci() for m in line] if line else [],
+        "nodes":    solver.nodes,
+        "time_ms":  round(elapsed * 1000, 1),
+    }
+
+
 def cmd_explain_ai(args) -> dict:
     """
     Explain the last move in state (which was the AI's move).
@@ -199,36 +300,37 @@ def cmd_explain_ai(args) -> dict:
     score_after  = last["score_after_cp"]
     player  = last["player"]
 
-    delta = (score_after - score_before) if player == "white" else -(score_after - score_before)
-
-    # Reconstruct board before the last move
-    board_pre = chess.Board()
-    for uci in state["moves_uci"][:-1]:
-        board_pre.push(chess.Move.from_uci(uci))
+    # Static eval before vs. after: like with like. The searched score (stored
+    # by ai_move) is a depth-N value, reported on its own line below.
+    ai_color = chess.WHITE if player == "white" else chess.BLACK
+    delta    = (score_after - score_before) if player == "white" else -(score_after - score_before)
+    searched = last.get("search_score_cp")
 
-    move  = chess.Move.from_uci(last["move_uci"])
-    piece = board_pre.piece_at(move.from_square)
+    # Everything below comes from the record itself — no search
+    move   = chess.Move.from_uci(last["move_uci"])
+    pv_san = last.get("pv_san") or []
 
-    # Check for capture
-    captured = board_pre.piece_at(move.to_square)
-
-    board_pre.push(move)
-    gives_check = board_pre.is_check()
+    if move_san.startswith("O-O"):
+        piece_type = chess.KING
+    elif move_san[0] in "NBRQK":
+        piece_type = chess.PIECE_SYMBOLS.index(move_san[0].lower())
+    else:
+        piece_type = chess.PAWN
 
     lines = [f"AI played {move_san}."]
 
-    if piece:
-        pname  = chess.piece_name(piece.piece_type)
-        fr, to = chess.square_name(move.from_square), chess.square_name(move.to_square)
-        lines.append(f"  {pname.capitalize()} {fr} → {to}.")
+    pname  = chess.piece_name(piece_type)
+    fr, to = chess.square_name(move.from_square), chess.square_name(move.to_square)
+    lines.append(f"  {pname.capitalize()} {fr} → {to}.")
 
-    if gives_check:
+    if move_san.endswith("#"):
+        lines.append("  Delivers checkmate!")
+    elif move_san.endswith("+"):
         lines.append("  Delivers check — forces a defensive response.")
     if move.promotion:
-        lines.append("  Pawn promotion to queen — decisive material gain.")
-    if captured:
-        cname = chess.piece_name(captured.piece_type)
-        lines.append(f"  Captures the {cname} — material gain.")
+        lines.append(f"  Pawn promotion to {chess.piece_name(move.promotion)} — decisive material gain.")
+    if "x" in move_san:
+        lines.append(f"  Captures on {to} — material gain.")
 
     if delta > 50:
         lines.append(f"  Improves the position by ~{delta / 100:.1f} pawns.")
@@ -239,6 +341,20 @@ def cmd_explain_ai(args) -> dict:
     else:
         lines.append("  Positional move — consolidating the position.")
 
+    if last.get("mate_in"):
+        lines.append(f"  Engine sees a forced mate in {last['mate_in']}.")
+    elif searched is not None:
+        lines.append(f"  Engine eval after a depth-{last.get('search_depth')} search: "
+                     f"{cp_fmt(searched, ai_color)} for the AI.")
+    if len(pv_san) > 1:
+        lines.append(f"  Expected continuation: {' '.join(pv_san[1:])}")
+    if len(pv_san) > 2:
+        lines.append(f"  Threat: {pv_san[2]} if you answer {pv_san[1]}.")
+
+    # Tactical motifs the AI move created (stored by ai_move), from the AI's side
+    tactics  = last.get("tactics", [])
+    lines.extend(f"  {line}" for line in tactic_lines(tactics, not ai_color))
+
     wr_pct = int(last["winrate_white"] * 100)
     lines.append(f"Win rate (White): {wr_pct}%")
 
@@ -252,6 +368,8 @@ def cmd_explain_ai(args) -> dict:
         "ok":            True,
         "coaching_text": coaching_text,
         "coaching_lines": lines,
+        "expected_line": pv_san[1:],
+        "tactics":       tactics,
     }
 
 
@@ -280,6 +398,20 @@ def main():
     eu = sub.add_parser("evaluate_user")
     eu.add_argument("--state", default="~/.chess_coach/current_game.json")
     eu.add_argument("--move",  required=True, help="UCI move string, e.g. e2e4")
+    eu.add_argument("--engine", default=None, help="UCI engine command (default: built-in search)")
+
+    az = sub.add_parser("analyze")
+    az.add_argument("--state",   default="~/.chess_coach/current_game.json")
+    az.add_argument("--multipv", type=int, default=3, help="Number of lines to report")
+    az.add_argument("--depth",   type=int, default=2, help="Search depth in plies")
+    az.add_argument("--engine",  default=None, help="UCI engine command (default: built-in search)")
+
+    fm = sub.add_parser("find_mate")
+    fm.add_argument("--state",       default="~/.chess_coach/current_game.json")
+    fm.add_argument("--max",         type=int, default=3, help="Maximum mate length in moves")
+    fm.add_argument("--checks-only", action="store_true",
+                    help="Only consider checking moves for the mating side")
+    fm.add_argument("--node-limit",  type=int, default=None)
 
     ea = sub.add_parser("explain_ai")
     ea.add_argument("--state", default="~/.chess_coach/current_game.json")
@@ -294,6 +426,8 @@ def main():
 
     dispatch = {
         "evaluate_user": cmd_evaluate_user,
+        "analyze":       cmd_analyze,
+        "find_mate":     cmd_find_mate,
         "explain_ai":    cmd_explain_ai,
         "annotate":      cmd_annotate,
     }
@@ -5,14 +5,31 @@ Imported by engine.py, coach.py, and review.py.
 Do not run directly.
 """
 
+import itertools
+import json
 import math
+import os
 import random
+import struct
+import sys
+import time
+import zlib
+
 import chess
+import chess.polyglot
+
+from bitbase import probe as probe_bitbase
+from searchboard import SearchBoard, encode, decode
 
 # ---------------------------------------------------------------------------
-# Piece-square tables (White's perspective; use chess.square_mirror for Black)
+# Piece-square tables
 # ---------------------------------------------------------------------------
-PST: dict[int, list[int]] = {
+# Tapered evaluation: every piece has a middlegame (PST, PIECE_VALUES) and an
+# endgame (PST_EG, PIECE_VALUES_EG) value, blended by the game phase.
+# Tables are laid out as printed: first row = 8th rank, from White's side.
+# A White piece on `sq` reads entry square_mirror(sq), a Black one entry sq
+# (see pst_index).
+PST: dict[int, list[int]] = {   # middlegame
     chess.PAWN: [
          0,  0,  0,  0,  0,  0,  0,  0,
         50, 50, 50, 50, 50, 50, 50, 50,
@@ -75,7 +92,54 @@ PST: dict[int, list[int]] = {
     ],
 }
 
-PIECE_VALUES: dict[int, int] = {
+PST_EG: dict[int, list[int]] = {
+    chess.PAWN: [
+          0,  0,  0,  0,  0,  0,  0,  0,
+         80, 80, 80, 80, 80, 80, 80, 80,
+         50, 50, 50, 50, 50, 50, 50, 50,
+         30, 30, 30, 30, 30, 30, 30, 30,
+         15, 15, 15, 15, 15, 15, 15, 15,
+          5,  5,  5,  5,  5,  5,  5,  5,
+          0,  0,  0,  0,  0,  0,  0,  0,
+          0,  0,  0,  0,  0,  0,  0,  0,
+    ],
+    chess.KNIGHT: list(PST[chess.KNIGHT]),
+    chess.BISHOP: list(PST[chess.BISHOP]),
+    chess.ROOK: [
+          0,  0,  0,  0,  0,  0,  0,  0,
+         10, 10, 10, 10, 10, 10, 10, 10,
+          0,  0,  0,  0,  0,  0,  0,  0,
+          0,  0,  0,  0,  0,  0,  0,  0,
+          0,  0,  0,  0,  0,  0,  0,  0,
+          0,  0,  0,  0,  0,  0,  0,  0,
+          0,  0,  0,  0,  0,  0,  0,  0,
+          0,  0,  0,  0,  0,  0,  0,  0,
+    ],
+    chess.QUEEN: [
+        -20,-10,-10, -5, -5,-10,-10,-20,
+        -10,  0,  5,  5,  5,  5,  0,-10,
+        -10,  5, 10, 10, 10, 10,  5,-10,
+         -5,  5, 10, 15, 15, 10,  5, -5,
+         -5,  5, 10, 15, 15, 10,  5, -5,
+        -10,  5, 10, 10, 10, 10,  5,-10,
+        -10,  0,  5,  5,  5,  5,  0,-10,
+        -20,-10,-10, -5, -5,-10,-10,-20,
+    ],
+    # Endgame king: centralize; the middlegame table's shelter squares are
+    # the worst place for it once the queens are off
+    chess.KING: [
+        -50,-40,-30,-20,-20,-30,-40,-50,
+        -30,-20,-10,  0,  0,-10,-20,-30,
+        -30,-10, 20, 30, 30, 20,-10,-30,
+        -30,-10, 30, 40, 40, 30,-10,-30,
+        -30,-10, 30, 40, 40, 30,-10,-30,
+        -30,-10, 20, 30, 30, 20,-10,-30,
+        -30,-30,  0,  0,  0,  0,-30,-30,
+        -50,-30,-30,-30,-30,-30,-30,-50,
+    ],
+}
+
+PIECE_VALUES: dict[int, int] = {   # middlegame; also the material values tactics use
     chess.PAWN:   100,
     chess.KNIGHT: 320,
     chess.BISHOP: 330,
@@ -84,25 +148,436 @@ PIECE_VALUES: dict[int, int] = {
     chess.KING:   20000,
 }
 
+PIECE_VALUES_EG: dict[int, int] = {
+    chess.PAWN:   120,
+    chess.KNIGHT: 300,
+    chess.BISHOP: 330,
+    chess.ROOK:   520,
+    chess.QUEEN:  920,
+    chess.KING:   20000,
+}
+
+# Game phase: PHASE_MAX with all minor and major pieces on the board, 0 with
+# none; the eval is mg * phase / PHASE_MAX + eg * (1 - phase / PHASE_MAX).
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]   # indexed by piece type
+PHASE_MAX     = 24
+
+
+def pst_index(square: int, color: chess.Color) -> int:
+    return chess.square_mirror(square) if color == chess.WHITE else square
+
+
+# Signed per-square values, rebuilt whenever the tables change:
+# _SQ_MG[color][piece_type][square] = ±(value + table entry), + for White.
+# Kings carry no material value (both are always there).
+_SQ_MG: list[list[list[int]]] = []
+_SQ_EG: list[list[list[int]]] = []
+
+
+def _build_square_tables() -> None:
+    for signed, values, tables in ((_SQ_MG, PIECE_VALUES, PST), (_SQ_EG, PIECE_VALUES_EG, PST_EG)):
+        signed[:] = [[[0] * 64 for _ in range(7)] for _ in chess.COLORS]
+        for color in chess.COLORS:
+            sign = 1 if color == chess.WHITE else -1
+            for pt in chess.PIECE_TYPES:
+                value = 0 if pt == chess.KING else values[pt]
+                for sq in chess.SQUARES:
+                    signed[color][pt][sq] = sign * (value + tables[pt][pst_index(sq, color)])
+
+
+# ---------------------------------------------------------------------------
+# Tuned weights
+# ---------------------------------------------------------------------------
+# tune.py fits the tables above to game results and writes a versioned JSON
+# weights file. If EVAL_WEIGHTS exists it replaces the built-in tables at
+# import. Tables are updated in place, so modules that imported them see the
+# loaded values; apply_weights(None) restores the built-in ones.
+WEIGHTS_VERSION = 2   # 2: tapered (middlegame + endgame) tables
+EVAL_WEIGHTS    = os.path.expanduser("~/.chess_coach/eval_weights.json")
+WEIGHT_TABLES   = {   # weights-file key -> table
+    "piece_values":    PIECE_VALUES,
+    "piece_values_eg": PIECE_VALUES_EG,
+    "pst":             PST,
+    "pst_eg":          PST_EG,
+}
+
+
+def weights_snapshot() -> dict:
+    """The current tables in weights-file form."""
+    snapshot = {"version": WEIGHTS_VERSION}
+    for key, table in WEIGHT_TABLES.items():
+        snapshot[key] = {chess.piece_name(pt): (list(v) if isinstance(v, list) else v)
+                         for pt, v in table.items()}
+    return snapshot
+
+
+BUILTIN_WEIGHTS = weights_snapshot()
+weights_id = "builtin"   # identifies the loaded tables (review.py stamps reviews with it)
+
+
+def apply_weights(weights: dict | None) -> None:
+    """Install a weights dict (as from load_weights); None restores the built-in tables."""
+    global weights_id
+    if weights is None:
+        weights, weights_id = BUILTIN_WEIGHTS, "builtin"
+    else:
+        weights_id = weights.get("id", "custom")
+    for pt in chess.PIECE_TYPES:
+        name = chess.piece_name(pt)
+        for key in ("piece_values", "piece_values_eg"):
+            WEIGHT_TABLES[key][pt] = int(weights[key][name])
+        for key in ("pst", "pst_eg"):
+            WEIGHT_TABLES[key][pt][:] = [int(v) for v in weights[key][name]]
+    _build_square_tables()
+
+
+def load_weights(path: str) -> dict:
+    """Read and validate a weights file; raises ValueError on a bad or outdated one."""
+    with open(path) as f:
+        weights = json.load(f)
+    if weights.get("version") != WEIGHTS_VERSION:
+        raise ValueError(f"{path}: weights version {weights.get('version')}, "
+                         f"expected {WEIGHTS_VERSION} (re-run tune.py fit)")
+    for pt in chess.PIECE_TYPES:
+        name = chess.piece_name(pt)
+        if (any(name not in weights.get(key, {}) for key in ("piece_values", "piece_values_eg"))
+                or any(len(weights.get(key, {}).get(name, [])) != 64 for key in ("pst", "pst_eg"))):
+            raise ValueError(f"{path}: missing or malformed weights for {name}")
+    return weights
+
+
+_build_square_tables()
+if os.path.exists(EVAL_WEIGHTS):
+    try:
+        apply_weights(load_weights(EVAL_WEIGHTS))
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring {EVAL_WEIGHTS}: {e}", file=sys.stderr)
+
+
+# ---------------------------------------------------------------------------
+# Pawn structure
+# ---------------------------------------------------------------------------
+# Passed, doubled, isolated and backward pawns, from the two pawn bitboards
+# alone. The (mg, eg) result is cached in PAWN_HASH under a pawn-only Zobrist
+# key (the polyglot pawn keys), which the search updates incrementally; pawn
+# structure rarely changes inside a search, so most leaves hit the cache.
+PASSED_MG      = [0,  5, 10, 15, 25,  40,  60, 0]   # by rank from the pawn's side
+PASSED_EG      = [0, 10, 20, 35, 60, 100, 150, 0]
+DOUBLED        = (-10, -20)   # (mg, eg) per extra pawn on a file
+ISOLATED       = (-10, -15)
+BACKWARD       = ( -8, -10)
+PAWN_HASH_MAX  = 1 << 16
+PAWN_HASH: dict[int, tuple[int, int]] = {}
+pawn_hash_stats = {"hits": 0, "misses": 0}
+
+_PAWN_ZOBRIST = [[chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * color + sq] for sq in chess.SQUARES]
+                 for color in (chess.BLACK, chess.WHITE)]   # polyglot: black pawn = 0, white pawn = 1
+_ADJACENT_FILES = [(chess.BB_FILES[f - 1] if f > 0 else 0) | (chess.BB_FILES[f + 1] if f < 7 else 0)
+                   for f in range(8)]
+
+
+def _span(color: chess.Color, square: int, ahead: bool) -> int:
+    """Ranks strictly ahead of the square (ahead) or up to and including its rank, for `color`."""
+    rank = chess.square_rank(square)
+    if color == chess.WHITE:
+        ranks = range(rank + 1, 8) if ahead else range(0, rank + 1)
+    else:
+        ranks = range(0, rank) if ahead else range(rank, 8)
+    mask = 0
+    for r in ranks:
+        mask |= chess.BB_RANKS[r]
+    return mask
+
+
+# _PASSED[color][sq]: squares that must hold no enemy pawn for a pawn there to be passed
+# _SUPPORT[color][sq]: squares from which friendly pawns could (eventually) defend it
+_PASSED  = [[_span(c, sq, True) & (chess.BB_FILES[chess.square_file(sq)]
+                                   | _ADJACENT_FILES[chess.square_file(sq)])
+             for sq in chess.SQUARES] for c in (chess.BLACK, chess.WHITE)]
+_SUPPORT = [[_span(c, sq, False) & _ADJACENT_FILES[chess.square_file(sq)]
+             for sq in chess.SQUARES] for c in (chess.BLACK, chess.WHITE)]
+
+
+def pawn_key(board: chess.Board) -> int:
+    key = 0
+    for color in chess.COLORS:
+        for sq in chess.scan_forward(board.pieces_mask(chess.PAWN, color)):
+            key ^= _PAWN_ZOBRIST[color][sq]
+    return key
+
+
+def pawn_structure(white_pawns: int, black_pawns: int) -> tuple[int, int]:
+    """(mg, eg) pawn-structure score, White positive."""
+    mg = eg = 0
+    for color, own, enemy in ((chess.WHITE, white_pawns, black_pawns),
+                              (chess.BLACK, black_pawns, white_pawns)):
+        sign = 1 if color == chess.WHITE else -1
+        c_mg = c_eg = 0
+        for f in range(8):
+            extra = chess.popcount(own & chess.BB_FILES[f]) - 1
+            if extra > 0:
+                c_mg += DOUBLED[0] * extra
+                c_eg += DOUBLED[1] * extra
+        for sq in chess.scan_forward(own):
+            file = chess.square_file(sq)
+            if not own & _ADJACENT_FILES[file]:
+                c_mg += ISOLATED[0]
+                c_eg += ISOLATED[1]
+            elif not own & _SUPPORT[color][sq]:
+                stop = sq + 8 if color == chess.WHITE else sq - 8
+                if chess.BB_PAWN_ATTACKS[color][stop] & enemy:
+                    c_mg += BACKWARD[0]
+                    c_eg += BACKWARD[1]
+            if not enemy & _PASSED[color][sq]:
+                rank = chess.square_rank(sq) if color == chess.WHITE else 7 - chess.square_rank(sq)
+                c_mg += PASSED_MG[rank]
+                c_eg += PASSED_EG[rank]
+        mg += sign * c_mg
+        eg += sign * c_eg
+    return mg, eg
+
+
+def pawn_terms(board: chess.Board, key: int) -> tuple[int, int]:
+    """pawn_structure of the board through PAWN_HASH; `key` is its pawn_key."""
+    entry = PAWN_HASH.get(key)
+    if entry is not None:
+        pawn_hash_stats["hits"] += 1
+        return entry
+    pawn_hash_stats["misses"] += 1
+    if len(PAWN_HASH) >= PAWN_HASH_MAX:
+        PAWN_HASH.clear()
+    entry = PAWN_HASH[key] = pawn_structure(board.pawns & board.occupied_co[chess.WHITE],
+                                            board.pawns & board.occupied_co[chess.BLACK])
+    return entry
+
 
-def evaluate(board: chess.Board) -> int:
+# ---------------------------------------------------------------------------
+# Mobility and king safety
+# ---------------------------------------------------------------------------
+# One attack bitboard (board.attacks_mask's lookup) per knight, bishop, rook
+# and queen, no move generation. Mobility counts attacked squares not held by own pieces or
+# covered by enemy pawns, relative to a typical count. King safety counts
+# attack units on the squares around each king (the king's own square
+# included) and charges the defender once two or more pieces join in.
+# Each group of terms has a switch in EVAL_SWITCHES (bench.py search and
+# tournament.py players can turn them off to measure what they cost and gain).
+EVAL_SWITCHES = {"pawns": True, "mobility": True, "king_safety": True}
+
+MOBILITY_BASE = [0, 0, 4, 6, 7, 13, 0]   # indexed by piece type
+MOBILITY_MG   = [0, 0, 4, 5, 2, 1, 0]    # per square above or below the base
+MOBILITY_EG   = [0, 0, 4, 5, 4, 2, 0]
+KING_ATTACK_UNITS = [0, 0, 2, 2, 3, 5, 0]
+KING_DANGER   = [0, 0, 5, 12, 22, 35, 50, 68, 88, 110, 135, 160, 190, 220, 250, 280, 310]   # mg, by units
+
+_KING_ZONE = [chess.BB_KING_ATTACKS[sq] | chess.BB_SQUARES[sq] for sq in chess.SQUARES]
+
+
+def _pawn_attacks(pawns: int, color: chess.Color) -> int:
+    if color == chess.WHITE:
+        return (((pawns << 7) & ~chess.BB_FILE_H) | ((pawns << 9) & ~chess.BB_FILE_A)) & chess.BB_ALL
+    return ((pawns >> 9) & ~chess.BB_FILE_H) | ((pawns >> 7) & ~chess.BB_FILE_A)
+
+
+def _attacks(pt: int, sq: int, occupied: int) -> int:
+    """board.attacks_mask for a knight, bishop, rook or queen, without the piece lookup."""
+    if pt == chess.KNIGHT:
+        return chess.BB_KNIGHT_ATTACKS[sq]
+    attacks = 0
+    if pt != chess.ROOK:
+        attacks = chess.BB_DIAG_ATTACKS[sq][chess.BB_DIAG_MASKS[sq] & occupied]
+    if pt != chess.BISHOP:
+        attacks |= (chess.BB_RANK_ATTACKS[sq][chess.BB_RANK_MASKS[sq] & occupied]
+                    | chess.BB_FILE_ATTACKS[sq][chess.BB_FILE_MASKS[sq] & occupied])
+    return attacks
+
+
+def activity_terms(board: chess.Board, mobility: bool = True,
+                   king_safety: bool = True) -> tuple[int, int]:
+    """(mg, eg) mobility and king-zone attack score, White positive."""
+    mg = eg = 0
+    occupied = board.occupied
+    for color in chess.COLORS:
+        sign     = 1 if color == chess.WHITE else -1
+        own      = board.occupied_co[color]
+        free     = ~own & ~_pawn_attacks(board.pawns & board.occupied_co[not color], not color)
+        zone     = _KING_ZONE[board.king(not color)] if king_safety else 0
+        units = attackers = 0
+        for pt in (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN):
+            for sq in chess.scan_forward(board.pieces_mask(pt, color)):
+                attacks = _attacks(pt, sq, occupied)
+                if mobility:
+                    count = chess.popcount(attacks & free) - MOBILITY_BASE[pt]
+                    mg += sign * MOBILITY_MG[pt] * count
+                    eg += sign * MOBILITY_EG[pt] * count
+                if attacks & zone:
+                    attackers += 1
+                    units     += KING_ATTACK_UNITS[pt] * chess.popcount(attacks & zone)
+        if attackers >= 2:
+            mg += sign * KING_DANGER[min(units, len(KING_DANGER) - 1)]
+    return mg, eg
+
+
+def extra_terms(board: chess.Board, pkey: int) -> tuple[int, int]:
+    """(mg, eg) of every switched-on term beyond the piece-square tables."""
+    mg = eg = 0
+    if EVAL_SWITCHES["pawns"]:
+        mg, eg = pawn_terms(board, pkey)
+    if EVAL_SWITCHES["mobility"] or EVAL_SWITCHES["king_safety"]:
+        a_mg, a_eg = activity_terms(board, EVAL_SWITCHES["mobility"], EVAL_SWITCHES["king_safety"])
+        mg += a_mg
+        eg += a_eg
+    return mg, eg
+
+
+# ---------------------------------------------------------------------------
+# Mate scores
+# ---------------------------------------------------------------------------
+# A checkmate scores ±MATE_SCORE at the mated node; the search subtracts the
+# distance in plies from the root, so a faster mate always scores higher.
+MATE_SCORE = 99999
+MATE_BOUND = MATE_SCORE - 1000   # anything beyond this is a forced mate
+
+
+def mate_in(score: int) -> int | None:
+    """
+    Decode a searched score into moves-to-mate.
+    Positive = White mates in N, negative = Black mates in N, None = no mate.
+    """
+    if abs(score) < MATE_BOUND:
+        return None
+    plies = MATE_SCORE - abs(score)
+    moves = (plies + 1) // 2
+    return moves if score > 0 else -moves
+
+
+# Bitbase-proven wins score above any material balance but below mates
+KNOWN_WIN = 10000
+
+
+def _center_distance(square: int) -> int:
+    f, r = chess.square_file(square), chess.square_rank(square)
+    return max(3 - f, f - 4) + max(3 - r, r - 4)
+
+
+def endgame_score(board: chess.Board) -> int | None:
+    """
+    Exact-result score for positions covered by the endgame bitbases, else None.
+    Draws score 0. Wins score KNOWN_WIN plus mop-up terms (bare king to the
+    edge, kings together, pawn forward, KBNK: right-coloured corner) so the
+    search makes progress towards mate.
+    """
+    result = probe_bitbase(board)
+    if result is None:
+        return None
+    strong, wins = result
+    if not wins:
+        return 0
+
+    strong_king = board.king(strong)
+    weak_king   = board.king(not strong)
+    score = KNOWN_WIN
+    for sq in chess.scan_forward(board.occupied_co[strong] & ~board.kings):
+        pt = board.piece_type_at(sq)
+        score += PIECE_VALUES[pt]
+        if pt == chess.PAWN:
+            rank = chess.square_rank(sq) if strong == chess.WHITE else 7 - chess.square_rank(sq)
+            score += 20 * rank
+        elif pt == chess.BISHOP:
+            # Mate is only possible in a corner of the bishop's colour
+            corners = [chess.A1, chess.H8] if chess.BB_SQUARES[sq] & chess.BB_DARK_SQUARES \
+                else [chess.A8, chess.H1]
+            score -= 10 * min(chess.square_distance(weak_king, c) for c in corners)
+    score += 10 * _center_distance(weak_king)
+    score += 4 * (14 - chess.square_distance(strong_king, weak_king) * 2)
+    return score if strong == chess.WHITE else -score
+
+
+def eval_terms(board: chess.Board) -> tuple[int, int, int, int, int]:
+    """
+    (middlegame score, endgame score, phase, pawn_key, piece_key) of the pieces
+    on the board, scores White positive.
+    """
+    mg = eg = phase = 0
+    for color in chess.COLORS:
+        sq_mg, sq_eg = _SQ_MG[color], _SQ_EG[color]
+        for pt in chess.PIECE_TYPES:
+            bb = board.pieces_mask(pt, color)
+            if bb:
+                t_mg, t_eg = sq_mg[pt], sq_eg[pt]
+                for sq in chess.scan_forward(bb):
+                    mg += t_mg[sq]
+                    eg += t_eg[sq]
+                phase += PHASE_WEIGHTS[pt] * chess.popcount(bb)
+    return mg, eg, phase, pawn_key(board), piece_key(board)
+
+
+def move_terms(board: SearchBoard, terms: tuple[int, int, int, int, int]) -> tuple[int, int, int, int, int]:
+    """eval_terms after the move just pushed on `board`, updated from `terms` before it."""
+    mg, eg, phase, pkey, key = terms
+    move, victim, cap_sq = board.stack[-1][:3]
+    frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+    us   = not board.turn
+    new  = board.mailbox[to]
+    pt   = chess.PAWN if promotion else new
+    mg  += _SQ_MG[us][new][to] - _SQ_MG[us][pt][frm]
+    eg  += _SQ_EG[us][new][to] - _SQ_EG[us][pt][frm]
+    if pt == chess.PAWN:
+        pkey ^= _PAWN_ZOBRIST[us][frm]
+        if promotion:
+            phase += PHASE_WEIGHTS[new]
+            key   ^= _ZOBRIST[us][new][to]
+        else:
+            pkey ^= _PAWN_ZOBRIST[us][to]
+    else:
+        key ^= _ZOBRIST[us][pt][frm] ^ _ZOBRIST[us][pt][to]
+        if pt == chess.KING and to - frm in (2, -2):   # castling: the rook moves too
+            rank = frm & ~7
+            rook_from, rook_to = (rank + 7, rank + 5) if to > frm else (rank, rank + 3)
+            mg  += _SQ_MG[us][chess.ROOK][rook_to] - _SQ_MG[us][chess.ROOK][rook_from]
+            eg  += _SQ_EG[us][chess.ROOK][rook_to] - _SQ_EG[us][chess.ROOK][rook_from]
+            key ^= _ZOBRIST[us][chess.ROOK][rook_from] ^ _ZOBRIST[us][chess.ROOK][rook_to]
+    if victim:
+        mg    -= _SQ_MG[not us][victim][cap_sq]
+        eg    -= _SQ_EG[not us][victim][cap_sq]
+        phase -= PHASE_WEIGHTS[victim]
+        if victim == chess.PAWN:
+            pkey ^= _PAWN_ZOBRIST[not us][cap_sq]
+        else:
+            key ^= _ZOBRIST[not us][victim][cap_sq]
+    return mg, eg, phase, pkey, key
+
+
+def taper(mg: int, eg: int, phase: int) -> int:
+    phase = min(phase, PHASE_MAX)   # promotions can push it past the maximum
+    return int((mg * phase + eg * (PHASE_MAX - phase)) / PHASE_MAX)
+
+
+def static_eval(board: chess.Board, terms: tuple[int, int, int, int, int] | None = None) -> int:
+    """
+    evaluate() without the game-over checks: bitbase result or the tapered
+    terms. The search calls this at leaves it already knows are not over.
+    """
+    if chess.popcount(board.occupied) <= 4:
+        known = endgame_score(board)
+        if known is not None:
+            return known
+    mg, eg, phase, pkey, _ = terms or eval_terms(board)
+    extra_mg, extra_eg = extra_terms(board, pkey)
+    return taper(mg + extra_mg, eg + extra_eg, phase)
+
+
+def evaluate(board: chess.Board, terms: tuple[int, int, int, int, int] | None = None) -> int:
     """
     Static evaluation in centipawns.
     Positive = White advantage, negative = Black advantage.
+    terms: eval_terms(board) when the caller already has them (the search
+           keeps them up to date move by move).
     """
     if board.is_checkmate():
-        return -99999 if board.turn == chess.WHITE else 99999
+        return -MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE
     if board.is_stalemate() or board.is_insufficient_material():
         return 0
-
-    score = 0
-    for sq in chess.SQUARES:
-        piece = board.piece_at(sq)
-        if piece:
-            idx = sq if piece.color == chess.WHITE else chess.square_mirror(sq)
-            val = PIECE_VALUES[piece.piece_type] + PST[piece.piece_type][idx]
-            score += val if piece.color == chess.WHITE else -val
-    return score
+    return static_eval(board, terms)
 
 
 def score_to_winrate(score: int, turn: chess.Color) -> float:
@@ -114,30 +589,320 @@ def score_to_winrate(score: int, turn: chess.Color) -> float:
     return round(1 / (1 + math.exp(-adjusted / 400)), 3)
 
 
-def minimax(board: chess.Board, depth: int, alpha: int, beta: int, maximizing: bool) -> int:
-    """Alpha-beta pruning minimax search."""
-    if depth == 0 or board.is_game_over():
-        return evaluate(board)
+# ---------------------------------------------------------------------------
+# Transposition table
+# ---------------------------------------------------------------------------
+# Optional dict passed through the search: Zobrist key -> (depth, flag, score,
+# best move). Mate scores are stored relative to the node rather than the
+# root so an entry stays valid when the position is reached at another ply.
+# Sharing one table across consecutive positions of a game reuses most of
+# the previous search.
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+TT_MAX_ENTRIES = 500_000
+
+# The search keeps the key incrementally: pawn_key and piece_key (the other
+# pieces) travel in the eval terms and search_key adds side to move,
+# castling rights and en passant. The result equals
+# chess.polyglot.zobrist_hash, at a fraction of the cost.
+_RANDOM  = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+_ZOBRIST = [[[_RANDOM[64 * (2 * (pt - 1) + color) + sq] for sq in chess.SQUARES] if pt else []
+             for pt in range(7)] for color in (chess.BLACK, chess.WHITE)]
+
+
+def _castling_keys() -> dict[int, int]:
+    """Castling-rights bitboard (rook corners) -> its key part, for all 16 combinations."""
+    keys = {}
+    for rights in range(16):
+        bb = key = 0
+        for bit, (corner, index) in enumerate(((chess.BB_H1, 768), (chess.BB_A1, 769),
+                                              (chess.BB_H8, 770), (chess.BB_A8, 771))):
+            if rights >> bit & 1:
+                bb  |= corner
+                key ^= _RANDOM[index]
+        keys[bb] = key
+    return keys
+
+
+_CASTLING_KEYS = _castling_keys()
+
+
+def piece_key(board: chess.Board) -> int:
+    """Zobrist key part of the knights, bishops, rooks, queens and kings."""
+    key = 0
+    for color in chess.COLORS:
+        for pt in (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING):
+            for sq in chess.scan_forward(board.pieces_mask(pt, color)):
+                key ^= _ZOBRIST[color][pt][sq]
+    return key
+
+
+def search_key(board: chess.Board, terms: tuple[int, int, int, int, int]) -> int:
+    """The polyglot Zobrist key of the board, from its pawn_key and piece_key in `terms`."""
+    key = terms[3] ^ terms[4] ^ _CASTLING_KEYS[board.castling_rights & chess.BB_CORNERS]
+    if board.turn == chess.WHITE:
+        key ^= _RANDOM[780]
+    ep = board.ep_square
+    if ep is not None and chess.BB_PAWN_ATTACKS[not board.turn][ep] & board.pawns & board.occupied_co[board.turn]:
+        key ^= _RANDOM[772 + chess.square_file(ep)]
+    return key
+
+
+def _score_to_tt(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+# ---------------------------------------------------------------------------
+# Search control
+# ---------------------------------------------------------------------------
+# A SearchControl passed to minimax counts nodes and aborts the search (by
+# raising SearchAborted) on a node limit, a deadline or a stop request from
+# another thread. Limits are checked every CHECK_INTERVAL nodes. search_root
+# searches its own SearchBoard, so an abort leaves the caller's board intact.
+CHECK_INTERVAL = 256
+
+
+class SearchAborted(Exception):
+    pass
+
+
+class SearchControl:
+    def __init__(self, max_nodes: int | None = None, deadline: float | None = None):
+        self.nodes      = 0
+        self.max_nodes  = max_nodes
+        self.deadline   = deadline    # time.perf_counter() value, or None
+        self.stopped    = False       # set from another thread to stop
+        self.next_check = CHECK_INTERVAL if max_nodes is None else min(CHECK_INTERVAL, max_nodes)
+
+    def check(self) -> None:
+        if (self.stopped
+                or (self.max_nodes is not None and self.nodes >= self.max_nodes)
+                or (self.deadline is not None and time.perf_counter() >= self.deadline)):
+            raise SearchAborted
+        self.next_check = self.nodes + CHECK_INTERVAL
+        if self.max_nodes is not None:
+            self.next_check = min(self.next_check, self.max_nodes)
+
+
+def minimax(
+    board: SearchBoard,
+    depth: int,
+    alpha: int,
+    beta: int,
+    maximizing: bool,
+    pv: list[int] | None = None,
+    ply: int = 0,
+    tt: dict | None = None,
+    ctl: SearchControl | None = None,
+    terms: tuple[int, int, int, int, int] | None = None,
+    reps: dict[int, int] | None = None,
+) -> int:
+    """
+    Alpha-beta pruning minimax search over a SearchBoard (int moves; see
+    searchboard.py). search_root is the chess.Board entry point.
+    If `pv` is given, it is filled with the principal variation from this node.
+    ply: distance from the root, used to prefer faster mates.
+    tt: optional transposition table (see above); cutoffs from it shorten the pv.
+    ctl: optional node counting and limits (see SearchControl).
+    terms: eval_terms(board), computed here if not given; children get theirs
+           incrementally via move_terms.
+    reps: Zobrist key -> count of the positions on the path to this node and
+          in the game before the root (search_root fills it from the move
+          stack); reaching one again below the root scores a draw.
+
+    Game over is found without python-chess's game-over API: mate and
+    stalemate from an empty move loop (at a leaf, only mate, and only when in
+    check), repetitions from `reps`, the 50-move rule and bare minor pieces
+    from counters.
+    """
+    if ctl is not None:
+        ctl.nodes += 1
+        if ctl.nodes >= ctl.next_check:
+            ctl.check()
+    if terms is None:
+        terms = eval_terms(board)
+    if reps is None:
+        reps = {}
+    key = search_key(board, terms)
+    if ply > 0 and (key in reps or board.halfmove_clock >= 100
+                    or (terms[2] <= 1 and not board.pawns)):
+        if pv is not None:
+            pv.clear()
+        return 0
+    if depth == 0:
+        if pv is not None:
+            pv.clear()
+        if board.is_check() and not board.has_legal_move():
+            return -MATE_SCORE + ply if board.turn == chess.WHITE else MATE_SCORE - ply
+        return static_eval(board, terms)
+
+    tt_move = None
+    if tt is not None:
+        entry = tt.get(key)
+        if entry is not None:
+            tt_depth, flag, value, tt_move = entry
+            value = _score_from_tt(value, ply)
+            if tt_depth >= depth and (flag == TT_EXACT
+                                      or (flag == TT_LOWER and value >= beta)
+                                      or (flag == TT_UPPER and value <= alpha)):
+                if pv is not None:
+                    pv[:] = [tt_move] if tt_move is not None else []
+                return value
+    # Captures first; quiet moves are only generated if no capture cuts off.
+    # The TT move (checked against key collisions) goes before both.
+    moves = board.staged_moves()
+    if tt_move is not None and board.is_pseudo_legal_hint(tt_move):
+        moves = itertools.chain((tt_move,), (m for m in moves if m != tt_move))
+    alpha_orig, beta_orig = alpha, beta
+
+    reps[key] = reps.get(key, 0) + 1
+    child_pv: list[int] = []
+    best_move = None
     if maximizing:
         best = -999999
-        for move in board.legal_moves:
+        for move in moves:
             board.push(move)
-            best = max(best, minimax(board, depth - 1, alpha, beta, False))
+            if board.left_in_check():
+                board.pop()
+                continue
+            val = minimax(board, depth - 1, alpha, beta, False, child_pv, ply + 1, tt, ctl,
+                          move_terms(board, terms), reps)
             board.pop()
+            if val > best:
+                best = val
+                best_move = move
+                if pv is not None:
+                    pv[:] = [move] + child_pv
             alpha = max(alpha, best)
             if beta <= alpha:
                 break
-        return best
     else:
         best = 999999
-        for move in board.legal_moves:
+        for move in moves:
             board.push(move)
-            best = min(best, minimax(board, depth - 1, alpha, beta, True))
+            if board.left_in_check():
+                board.pop()
+                continue
+            val = minimax(board, depth - 1, alpha, beta, True, child_pv, ply + 1, tt, ctl,
+                          move_terms(board, terms), reps)
             board.pop()
+            if val < best:
+                best = val
+                best_move = move
+                if pv is not None:
+                    pv[:] = [move] + child_pv
             beta = min(beta, best)
             if beta <= alpha:
                 break
-        return best
+    if reps[key] == 1:
+        del reps[key]
+    else:
+        reps[key] -= 1
+
+    if best_move is None:   # no legal moves
+        if pv is not None:
+            pv.clear()
+        if not board.is_check():
+            return 0
+        return -MATE_SCORE + ply if board.turn == chess.WHITE else MATE_SCORE - ply
+
+    if tt is not None:
+        if best <= alpha_orig:
+            flag = TT_UPPER
+        elif best >= beta_orig:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        if len(tt) >= TT_MAX_ENTRIES:
+            tt.clear()
+        tt[key] = (depth, flag, _score_to_tt(best, ply), best_move)
+    return best
+
+
+def game_reps(board: chess.Board) -> dict[int, int]:
+    """
+    minimax's `reps` for a search from `board`: its key and those of the
+    positions before it back to the last pawn move or capture (earlier ones
+    cannot come back).
+    """
+    reps: dict[int, int] = {}
+    history = board.copy()
+    while True:
+        key = chess.polyglot.zobrist_hash(history)
+        reps[key] = reps.get(key, 0) + 1
+        if not history.move_stack or history.halfmove_clock == 0:
+            return reps
+        history.pop()
+
+
+def search_root(
+    board: chess.Board,
+    depth: int,
+    moves: list[chess.Move] | None = None,
+    tt: dict | None = None,
+    ctl: SearchControl | None = None,
+    n: int | None = None,
+) -> list[tuple[chess.Move, int, list[chess.Move]]]:
+    """
+    Search the root moves and return (move, score, pv) per move; pv starts
+    with the move.
+    n: None scores every move exactly (full window) and keeps input order.
+       Otherwise only the best n need exact scores: the first n moves get a
+       full window, each later one a null window around the n-th best score
+       so far, re-searched with an open window only when it beats that score.
+       Exact lines come first, then the rest with a bound score (no better
+       than the n-th best), each group in input order.
+    tt: optional transposition table shared with later searches.
+    ctl: optional node counting and limits; raises SearchAborted when hit.
+    """
+    if moves is None:
+        moves = list(board.legal_moves)
+    is_white = board.turn == chess.WHITE
+    search   = SearchBoard(board)
+    terms    = eval_terms(board)
+    reps     = game_reps(board)
+    exact, bounded = [], []
+    top: list[int] = []   # best n exact scores so far, best first
+
+    def probe(alpha: int, beta: int, child_terms) -> tuple[int, list[int]]:
+        pv: list[int] = []
+        val = minimax(search, depth - 1, alpha, beta, not is_white, pv, 1, tt, ctl,
+                      child_terms, reps)
+        return val, pv
+
+    for move in moves:
+        search.push(encode(move))
+        child_terms = move_terms(search, terms)
+        if n is None or len(top) < n:
+            val, pv = probe(-999999, 999999, child_terms)
+            is_exact = True
+        else:
+            cut = top[n - 1]
+            val, pv = probe(cut, cut + 1, child_terms) if is_white else probe(cut - 1, cut, child_terms)
+            is_exact = val > cut if is_white else val < cut
+            if is_exact:   # fail-high: beats the n-th best, so its exact score is needed
+                val, pv = probe(cut, 999999, child_terms) if is_white else probe(-999999, cut, child_terms)
+                is_exact = val > cut if is_white else val < cut
+        search.pop()
+        line = (move, val, [move] + [decode(m) for m in pv])
+        if is_exact:
+            exact.append(line)
+            if n is not None:
+                top = sorted(top + [val], reverse=is_white)[:n]
+        else:
+            bounded.append(line)
+    return exact + bounded
 
 
 def get_best_move(
@@ -145,49 +910,88 @@ def get_best_move(
     depth: int,
     blunder_pct: float = 0.0,
     aggression: float = 0.0,
-) -> tuple[chess.Move | None, int]:
+    with_pv: bool = False,
+) -> tuple:
     """
     Return (best_move, score_after_best_move).
     blunder_pct: probability of playing a random move (beginner simulation).
     aggression: 0.0–1.0; adds a bonus (up to 50 cp) for captures and checks.
+    with_pv: return (best_move, score, pv) instead, where pv is the principal
+             variation starting with best_move and score is its searched value.
+             The pv is empty when the move was not searched (simulated blunder).
     """
     moves = list(board.legal_moves)
     if not moves:
-        return None, 0
+        return (None, 0, []) if with_pv else (None, 0)
 
     random.shuffle(moves)
 
     if blunder_pct > 0 and random.random() < blunder_pct:
-        return random.choice(moves), 0
+        move = random.choice(moves)
+        return (move, 0, []) if with_pv else (move, 0)
+
+    # The aggression bonus can promote any capture or check, so it needs every score exact
+    lines = search_root(board, depth, moves, n=None if aggression > 0 else 1)
+    best_move, best_clean_val, best_pv = pick_root_move(board, lines, aggression)
+    if with_pv:
+        return best_move, best_clean_val, best_pv
+    return best_move, best_clean_val
 
+
+def pick_root_move(
+    board: chess.Board,
+    lines: list[tuple[chess.Move, int, list[chess.Move]]],
+    aggression: float = 0.0,
+) -> tuple[chess.Move, int, list[chess.Move]]:
+    """
+    The (move, score, pv) line to play from search_root output.
+    aggression: 0.0–1.0; adds a bonus (up to 50 cp) for captures and checks
+    when ranking; the returned score is the clean searched value.
+    """
     is_white = board.turn == chess.WHITE
-    best_move = moves[0]
+    best_move, best_clean_val, best_pv = lines[0][0], 0, [lines[0][0]]
     best_val = -999999 if is_white else 999999
-    best_clean_val = 0
 
     aggression_bonus = round(aggression * 50)
 
-    for move in moves:
-        is_capture = board.is_capture(move)  # check before push
-        board.push(move)
-        val = minimax(board, depth - 1, -999999, 999999, not is_white)
+    for move, val, pv in lines:
         # Apply aggression bonus for captures and checks (ordering only)
-        if aggression_bonus > 0:
-            gives_check = board.is_check()
-            if is_capture or gives_check:
-                ordering_val = val + aggression_bonus if is_white else val - aggression_bonus
-            else:
-                ordering_val = val
+        if aggression_bonus > 0 and (board.is_capture(move) or board.gives_check(move)):
+            ordering_val = val + aggression_bonus if is_white else val - aggression_bonus
         else:
             ordering_val = val
-        board.pop()
 
         if (is_white and ordering_val > best_val) or (not is_white and ordering_val < best_val):
             best_val = ordering_val
             best_move = move
             best_clean_val = val  # track the clean score for the winning move
+            best_pv = pv
 
-    return best_move, best_clean_val
+    return best_move, best_clean_val, best_pv
+
+
+def get_top_moves(board: chess.Board, depth: int, n: int, tt: dict | None = None) -> list[dict]:
+    """
+    Return the N best moves for the side to move, best first.
+
+    Each entry is {"move": Move, "score": int, "pv": [Move, ...]} where score is
+    the searched White-perspective score and pv starts with the move itself.
+    All lines come from one root search in which only moves that could
+    still reach the top N get a full-window search (see search_root).
+    """
+    lines = search_root(board, depth, tt=tt, n=max(n, 1))
+    lines.sort(key=lambda line: line[1], reverse=board.turn == chess.WHITE)
+    return [{"move": m, "score": s, "pv": pv} for m, s, pv in lines[:max(n, 0)]]
+
+
+def pv_to_san(board: chess.Board, pv: list[chess.Move]) -> list[str]:
+    """Convert a move sequence starting at `board` into SAN strings."""
+    b = board.copy(stack=False)
+    sans = []
+    for move in pv:
+        sans.append(b.san(move))
+        b.push(move)
+    return sans
 
 
 def classify_move(delta_cp: int) -> tuple[str, str]:
@@ -211,46 +1015,140 @@ def board_from_state(state: dict) -> chess.Board:
 
 
 # ---------------------------------------------------------------------------
-# Opening name database (ECO-inspired, covering the most common lines)
+# Opening classification (full ECO table, position-keyed)
 # ---------------------------------------------------------------------------
-OPENINGS: list[tuple[str, str]] = [
-    # (move prefix in SAN space-separated, opening name)
-    ("e4 e5 Nf3 Nc6 Bb5",        "Ruy López (Spanish Opening)"),
-    ("e4 e5 Nf3 Nc6 Bc4",        "Italian Game"),
-    ("e4 e5 Nf3 Nc6 d4",         "Scotch Game"),
-    ("e4 e5 Nf3 f5",             "Latvian Gambit"),
-    ("e4 e5 f4",                 "King's Gambit"),
-    ("e4 c5",                    "Sicilian Defense"),
-    ("e4 e6",                    "French Defense"),
-    ("e4 c6",                    "Caro-Kann Defense"),
-    ("e4 d5",                    "Scandinavian Defense"),
-    ("e4 Nf6",                   "Alekhine's Defense"),
-    ("d4 d5 c4",                 "Queen's Gambit"),
-    ("d4 d5 c4 e6 Nc3 Nf6 Bg5", "Queen's Gambit Declined"),
-    ("d4 d5 c4 c6",              "Slav Defense"),
-    ("d4 Nf6 c4 g6",             "King's Indian Defense"),
-    ("d4 Nf6 c4 e6 g3",         "Catalan Opening"),
-    ("d4 Nf6 c4 c5",             "Benoni Defense"),
-    ("d4 f5",                    "Dutch Defense"),
-    ("c4",                       "English Opening"),
-    ("Nf3 d5 c4",                "Réti Opening"),
-    ("e4 e5",                    "Open Game (King's Pawn)"),
-    ("d4 d5",                    "Closed Game (Queen's Pawn)"),
-]
+# data/eco.tsv lists every named line as SAN from the initial position. It is
+# compiled into a hash index keyed by the Zobrist key of each position along
+# those lines: named positions map to their entry, positions inside a line
+# map to -1. Lookups are by position, so transpositions land on the same
+# name, and a game in progress only needs one lookup per move (the current
+# node is kept in the engine state). The compiled index is stored as a
+# compact binary file stamped with the TSV checksum and loaded on first use.
+
+ECO_TSV        = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data", "eco.tsv"))
+ECO_INDEX      = os.path.splitext(ECO_TSV)[0] + ".idx"
+ECO_USER_INDEX = os.path.expanduser("~/.chess_coach/cache/eco.idx")
+
+_ECO_MAGIC  = b"ECOIDX1\0"
+_ECO_HEADER = struct.Struct("<8sII")   # magic, crc32 of eco.tsv, record count
+_ECO_RECORD = struct.Struct("<Qh")     # zobrist key, entry (-1 = unnamed book position)
+
+_eco_entries: list[tuple[str, str, str]] | None = None   # (eco, name, moves)
+_eco_index:   dict[int, int] | None = None
+_eco_max_ply = 0
+
+
+def _read_eco_tsv(path: str = ECO_TSV) -> tuple[list[tuple[str, str, str]], int]:
+    """Parse eco.tsv into (eco, name, moves) entries plus the file's crc32."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    entries = []
+    for line in raw.decode("utf-8").splitlines():
+        if line and not line.startswith("#"):
+            eco, name, moves = line.split("\t")
+            entries.append((eco, name, moves))
+    return entries, zlib.crc32(raw)
+
+
+def compile_eco_index(entries: list[tuple[str, str, str]]) -> dict[int, int]:
+    """Replay every entry and key each position on it; the first name for a position wins."""
+    index = {chess.polyglot.zobrist_hash(chess.Board()): -1}
+    for i, (_, _, moves) in enumerate(entries):
+        board = chess.Board()
+        for san in moves.split():
+            board.push_san(san)
+            index.setdefault(chess.polyglot.zobrist_hash(board), -1)
+        key = chess.polyglot.zobrist_hash(board)
+        if index[key] < 0:
+            index[key] = i
+    return index
+
+
+def write_eco_index(index: dict[int, int], crc: int, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_ECO_HEADER.pack(_ECO_MAGIC, crc, len(index)))
+        for key, entry in index.items():
+            f.write(_ECO_RECORD.pack(key, entry))
+
+
+def read_eco_index(path: str, crc: int) -> dict[int, int] | None:
+    """Load a compiled index, or None if missing, malformed or built from another TSV."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    if len(raw) < _ECO_HEADER.size:
+        return None
+    magic, file_crc, count = _ECO_HEADER.unpack_from(raw)
+    body = memoryview(raw)[_ECO_HEADER.size:]
+    if magic != _ECO_MAGIC or file_crc != crc or len(body) != count * _ECO_RECORD.size:
+        return None
+    return dict(_ECO_RECORD.iter_unpack(body))
+
+
+def _load_eco() -> tuple[list[tuple[str, str, str]], dict[int, int]]:
+    global _eco_entries, _eco_index, _eco_max_ply
+    if _eco_index is None:
+        entries, crc = _read_eco_tsv()
+        index = read_eco_index(ECO_INDEX, crc) or read_eco_index(ECO_USER_INDEX, crc)
+        if index is None:
+            index = compile_eco_index(entries)
+            try:
+                write_eco_index(index, crc, ECO_USER_INDEX)
+            except OSError:
+                pass   # read-only home: recompile next time
+        _eco_entries, _eco_index = entries, index
+        _eco_max_ply = max(len(moves.split()) for _, _, moves in entries)
+    return _eco_entries, _eco_index
+
+
+def opening_step(board: chess.Board) -> tuple[str | None, tuple[str, str] | None]:
+    """
+    Classify the position on `board` with a single index lookup.
+
+    Returns (node, (eco, name)) for a named position, (node, None) for an
+    unnamed position inside a book line and (None, None) outside the book.
+    The node is the position's hex Zobrist key. Games that leave the book can
+    still transpose back into it, so positions are probed up to the longest
+    book line; past that the lookup is skipped.
+    """
+    entries, index = _load_eco()
+    if board.ply() > _eco_max_ply:
+        return None, None
+    key = chess.polyglot.zobrist_hash(board)
+    entry = index.get(key)
+    if entry is None:
+        return None, None
+    return format(key, "016x"), (entries[entry][:2] if entry >= 0 else None)
+
+
+def classify_opening(moves_san: list[str]) -> tuple[str | None, tuple[str, str] | None]:
+    """Replay a SAN move list; return the final node and the last (eco, name) reached."""
+    board = chess.Board()
+    node, named = None, None
+    for san in moves_san:
+        board.push_san(san)
+        node, entry = opening_step(board)
+        named = entry or named
+        if board.ply() > _eco_max_ply:
+            break
+    return node, named
+
+
+def detect_eco(moves_san: list[str]) -> tuple[str, str] | None:
+    """(ECO code, opening name) for a SAN move list, or None if not recognized."""
+    return classify_opening(moves_san)[1]
 
 
 def detect_opening(moves_san: list[str]) -> str | None:
     """
-    Match the current move list against known opening patterns.
-    Returns the opening name or None if not recognized.
-    Tries longest match first.
+    Name the opening of a SAN move list, or None if not recognized.
+    Games that leave the book keep the last name they reached.
     """
-    move_str = " ".join(moves_san)
-    # Sort by length descending to find the most specific match
-    for prefix, name in sorted(OPENINGS, key=lambda x: -len(x[0])):
-        if move_str.startswith(prefix):
-            return name
-    return None
+    named = detect_eco(moves_san)
+    return named[1] if named else None
 
 
 # ---------------------------------------------------------------------------
@@ -265,42 +1163,40 @@ ELO_ACPL_SLOPE = 6        # ELO points lost per 1 cp of average loss
 ELO_BASE = 1800           # ELO at ACPL = 0
 ELO_BLUNDER_PENALTY = 40  # ELO penalty per 1% blunder rate
 ELO_MIN, ELO_MAX = 400, 2200
+BLUNDER_CP = 150          # cp loss at or above which a move counts as a blunder
 
 
-def estimate_elo(records: list[dict], player: str = "white") -> dict:
-    """
-    Estimate ELO from game records for a given player ("white" or "black").
+def move_cp_loss(record: dict) -> int:
+    """CP loss of a recorded move from the moving side's perspective (0 if it gained)."""
+    before = record["score_before_cp"]
+    after  = record["score_after_cp"]
+    if record["player"] == "white":
+        return max(0, before - after)   # white wants score to rise
+    return max(0, after - before)       # black wants score to fall
 
-    Method:
-      1. Compute Average Centipawn Loss (ACPL) for the player's moves.
-      2. Compute blunder rate (blunders / total moves).
-      3. ELO ≈ BASE - ACPL * SLOPE - blunder_rate_pct * PENALTY
-      4. Clamp to [ELO_MIN, ELO_MAX].
 
-    Returns a dict with elo, acpl, blunder_count, blunder_rate, move_count.
-    """
-    player_records = [r for r in records if r["player"] == player]
-    if not player_records:
-        return {"elo": None, "acpl": None, "blunder_count": 0,
-                "blunder_rate": 0.0, "move_count": 0, "note": "no moves"}
+# Running totals kept in the game state (state["stats"]) as moves are made,
+# so a live estimate never has to rescan the move records.
+def new_game_stats() -> dict:
+    return {color: {"moves": 0, "cp_loss": 0, "blunders": 0} for color in ("white", "black")}
 
-    cp_losses = []
-    blunder_count = 0
 
-    for r in player_records:
-        before = r["score_before_cp"]
-        after  = r["score_after_cp"]
-        # CP loss from the moving side's perspective (positive = loss)
-        if r["player"] == "white":
-            loss = max(0, before - after)   # white wants score to rise
-        else:
-            loss = max(0, after - before)   # black wants score to fall
-        cp_losses.append(loss)
-        if loss >= 150:
-            blunder_count += 1
+def add_move_stats(stats: dict, record: dict) -> None:
+    """Fold one move record into the running totals."""
+    loss = move_cp_loss(record)
+    side = stats[record["player"]]
+    side["moves"]   += 1
+    side["cp_loss"] += loss
+    side["blunders"] += loss >= BLUNDER_CP
 
-    move_count   = len(player_records)
-    acpl         = sum(cp_losses) / move_count
+
+def elo_from_totals(move_count: int, cp_loss: int, blunder_count: int) -> dict:
+    """ELO estimate from aggregate counts (see estimate_elo for the method)."""
+    if not move_count:
+        return {"elo": None, "acpl": None, "blunder_count": 0,
+                "blunder_rate": 0.0, "move_count": 0, "note": "no moves"}
+
+    acpl         = cp_loss / move_count
     blunder_rate = blunder_count / move_count          # 0–1
     blunder_rate_pct = blunder_rate * 100              # 0–100
 
@@ -317,6 +1213,30 @@ def estimate_elo(records: list[dict], player: str = "white") -> dict:
     }
 
 
+def estimate_elo(records: list[dict], player: str = "white", stats: dict | None = None) -> dict:
+    """
+    Estimate ELO from game records for a given player ("white" or "black").
+
+    Method:
+      1. Compute Average Centipawn Loss (ACPL) for the player's moves.
+      2. Compute blunder rate (blunders / total moves).
+      3. ELO ≈ BASE - ACPL * SLOPE - blunder_rate_pct * PENALTY
+      4. Clamp to [ELO_MIN, ELO_MAX].
+
+    stats: the game's running totals (state["stats"]); when given, the
+    records are not scanned.
+
+    Returns a dict with elo, acpl, blunder_count, blunder_rate, move_count.
+    """
+    if stats:
+        side = stats[player]
+        return elo_from_totals(side["moves"], side["cp_loss"], side["blunders"])
+
+    losses = [move_cp_loss(r) for r in records if r["player"] == player]
+    return elo_from_totals(len(losses), sum(losses),
+                           sum(1 for loss in losses if loss >= BLUNDER_CP))
+
+
 def elo_to_level(elo: int | None) -> str:
     """Map an ELO estimate to engine difficulty level."""
     if elo is None or elo < 900:
@@ -11,19 +11,29 @@ Commands:
 
 All output: JSON to stdout.
 State is persisted to the given FILE after every command.
+
+The cmd_* functions are also driven in-process by sessions.py: when args
+carries a `session` (a sessions.GameSession) its in-memory state and board are
+used instead of --state, and `search` / `persona_data` replace the local
+get_best_move call and the persona file read.
 """
 
 import argparse
 import json
 import random
+import re
 import sys
 import os
+import uuid
 
 sys.path.insert(0, os.path.dirname(__file__))
 from common import (
-    evaluate, score_to_winrate, get_best_move,
-    board_from_state, detect_opening,
+    evaluate, score_to_winrate, get_best_move, pv_to_san,
+    board_from_state, opening_step, estimate_elo, new_game_stats, add_move_stats,
 )
+from mate import find_mate, mate_score
+from book import book_move, resolve_book
+from tactics import detect_motifs, new_motifs
 
 import chess
 
@@ -33,6 +43,18 @@ import chess
 DEPTH_MAP    = {"beginner": 1, "intermediate": 2, "advanced": 3}
 BLUNDER_MAP  = {"beginner": 0.25, "intermediate": 0.0, "advanced": 0.0}
 
+# new_game choices (the CLI's, and what sessions/server accept)
+COLORS = ("white", "black")
+LEVELS = ("auto", "beginner", "intermediate", "advanced")
+MODES  = ("play", "coach")
+
+# Persona ids are file names in the persona dirs: no separators or dots
+PERSONA_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Forced-mate probe before every AI move (all-checks mates, bounded nodes)
+MATE_PROBE_MOVES = 3
+MATE_PROBE_NODES = 20000
+
 BUNDLED_PERSONA_DIR_DEFAULT = os.path.normpath(
     os.path.join(os.path.dirname(__file__), "..", "personas")
 )
@@ -40,6 +62,8 @@ BUNDLED_PERSONA_DIR_DEFAULT = os.path.normpath(
 
 def load_persona_for_engine(persona_id: str, bundled_dir: str) -> dict | None:
     """Load persona from user dir then bundled dir. Returns None if not found."""
+    if not PERSONA_ID.fullmatch(persona_id):
+        return None
     user_dir = os.path.expanduser("~/.chess_coach/personas")
     for directory in [user_dir, bundled_dir]:
         path = os.path.join(directory, f"{persona_id}.json")
@@ -115,6 +139,24 @@ def save_state(state: dict, path: str) -> None:
         json.dump(state, f, indent=2, ensure_ascii=False)
 
 
+def open_game(args) -> tuple[dict, chess.Board]:
+    """State and board for a command: the in-process session's, else from --state."""
+    session = getattr(args, "session", None)
+    if session is not None:
+        return session.state, session.board
+    state = load_state(args.state)
+    return state, board_from_state(state)
+
+
+def commit_game(args, state: dict, board: chess.Board) -> None:
+    """Persist after a command: mark the session dirty, or write --state."""
+    session = getattr(args, "session", None)
+    if session is not None:
+        session.state, session.board, session.dirty = state, board, True
+    else:
+        save_state(state, args.state)
+
+
 def make_move_record(
     move: chess.Move,
     san: str,
@@ -122,9 +164,15 @@ def make_move_record(
     actor: str,
     score_before: int,
     score_after: int,
+    search: dict | None = None,
 ) -> dict:
-    """Build a move record dict for storage in state['move_records']."""
-    return {
+    """
+    Build a move record dict for storage in state['move_records'].
+    search: optional engine output for AI moves
+            (search_score_cp, search_depth, pv_uci, pv_san), or
+            {"book": True} for opening-book moves.
+    """
+    record = {
         "move_san":        san,
         "move_uci":        move.uci(),
         "player":          player,  # "white" or "black"
@@ -134,6 +182,26 @@ def make_move_record(
         "winrate_white":   score_to_winrate(score_after, chess.WHITE),
         "coaching":        None,    # filled later by coach.py
     }
+    if search:
+        record.update(search)
+    return record
+
+
+def update_stats(state: dict, record: dict) -> None:
+    """Fold the just-appended record into state["stats"] (rebuilt once for older states)."""
+    if "stats" not in state:
+        state["stats"] = new_game_stats()
+        for r in state["move_records"][:-1]:
+            add_move_stats(state["stats"], r)
+    add_move_stats(state["stats"], record)
+
+
+def update_opening(state: dict, board: chess.Board) -> None:
+    """Classify the new position (one index lookup); the last name sticks after the book ends."""
+    node, named = opening_step(board)
+    state["opening_node"] = node
+    if named:
+        state["eco"], state["opening"] = named
 
 
 def check_game_over(board: chess.Board, state: dict) -> None:
@@ -161,6 +229,7 @@ def cmd_new_game(args) -> dict:
         "black" if args.color == "white" else "white":    "ai",
     }
     state = {
+        "game_id":      uuid.uuid4().hex,   # identity for the explorer index
         "color":        args.color,
         "player_name":  human_name,
         "players":      players,   # {"white": name_or_"ai", "black": name_or_"ai"}
@@ -172,8 +241,11 @@ def cmd_new_game(args) -> dict:
         "move_count":   0,
         "result":       None,
         "opening":      None,
+        "eco":          None,
+        "opening_node": None,   # ECO index node of the current position (None = out of book)
+        "stats":        new_game_stats(),   # running ACPL / blunder totals per color
     }
-    save_state(state, args.state)
+    commit_game(args, state, board)
     return {
         "ok":             True,
         "fen":            board.fen(),
@@ -185,8 +257,7 @@ def cmd_new_game(args) -> dict:
 
 
 def cmd_move(args) -> dict:
-    state = load_state(args.state)
-    board = board_from_state(state)
+    state, board = open_game(args)
 
     score_before = evaluate(board)
     turn_before  = board.turn
@@ -205,15 +276,13 @@ def cmd_move(args) -> dict:
     state["moves_uci"].append(move.uci())
     state["moves_san"].append(san)
     state["move_records"].append(record)
+    update_stats(state, record)
     state["move_count"] += 1
 
-    # Update opening detection
-    opening = detect_opening(state["moves_san"])
-    if opening:
-        state["opening"] = opening
+    update_opening(state, board)
 
     check_game_over(board, state)
-    save_state(state, args.state)
+    commit_game(args, state, board)
 
     return {
         "ok":            True,
@@ -230,12 +299,12 @@ def cmd_move(args) -> dict:
         "result":        state["result"],
         "moves_san":     state["moves_san"],
         "opening":       state.get("opening"),
+        "eco":           state.get("eco"),
     }
 
 
 def cmd_ai_move(args) -> dict:
-    state = load_state(args.state)
-    board = board_from_state(state)
+    state, board = open_game(args)
 
     if board.is_game_over():
         return {"ok": False, "error": "Game is already over."}
@@ -251,17 +320,26 @@ def cmd_ai_move(args) -> dict:
 
     persona_id = getattr(args, "persona", None)
     if persona_id:
-        bundled_dir = getattr(args, "bundled_persona_dir",
-                              BUNDLED_PERSONA_DIR_DEFAULT)
-        persona = load_persona_for_engine(persona_id, bundled_dir)
+        persona = getattr(args, "persona_data", None)
+        if persona is None:
+            bundled_dir = getattr(args, "bundled_persona_dir",
+                                  BUNDLED_PERSONA_DIR_DEFAULT)
+            persona = load_persona_for_engine(persona_id, bundled_dir)
+
+    # Polyglot book: --book overrides the persona's own book
+    book_path = getattr(args, "book", None) or (persona or {}).get("book")
+    if book_path:
+        opening_move = book_move(resolve_book(book_path), board)
+    from_book = opening_move is not None
 
     if persona:
+        state["persona"] = persona.get("id", persona_id)   # for per-persona stats
         depth      = persona.get("depth", 2)
         blunder_pc = persona.get("blunder_rate", 0.0)
         aggression = persona.get("aggression", 0.0)
-        # Opening book: use persona's preferred move if within first 10 moves
+        # No book hit: fall back to the persona's preferred first moves
         move_num   = state.get("move_count", 0)
-        if move_num < 10:
+        if move_num < 10 and not opening_move:
             pref_moves = persona.get("opening_moves", {}).get(player, [])
             for san in pref_moves:
                 try:
@@ -277,29 +355,55 @@ def cmd_ai_move(args) -> dict:
         blunder_pc = BLUNDER_MAP.get(level, 0.0)
         aggression = 0.0
 
-    if opening_move:
+    search    = None
+    mate_line = find_mate(board, MATE_PROBE_MOVES, checks_only=True,
+                          node_limit=MATE_PROBE_NODES)
+    if mate_line:
+        # Never fumble a forced mate — it overrides book, persona and blunders
+        move   = mate_line[0]
+        search = {
+            "search_score_cp": mate_score(mate_line, board.turn == chess.WHITE),
+            "search_depth":    len(mate_line),
+            "pv_uci":          [m.uci() for m in mate_line],
+            "pv_san":          pv_to_san(board, mate_line),
+            "mate_in":         (len(mate_line) + 1) // 2,
+        }
+    elif opening_move:
         move = opening_move
+        if from_book:
+            search = {"book": True}
     else:
-        move, _ = get_best_move(board, depth, blunder_pc, aggression)
+        search_fn = getattr(args, "search", None) or get_best_move
+        move, search_score, pv = search_fn(board, depth, blunder_pc, aggression,
+                                           with_pv=True)
         if not move:
             return {"ok": False, "error": "No legal moves available."}
+        if pv:
+            search = {
+                "search_score_cp": search_score,
+                "search_depth":    depth,
+                "pv_uci":          [m.uci() for m in pv],
+                "pv_san":          pv_to_san(board, pv),
+            }
 
     san = board.san(move)
+    motifs_before = detect_motifs(board)
     board.push(move)
     score_after = evaluate(board)
 
-    record = make_move_record(move, san, player, actor, score_before, score_after)
+    record = make_move_record(move, san, player, actor, score_before, score_after, search)
+    # Motifs the move created, stored so coach.py explain_ai needs no replay
+    record["tactics"] = new_motifs(motifs_before, detect_motifs(board))
     state["moves_uci"].append(move.uci())
     state["moves_san"].append(san)
     state["move_records"].append(record)
+    update_stats(state, record)
     state["move_count"] += 1
 
-    opening = detect_opening(state["moves_san"])
-    if opening:
-        state["opening"] = opening
+    update_opening(state, board)
 
     check_game_over(board, state)
-    save_state(state, args.state)
+    commit_game(args, state, board)
 
     return {
         "ok":            True,
@@ -316,13 +420,15 @@ def cmd_ai_move(args) -> dict:
         "result":        state["result"],
         "moves_san":     state["moves_san"],
         "opening":       state.get("opening"),
+        "eco":           state.get("eco"),
+        "pv_san":        record.get("pv_san"),
+        "book":          record.get("book", False),
         "persona_used":  persona.get("id") if persona else None,
     }
 
 
 def cmd_status(args) -> dict:
-    state = load_state(args.state)
-    board = board_from_state(state)
+    state, board = open_game(args)
     score = evaluate(board)
     return {
         "ok":            True,
@@ -339,12 +445,16 @@ def cmd_status(args) -> dict:
         "mode":          state.get("mode"),
         "color":         state.get("color"),
         "opening":       state.get("opening"),
+        "eco":           state.get("eco"),
+        "live_elo":      {
+            color: estimate_elo(state["move_records"], color, state.get("stats"))
+            for color in ("white", "black")
+        },
     }
 
 
 def cmd_legal(args) -> dict:
-    state = load_state(args.state)
-    board = board_from_state(state)
+    state, board = open_game(args)
     return {
         "ok": True,
         "legal_moves": [
@@ -363,12 +473,9 @@ def main():
 
     # new_game
     ng = sub.add_parser("new_game")
-    ng.add_argument("--color",  default="white",
-                    choices=["white", "black"])
-    ng.add_argument("--level",  default="auto",
-                    choices=["auto", "beginner", "intermediate", "advanced"])
-    ng.add_argument("--mode",   default="play",
-                    choices=["play", "coach"])
+    ng.add_argument("--color",  default="white", choices=COLORS)
+    ng.add_argument("--level",  default="auto",  choices=LEVELS)
+    ng.add_argument("--mode",   default="play",  choices=MODES)
     ng.add_argument("--player", default="human",
                     help="Human player's nickname (stored in game record)")
     ng.add_argument("--state",  default="~/.chess_coach/current_game.json")
@@ -385,6 +492,8 @@ def main():
                     help="Persona ID to use for AI move")
     ai.add_argument("--bundled-persona-dir", default=BUNDLED_PERSONA_DIR_DEFAULT,
                     help="Path to bundled personas directory")
+    ai.add_argument("--book",                default=None,
+                    help="Polyglot .bin opening book (overrides the persona's book)")
 
     # status
     st = sub.add_parser("status")
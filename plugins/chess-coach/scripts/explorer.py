@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+explorer.py — Position-frequency opening explorer.
+
+Commands:
+  index  [--games-dir DIR] [--db FILE]   Backfill the index from archived games
+
+All output: JSON to stdout.
+
+Also imported by profile.py (update), pgn_adapter.py and persona.py (explore).
+
+The index is a SQLite table keyed by (Zobrist key, actor, move) holding how
+often the move was played, the mover's wins/draws/losses and the summed
+centipawn loss. It is a WITHOUT ROWID table, so the rows for one position are
+contiguous in the primary-key B-tree and a lookup is a single range scan.
+Games are recorded under a hash of their identity (the state's game_id,
+else the archive file name) and moves, so indexing the same game twice
+(re-imported PGN, re-run backfill) is a no-op while two games that happen
+to share moves and result both count.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+import chess
+import chess.polyglot
+
+DEFAULT_DB = os.path.expanduser("~/.chess_coach/explorer.db")
+GAMES_DIR  = os.path.expanduser("~/.chess_coach/games")
+
+# Positions deeper than this are rarely shared between games
+EXPLORER_PLIES = 40
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS moves (
+    key      INTEGER NOT NULL,   -- Zobrist key as signed 64-bit
+    actor    TEXT    NOT NULL,
+    move     TEXT    NOT NULL,   -- UCI
+    games    INTEGER NOT NULL DEFAULT 0,
+    wins     INTEGER NOT NULL DEFAULT 0,
+    draws    INTEGER NOT NULL DEFAULT 0,
+    losses   INTEGER NOT NULL DEFAULT 0,
+    cp_loss  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, actor, move)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS games (
+    hash TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+UPSERT = """
+INSERT INTO moves (key, actor, move, games, wins, draws, losses, cp_loss)
+VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+ON CONFLICT (key, actor, move) DO UPDATE SET
+    games   = games   + 1,
+    wins    = wins    + excluded.wins,
+    draws   = draws   + excluded.draws,
+    losses  = losses  + excluded.losses,
+    cp_loss = cp_loss + excluded.cp_loss
+"""
+
+
+def _signed(key: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def connect(path: str = DEFAULT_DB) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)   # wait out concurrent writers
+    # One transaction per game: WAL avoids an fsync of the main file per commit
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def game_hash(state: dict, source: str | None = None) -> str:
+    """
+    Hash of one game: its game_id (or `source`, the archive file name) and
+    moves. Without either, a content hash of moves, players and result (the
+    only key before games had an identity).
+    """
+    identity = state.get("game_id") or source
+    if identity is None:
+        payload = json.dumps([state.get("moves_uci", []), state.get("players", {}),
+                              state.get("result")], sort_keys=True)
+    else:
+        payload = json.dumps([identity, state.get("moves_uci", [])])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _outcome(result: str | None, player: str) -> tuple[int, int, int]:
+    """(win, draw, loss) for `player` given a "1-0" / "0-1" / "1/2-1/2" result."""
+    if result == "1/2-1/2":
+        return 0, 1, 0
+    if result in ("1-0", "0-1"):
+        won = (result == "1-0") == (player == "white")
+        return (1, 0, 0) if won else (0, 0, 1)
+    return 0, 0, 0   # unfinished / unknown
+
+
+def index_game(conn: sqlite3.Connection, state: dict, plies: int = EXPLORER_PLIES,
+               source: str | None = None) -> bool:
+    """
+    Add one game (engine state dict) to the index. Returns False if already
+    indexed. source: the archive file name, identifying games without a game_id.
+    """
+    digest = game_hash(state, source)
+    legacy = game_hash(state)
+    with conn:
+        # A game indexed under its content hash (before it had an identity) counts once
+        if legacy != digest and conn.execute("SELECT 1 FROM games WHERE hash = ?",
+                                             (legacy,)).fetchone():
+            return False
+        if conn.execute("INSERT OR IGNORE INTO games VALUES (?)", (digest,)).rowcount == 0:
+            return False
+        board = chess.Board()
+        rows = []
+        records = state.get("move_records", [])
+        for i, uci in enumerate(state.get("moves_uci", [])[:plies]):
+            move = chess.Move.from_uci(uci)
+            if move not in board.legal_moves:
+                break
+            r      = records[i] if i < len(records) else {}
+            player = "white" if board.turn == chess.WHITE else "black"
+            actor  = r.get("actor") or state.get("players", {}).get(player, "unknown")
+            before = r.get("score_before_cp", 0)
+            after  = r.get("score_after_cp", 0)
+            loss   = max(0, before - after) if player == "white" else max(0, after - before)
+            rows.append((_signed(chess.polyglot.zobrist_hash(board)), actor, uci,
+                         *_outcome(state.get("result"), player), loss))
+            board.push(move)
+        conn.executemany(UPSERT, rows)
+    return True
+
+
+def index_archive(conn: sqlite3.Connection, games_dir: str) -> dict:
+    added = skipped = 0
+    for path in sorted(glob.glob(os.path.join(games_dir, "*.json"))):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            skipped += 1
+            continue
+        if index_game(conn, state, source=os.path.basename(path)):
+            added += 1
+        else:
+            skipped += 1
+    return {"added": added, "skipped": skipped}
+
+
+def explore(conn: sqlite3.Connection, board: chess.Board, actor: str | None = None) -> list[dict]:
+    """Moves played from this position (optionally by one actor), most frequent first."""
+    sql = ("SELECT move, SUM(games), SUM(wins), SUM(draws), SUM(losses), SUM(cp_loss) "
+           "FROM moves WHERE key = ?")
+    params: list = [_signed(chess.polyglot.zobrist_hash(board))]
+    if actor:
+        sql += " AND actor = ?"
+        params.append(actor)
+    sql += " GROUP BY move ORDER BY SUM(games) DESC"
+
+    moves = []
+    for uci, games, wins, draws, losses, cp_loss in conn.execute(sql, params):
+        move = chess.Move.from_uci(uci)
+        if move not in board.legal_moves:
+            continue   # Zobrist collision
+        decided = wins + draws + losses
+        moves.append({
+            "move_san":     board.san(move),
+            "move_uci":     uci,
+            "games":        games,
+            "wins":         wins,
+            "draws":        draws,
+            "losses":       losses,
+            "score":        round((wins + draws / 2) / decided, 3) if decided else None,
+            "avg_cp_loss":  round(cp_loss / games, 1),
+        })
+    return moves
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+def cmd_index(args) -> dict:
+    conn = connect(args.db)
+    return {"ok": True, "db": args.db, **index_archive(conn, args.games_dir)}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Opening explorer index")
+    sub = p.add_subparsers(dest="command")
+
+    ix = sub.add_parser("index")
+    ix.add_argument("--games-dir", default=GAMES_DIR)
+    ix.add_argument("--db",        default=DEFAULT_DB)
+
+    args = p.parse_args()
+    if not args.command:
+        p.print_help()
+        sys.exit(1)
+    args.games_dir = os.path.expanduser(args.games_dir)
+    args.db        = os.path.expanduser(args.db)
+
+    dispatch = {
+        "index": cmd_index,
+    }
+    result = dispatch[args.command](args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+mate.py — Forced-mate solver.
+
+Imported by engine.py, coach.py and bench.py.
+Do not run directly.
+
+Depth-first AND/OR search with iterative deepening on the number of moves:
+the attacker needs one move that mates against every defence, the defender
+needs one reply that escapes. Attacker moves are ordered checks first, then
+captures, then quiet moves; on the final move only checks are tried, since
+nothing else can mate. Positions already proven not to be mate-in-n are
+cached by Zobrist key.
+"""
+
+import chess
+import chess.polyglot
+
+from common import MATE_SCORE
+
+
+class NodeLimitReached(Exception):
+    """Raised internally when a solve exceeds its node budget."""
+
+
+class MateSolver:
+    def __init__(self, checks_only: bool = False, node_limit: int | None = None):
+        """
+        checks_only: only consider checking moves for the attacker (much
+                     faster, finds the forcing mates coaching cares about).
+        node_limit:  give up (no mate reported) after this many nodes.
+        """
+        self.checks_only = checks_only
+        self.node_limit  = node_limit
+        self.nodes       = 0
+        self._no_mate: dict[int, int] = {}   # zobrist -> largest n proven to fail
+
+    def _tick(self) -> None:
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise NodeLimitReached
+
+    def _attacker_moves(self, board: chess.Board, n: int) -> list[chess.Move]:
+        checks, captures, quiet = [], [], []
+        for move in board.legal_moves:
+            if board.gives_check(move):
+                checks.append(move)
+            elif n > 1 and not self.checks_only:
+                (captures if board.is_capture(move) else quiet).append(move)
+        return checks + captures + quiet
+
+    def attack(self, board: chess.Board, n: int) -> list[chess.Move] | None:
+        """Side to move mates in at most n moves: return the line, else None."""
+        key = chess.polyglot.zobrist_hash(board)
+        if self._no_mate.get(key, 0) >= n:
+            return None
+        for move in self._attacker_moves(board, n):
+            self._tick()
+            board.push(move)
+            if board.is_checkmate():
+                board.pop()
+                return [move]
+            line = self.defend(board, n - 1) if n > 1 else None
+            board.pop()
+            if line is not None:
+                return [move] + line
+        self._no_mate[key] = max(self._no_mate.get(key, 0), n)
+        return None
+
+    def defend(self, board: chess.Board, n: int) -> list[chess.Move] | None:
+        """
+        Every reply of the side to move loses to mate in at most n moves.
+        Returns the longest-resisting line, or None if some reply escapes.
+        """
+        if board.is_game_over():
+            return None   # stalemate / draw; checkmate is caught by attack()
+        longest = None
+        for reply in board.legal_moves:
+            self._tick()
+            board.push(reply)
+            line = self.attack(board, n)
+            board.pop()
+            if line is None:
+                return None
+            if longest is None or len(line) + 1 > len(longest):
+                longest = [reply] + line
+        return longest
+
+    def solve(self, board: chess.Board, max_moves: int) -> list[chess.Move] | None:
+        """Shortest forced mate of at most max_moves moves, as a move list."""
+        board = board.copy(stack=False)
+        try:
+            for n in range(1, max_moves + 1):
+                line = self.attack(board, n)
+                if line is not None:
+                    return line
+        except NodeLimitReached:
+            pass
+        return None
+
+
+def find_mate(
+    board: chess.Board,
+    max_moves: int,
+    checks_only: bool = False,
+    node_limit: int | None = None,
+) -> list[chess.Move] | None:
+    """Return the shortest forced mate (attacker and defender moves) or None."""
+    return MateSolver(checks_only, node_limit).solve(board, max_moves)
+
+
+def is_mating_move(board: chess.Board, move: chess.Move, moves_left: int,
+                   checks_only: bool = False) -> bool:
+    """True if `move` keeps a forced mate in at most moves_left moves (move included)."""
+    board = board.copy(stack=False)
+    board.push(move)
+    if board.is_checkmate():
+        return True
+    if moves_left <= 1:
+        return False
+    return MateSolver(checks_only).defend(board, moves_left - 1) is not None
+
+
+def mate_score(line: list[chess.Move], white_to_move: bool) -> int:
+    """Mate-distance score (White perspective) for a mating line from the root."""
+    score = MATE_SCORE - len(line)
+    return score if white_to_move else -score
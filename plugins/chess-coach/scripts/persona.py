@@ -5,8 +5,16 @@ persona.py — Persona management for chess-coach.
 Commands:
   list         [--bundled-dir DIR] [--user-dir DIR]
   show         --id ID [--bundled-dir DIR] [--user-dir DIR]
-  extract      --actor NAME --id ID [--games-dir DIR]
-  import_pgn   --pgn FILE --player NAME --id ID [--output PATH]
+  extract      --actor NAME --id ID [--games-dir DIR] [--book FILE]
+  import_pgn   --pgn FILE --player NAME --id ID [--output PATH] [--book FILE] [--engine CMD]
+  explore      (--fen FEN | --moves "e4 e5 ...") [--actor NAME] [--db FILE]
+
+--book also compiles a Polyglot opening book from the same games and stores
+its path in the persona, so engine.py ai_move --persona plays from it.
+
+explore answers "what was played from this position and how did it score?"
+from the explorer index (explorer.py), filled by profile.py update and PGN
+imports. --actor restricts it to one player or persona name.
 
 Output: JSON to stdout.
 """
@@ -17,12 +25,17 @@ import json
 import os
 import subprocess
 import sys
+import sqlite3
 import tempfile
 from collections import Counter
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(__file__))
 from common import estimate_elo, elo_to_level
+import book
+import explorer
+
+import chess
 
 BUNDLED_DIR_DEFAULT = os.path.join(os.path.dirname(__file__), "..", "personas")
 USER_DIR_DEFAULT    = os.path.expanduser("~/.chess_coach/personas")
@@ -169,6 +182,9 @@ def cmd_extract(args) -> dict:
         "created_at":     datetime.now().isoformat(),
         **machine,
     }
+    if args.book:
+        persona["book"] = book.build(book.games_from_archive(args.games_dir, args.actor),
+                                     args.book)["path"]
 
     return {"ok": True, "persona": persona}
 
@@ -179,7 +195,9 @@ def cmd_import_pgn(args) -> dict:
     with tempfile.TemporaryDirectory(prefix="pgn_games_") as tmp_dir:
         r = subprocess.run(
             [sys.executable, adapter,
-             "--pgn", args.pgn, "--player", args.player, "--output", tmp_dir],
+             "--pgn", args.pgn, "--player", args.player, "--output", tmp_dir,
+             "--explorer-db", args.explorer_db]
+            + (["--engine", args.engine] if args.engine else []),
             capture_output=True, text=True
         )
 
@@ -212,6 +230,9 @@ def cmd_import_pgn(args) -> dict:
             "created_at":     datetime.now().isoformat(),
             **machine,
         }
+        if args.book:
+            persona["book"] = book.build(book.games_from_pgn(args.pgn, args.player),
+                                         args.book)["path"]
 
         if args.output:
             os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
@@ -221,6 +242,32 @@ def cmd_import_pgn(args) -> dict:
     return {"ok": True, "persona": persona}
 
 
+def cmd_explore(args) -> dict:
+    try:
+        board = chess.Board(args.fen) if args.fen else chess.Board()
+    except ValueError as e:
+        return {"ok": False, "error": f"Invalid FEN: {e}"}
+    if args.moves:
+        try:
+            for san in args.moves.split():
+                board.push_san(san)
+        except ValueError as e:
+            return {"ok": False, "error": f"Illegal move sequence: {e}"}
+    if not os.path.exists(args.db):
+        return {"ok": False, "error": f"No explorer index at {args.db}; finish or import some games first."}
+    try:
+        moves = explorer.explore(explorer.connect(args.db), board, args.actor)
+    except sqlite3.Error as e:
+        return {"ok": False, "error": f"Explorer index unreadable: {e}"}
+    return {
+        "ok":    True,
+        "fen":   board.fen(),
+        "actor": args.actor,
+        "games": sum(m["games"] for m in moves),
+        "moves": moves,
+    }
+
+
 def main():
     p = argparse.ArgumentParser(description="Persona manager")
     sub = p.add_subparsers(dest="command")
@@ -238,6 +285,8 @@ def main():
     ex.add_argument("--actor",     required=True)
     ex.add_argument("--id",        required=True)
     ex.add_argument("--games-dir", default=GAMES_DIR_DEFAULT)
+    ex.add_argument("--book",      default=None,
+                    help="Also compile a Polyglot opening book to this path")
     ex.add_argument("--bundled-dir", default=BUNDLED_DIR_DEFAULT)
     ex.add_argument("--user-dir",    default=USER_DIR_DEFAULT)
 
@@ -246,27 +295,43 @@ def main():
     ip.add_argument("--player", required=True)
     ip.add_argument("--id",     required=True)
     ip.add_argument("--output", default=None)
+    ip.add_argument("--book",   default=None,
+                    help="Also compile a Polyglot opening book to this path")
+    ip.add_argument("--explorer-db", default=explorer.DEFAULT_DB)
+    ip.add_argument("--engine", default=None,
+                    help="UCI engine command to score the imported moves (default: static eval)")
     ip.add_argument("--bundled-dir", default=BUNDLED_DIR_DEFAULT)
     ip.add_argument("--user-dir",    default=USER_DIR_DEFAULT)
 
+    xp = sub.add_parser("explore")
+    xp.add_argument("--fen",   default=None)
+    xp.add_argument("--moves", default=None,
+                    help="SAN moves from --fen (or the start position)")
+    xp.add_argument("--actor", default=None)
+    xp.add_argument("--db",    default=explorer.DEFAULT_DB)
+
     args = p.parse_args()
 
     if not args.command:
         p.print_help()
         sys.exit(1)
 
-    args.bundled_dir = os.path.expanduser(args.bundled_dir)
-    args.user_dir    = os.path.expanduser(args.user_dir)
     if hasattr(args, "games_dir"):
         args.games_dir = os.path.expanduser(args.games_dir)
     if hasattr(args, "output") and args.output:
         args.output = os.path.expanduser(args.output)
+    for attr in ("bundled_dir", "user_dir", "db", "explorer_db"):
+        if hasattr(args, attr):
+            setattr(args, attr, os.path.expanduser(getattr(args, attr)))
+    if getattr(args, "book", None):
+        args.book = os.path.abspath(os.path.expanduser(args.book))
 
     dispatch = {
         "list":       cmd_list,
         "show":       cmd_show,
         "extract":    cmd_extract,
         "import_pgn": cmd_import_pgn,
+        "explore":    cmd_explore,
     }
     result = dispatch[args.command](args)
     print(json.dumps(result, ensure_ascii=False, indent=2))
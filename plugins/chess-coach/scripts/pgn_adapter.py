@@ -3,24 +3,42 @@
 pgn_adapter.py — Convert PGN files to internal game record format.
 
 Usage:
-  python3 pgn_adapter.py --pgn FILE --player NAME --output DIR
+  python3 pgn_adapter.py --pgn FILE --player NAME --output DIR [--explorer-db FILE | --no-explorer]
+                         [--engine CMD] [--engine-depth D]
+
+Converted games are also added to the opening explorer index (explorer.py).
+Move scores are the static evaluation, or with --engine a search of every
+position by that UCI engine (backends.py).
 """
 
 import argparse
+import hashlib
 import io
 import json
 import os
+import sqlite3
 import sys
+import uuid
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(__file__))
-from common import evaluate, score_to_winrate, detect_opening
+from common import evaluate, score_to_winrate, detect_opening, new_game_stats, add_move_stats
+from backends import get_backend, EngineError
+import explorer
 
 import chess
 import chess.pgn
 
 
-def convert_game(game: chess.pgn.Game, player_name: str) -> dict | None:
+def position_score(board: chess.Board, backend=None, depth: int = 0) -> int:
+    """Static eval, or the backend's searched score (game-over positions stay static)."""
+    if backend is None or board.is_game_over():
+        return evaluate(board)
+    return backend.top_moves(board, depth, 1)[0]["score"]
+
+
+def convert_game(game: chess.pgn.Game, player_name: str, backend=None,
+                 depth: int = 0) -> dict | None:
     headers = game.headers
     white   = headers.get("White", "")
     black   = headers.get("Black", "")
@@ -42,15 +60,16 @@ def convert_game(game: chess.pgn.Game, player_name: str) -> dict | None:
     move_records = []
     moves_uci    = []
     moves_san    = []
+    score_after  = position_score(board, backend, depth)
 
     for node in game.mainline():
         move         = node.move
         color        = "white" if board.turn == chess.WHITE else "black"
         actor        = players[color]
-        score_before = evaluate(board)
+        score_before = score_after
         san          = board.san(move)
         board.push(move)
-        score_after  = evaluate(board)
+        score_after  = position_score(board, backend, depth)
 
         move_records.append({
             "move_san":        san,
@@ -66,8 +85,16 @@ def convert_game(game: chess.pgn.Game, player_name: str) -> dict | None:
         moves_san.append(san)
 
     opening = detect_opening(moves_san)
+    stats   = new_game_stats()
+    for r in move_records:
+        add_move_stats(stats, r)
+
+    # The same PGN game always gets the same id, so re-importing it is
+    # recognised by the explorer index
+    game_id = "pgn-" + hashlib.sha1(json.dumps(dict(headers), sort_keys=True).encode()).hexdigest()[:16]
 
     return {
+        "game_id":      game_id,
         "player_name":  player_name,
         "players":      players,
         "color":        player_color,
@@ -79,6 +106,7 @@ def convert_game(game: chess.pgn.Game, player_name: str) -> dict | None:
         "move_count":   len(move_records),
         "result":       result,
         "opening":      opening,
+        "stats":        stats,
         "pgn_white":    white,
         "pgn_black":    black,
     }
@@ -89,6 +117,12 @@ def main():
     p.add_argument("--pgn",    required=True)
     p.add_argument("--player", required=True)
     p.add_argument("--output", required=True)
+    p.add_argument("--explorer-db", default=explorer.DEFAULT_DB)
+    p.add_argument("--no-explorer", action="store_true",
+                   help="Do not add the games to the opening explorer index")
+    p.add_argument("--engine", default=None,
+                   help="UCI engine command to score positions (default: static evaluation)")
+    p.add_argument("--engine-depth", type=int, default=12)
     args = p.parse_args()
 
     args.pgn    = os.path.expanduser(args.pgn)
@@ -98,24 +132,41 @@ def main():
     with open(args.pgn) as f:
         content = f.read()
 
+    backend       = get_backend(args.engine) if args.engine else None
     pgn_io        = io.StringIO(content)
     games_written = 0
+    indexed       = 0
+    conn          = None
+    if not args.no_explorer:
+        try:
+            conn = explorer.connect(os.path.expanduser(args.explorer_db))
+        except sqlite3.Error as e:
+            print(f"Warning: explorer index unavailable: {e}", file=sys.stderr)
 
     while True:
         game = chess.pgn.read_game(pgn_io)
         if game is None:
             break
-        record = convert_game(game, args.player)
+        try:
+            record = convert_game(game, args.player, backend, args.engine_depth)
+        except EngineError as e:
+            print(json.dumps({"ok": False, "error": str(e)}, indent=2))
+            return
         if record is None:
             continue
+        # Random suffix: two imports in the same second must not overwrite each other
         ts     = datetime.now().strftime(f"%Y%m%d_%H%M%S_{games_written:04d}")
-        out    = os.path.join(args.output, f"game_{ts}.json")
+        out    = os.path.join(args.output, f"game_{ts}_{uuid.uuid4().hex[:8]}.json")
         with open(out, "w") as f:
             json.dump(record, f, indent=2, ensure_ascii=False)
         games_written += 1
+        if conn is not None:
+            indexed += explorer.index_game(conn, record)
 
     print(json.dumps({"ok": True, "games_written": games_written,
-                      "output_dir": args.output}, indent=2))
+                      "explorer_indexed": indexed,
+                      "output_dir": args.output,
+                      **({"backend": backend.stats()} if backend else {})}, indent=2))
 
 
 if __name__ == "__main__":
@@ -4,11 +4,28 @@ profile.py — Player profile management.
 
 Commands:
   load       [--profile FILE]            Print current profile as JSON
-  update     --state FILE [--profile FILE]   Compute ELO from finished game, update profile
-  recommend  [--profile FILE]            Print recommended difficulty level
+  update     --state FILE [--profile FILE] [--games-dir DIR] [--explorer-db FILE]
+                                         Compute ELO from finished game, update profile,
+                                         add the game to the opening explorer
+  recommend  [--profile FILE] [--users ID,ID,...]
+                                         Print recommended difficulty level
+                                         (--users: many store players in one query)
+  stats      [--games-dir DIR] [--window N] [--last N]
+                                         Whole-history ACPL / accuracy / phase / opening stats
+
+Global options: --profile FILE, or --user ID [--store FILE] to select a player
+in the multi-user SQLite store (profile_store.py) instead of the JSON file.
 
 Profile file: ~/.chess_coach/profile.json
+Profile store: ~/.chess_coach/profiles.db  (--user; games archived under games/users/<ID>/)
 Games index:  ~/.chess_coach/games/  (saved state files)
+Stats cache:  ~/.chess_coach/cache/stats-<hash of games dir>.npz  (per-move arrays; needs NumPy)
+
+Concurrent sessions: updates to the profile hold an advisory lock on
+<profile>.lock for the whole read-modify-write, and every file is written to
+a temp file and renamed into place, so a reader never sees half-written JSON
+and two sessions finishing together never drop a game. Archived games get a
+unique name (timestamp + random suffix).
 
 Profile schema:
   {
@@ -22,29 +39,50 @@ Profile schema:
 """
 
 import argparse
+import hashlib
 import json
 import os
+import re
 import sys
 import glob
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(__file__))
-from common import estimate_elo, elo_to_level
+from common import estimate_elo, elo_to_level, BLUNDER_CP
+import explorer
+import profile_store
+
+try:
+    import fcntl
+except ImportError:   # Windows: no advisory lock, writes are still atomic
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:   # optional: only the stats command needs it
+    np = None
 
 DEFAULT_PROFILE = os.path.expanduser("~/.chess_coach/profile.json")
 GAMES_DIR       = os.path.expanduser("~/.chess_coach/games/")
 
+STATS_CACHE_DIR = os.path.expanduser("~/.chess_coach/cache")
+
 # ELO smoothing: weighted average of last N games
 ELO_WINDOW = 5
 
+# Game phases for the stats command, by ply of the move
+PHASES = (("opening", 0, 20), ("middlegame", 20, 60), ("endgame", 60, 10**6))
+
 
 # ---------------------------------------------------------------------------
 # Profile I/O
 # ---------------------------------------------------------------------------
-def load_profile(path: str) -> dict:
-    if os.path.exists(path):
-        with open(path) as f:
-            return json.load(f)
+def new_profile() -> dict:
     return {
         "nickname":     None,
         "games_played": 0,
@@ -55,11 +93,87 @@ def load_profile(path: str) -> dict:
     }
 
 
-def save_profile(profile: dict, path: str) -> None:
+def load_profile(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return new_profile()
+
+
+def write_json_atomic(data: dict, path: str) -> None:
+    """Write to a temp file in the same directory, fsync, then rename over `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def profile_lock(path: str):
+    """Exclusive advisory lock on `path`.lock, held for a read-modify-write of `path`."""
     os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def save_profile(profile: dict, path: str) -> None:
     profile["last_updated"] = datetime.now().isoformat()
-    with open(path, "w") as f:
-        json.dump(profile, f, indent=2, ensure_ascii=False)
+    write_json_atomic(profile, path)
+
+
+def read_profile(args) -> dict:
+    """The selected profile: the --user row in the store, else the JSON file."""
+    if args.user:
+        return profile_store.load(profile_store.connect(args.store), args.user) or new_profile()
+    return load_profile(args.profile)
+
+
+@contextmanager
+def editing_profile(args):
+    """Read-modify-write of the selected profile under its lock; saved on exit."""
+    if args.user:
+        conn = profile_store.connect(args.store)
+        with profile_store.transaction(conn):
+            profile = profile_store.load(conn, args.user) or new_profile()
+            yield profile
+            profile["last_updated"] = datetime.now().isoformat()
+            profile_store.save(conn, args.user, profile)
+    else:
+        with profile_lock(args.profile):
+            profile = load_profile(args.profile)
+            yield profile
+            save_profile(profile, args.profile)
+
+
+def games_dir_for(args) -> str:
+    """--games-dir if given; else the shared archive, or a per-user one with --user."""
+    if args.games_dir:
+        return args.games_dir
+    if args.user:
+        return os.path.join(GAMES_DIR, "users", re.sub(r"[^\w-]", "_", args.user))
+    return GAMES_DIR
+
+
+def archive_game(state: dict, games_dir: str = GAMES_DIR) -> str:
+    """Save a finished game under a unique, chronologically sortable name."""
+    name = f"game_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}.json"
+    path = os.path.join(games_dir, name)
+    write_json_atomic(state, path)
+    return path
 
 
 # ---------------------------------------------------------------------------
@@ -75,18 +189,247 @@ def smoothed_elo(history: list[int], window: int = ELO_WINDOW) -> int | None:
     return int(weighted / sum(weights))
 
 
+# ---------------------------------------------------------------------------
+# Whole-history stats (NumPy)
+# ---------------------------------------------------------------------------
+# Every archived game is flattened once into per-game and per-move arrays
+# (only the user's moves) and cached as an .npz keyed by file name, size and
+# mtime. Later runs parse only new games; a changed or deleted file forces a
+# rebuild. All statistics are then array operations over the whole history.
+
+GAME_FIELDS = ("name", "size", "mtime", "score", "color", "opening", "persona", "offset")
+MOVE_FIELDS = ("before", "after", "ply")   # scores from the user's perspective
+
+
+def _flatten_game(state: dict) -> tuple[dict, list[tuple[int, int, int]]]:
+    color  = state.get("color", "white")
+    sign   = 1 if color == "white" else -1
+    result = state.get("result")
+    if result == "1/2-1/2":
+        score = 0.5
+    elif result in ("1-0", "0-1"):
+        score = 1.0 if (result == "1-0") == (color == "white") else 0.0
+    else:
+        score = float("nan")
+    moves = [(sign * r["score_before_cp"], sign * r["score_after_cp"], ply)
+             for ply, r in enumerate(state.get("move_records", []))
+             if r.get("player") == color]
+    game = {
+        "score":   score,
+        "color":   0 if color == "white" else 1,
+        "opening": state.get("opening") or "Unknown",
+        "persona": state.get("persona") or "none",
+    }
+    return game, moves
+
+
+def stats_cache_path(games_dir: str) -> str:
+    """The .npz cache for one games directory (each user's archive gets its own)."""
+    digest = hashlib.sha1(os.path.abspath(games_dir).encode()).hexdigest()[:16]
+    return os.path.join(STATS_CACHE_DIR, f"stats-{digest}.npz")
+
+
+def load_history(games_dir: str, cache_path: str | None = None) -> dict:
+    """
+    Per-game and per-move arrays for every archived game, via the .npz cache
+    (default: stats_cache_path(games_dir)).
+    """
+    cache_path = cache_path or stats_cache_path(games_dir)
+    files = []
+    if os.path.isdir(games_dir):
+        with os.scandir(games_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    st = entry.stat()
+                    files.append((entry.name, st.st_size, st.st_mtime_ns))
+    files.sort()
+
+    cached = None
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as z:
+                cached = {k: z[k] for k in z.files}
+        except (OSError, ValueError):
+            cached = None
+
+    games = {k: [] for k in GAME_FIELDS}
+    moves = {k: [] for k in MOVE_FIELDS}
+    known: set[str] = set()
+    if cached is not None:
+        current = {name: (size, mtime) for name, size, mtime in files}
+        names = cached["name"].tolist()
+        if all(current.get(n) == (int(s), int(m))
+               for n, s, m in zip(names, cached["size"], cached["mtime"])):
+            known = set(names)
+            for k in GAME_FIELDS:
+                games[k] = cached[k].tolist()
+            for k in MOVE_FIELDS:
+                moves[k] = cached[k].tolist()
+
+    added = 0
+    for name, size, mtime in files:
+        if name in known:
+            continue
+        try:
+            with open(os.path.join(games_dir, name)) as f:
+                game, game_moves = _flatten_game(json.load(f))
+        except (OSError, ValueError, KeyError):
+            continue
+        games["name"].append(name)
+        games["size"].append(size)
+        games["mtime"].append(mtime)
+        games["offset"].append(len(moves["ply"]))
+        for k in ("score", "color", "opening", "persona"):
+            games[k].append(game[k])
+        for before, after, ply in game_moves:
+            moves["before"].append(before)
+            moves["after"].append(after)
+            moves["ply"].append(ply)
+        added += 1
+
+    arrays = {
+        "name":    np.array(games["name"], dtype=str),
+        "size":    np.array(games["size"], dtype=np.int64),
+        "mtime":   np.array(games["mtime"], dtype=np.int64),
+        "score":   np.array(games["score"], dtype=np.float64),
+        "color":   np.array(games["color"], dtype=np.int8),
+        "opening": np.array(games["opening"], dtype=str),
+        "persona": np.array(games["persona"], dtype=str),
+        "offset":  np.array(games["offset"], dtype=np.int64),
+        "before":  np.array(moves["before"], dtype=np.int32),
+        "after":   np.array(moves["after"], dtype=np.int32),
+        "ply":     np.array(moves["ply"], dtype=np.int32),
+    }
+    # New games were appended after the cached ones; archive names sort
+    # chronologically, so restore that order before any series is computed
+    order = np.argsort(arrays["name"], kind="stable")
+    if (order != np.arange(len(order))).any():
+        counts = np.diff(np.append(arrays["offset"], len(arrays["ply"])))
+        rows   = np.concatenate([np.arange(arrays["offset"][i], arrays["offset"][i] + counts[i])
+                                 for i in order])
+        for k in GAME_FIELDS:
+            arrays[k] = arrays[k][order]
+        for k in MOVE_FIELDS:
+            arrays[k] = arrays[k][rows]
+        arrays["offset"] = np.concatenate(([0], np.cumsum(counts[order])[:-1])).astype(np.int64)
+    if added or len(known) != (0 if cached is None else len(cached["name"])):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            with open(cache_path + ".tmp", "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError:
+            pass
+    return arrays
+
+
+def _winning_chances(cp):
+    """Lichess win% (0-100) from a centipawn score."""
+    return 50 + 50 * (2 / (1 + np.exp(-0.00368208 * np.clip(cp, -1000, 1000))) - 1)
+
+
+def _grouped(keys, game_score, game_loss, game_moves, limit: int | None = None) -> list[dict]:
+    """Games, score and ACPL per distinct key, most-played first."""
+    labels, inverse = np.unique(keys, return_inverse=True)
+    finished = ~np.isnan(game_score)
+    games    = np.bincount(inverse, minlength=len(labels))
+    decided  = np.bincount(inverse, weights=finished, minlength=len(labels))
+    points   = np.bincount(inverse, weights=np.where(finished, game_score, 0), minlength=len(labels))
+    loss     = np.bincount(inverse, weights=game_loss, minlength=len(labels))
+    n_moves  = np.bincount(inverse, weights=game_moves, minlength=len(labels))
+    order    = np.argsort(-games, kind="stable")[:limit]
+    return [{
+        "key":   str(labels[i]),
+        "games": int(games[i]),
+        "score": round(float(points[i] / decided[i]), 3) if decided[i] else None,
+        "acpl":  round(float(loss[i] / n_moves[i]), 1) if n_moves[i] else None,
+    } for i in order]
+
+
+def history_stats(h: dict, window: int = 10, last: int = 20) -> dict:
+    n_games = len(h["name"])
+    before, after, ply = h["before"], h["after"], h["ply"]
+    loss = np.maximum(0, before - after)
+
+    # Lichess-style move accuracy from the drop in winning chances
+    drop     = np.maximum(0, _winning_chances(before) - _winning_chances(after))
+    accuracy = np.clip(103.1668 * np.exp(-0.04354 * drop) - 3.1669, 0, 100)
+    blunder  = loss >= BLUNDER_CP
+
+    # Per-game sums: reduceat over each game's slice of the move arrays
+    game_moves = np.diff(np.append(h["offset"], len(ply)))
+    has_moves  = game_moves > 0
+    starts     = h["offset"][has_moves]
+    game_loss = np.zeros(n_games)
+    game_acc  = np.full(n_games, np.nan)
+    game_blun = np.zeros(n_games, dtype=np.int64)
+    if len(starts):
+        game_loss[has_moves] = np.add.reduceat(loss, starts)
+        game_acc[has_moves]  = np.add.reduceat(accuracy, starts) / game_moves[has_moves]
+        game_blun[has_moves] = np.add.reduceat(blunder.astype(np.int64), starts)
+    game_acpl = np.divide(game_loss, game_moves, out=np.full(n_games, np.nan), where=has_moves)
+
+    # Rolling ACPL over the last `window` games (by total loss / total moves)
+    csum_loss  = np.concatenate(([0.0], np.cumsum(game_loss)))
+    csum_moves = np.concatenate(([0], np.cumsum(game_moves)))
+    lo = np.maximum(0, np.arange(1, n_games + 1) - window)
+    hi = np.arange(1, n_games + 1)
+    span_moves = csum_moves[hi] - csum_moves[lo]
+    rolling = np.divide(csum_loss[hi] - csum_loss[lo], span_moves,
+                        out=np.full(n_games, np.nan), where=span_moves > 0)
+
+    phases = {}
+    for name, start, end in PHASES:
+        mask = (ply >= start) & (ply < end)
+        count = int(mask.sum())
+        phases[name] = {
+            "moves":        count,
+            "acpl":         round(float(loss[mask].mean()), 1) if count else None,
+            "blunder_rate": round(float(blunder[mask].mean()), 3) if count else None,
+        }
+
+    def r(x, nd=1):
+        return None if np.isnan(x) else round(float(x), nd)
+
+    finished = ~np.isnan(h["score"])
+    tail = slice(max(0, n_games - last), n_games)
+    return {
+        "games": n_games,
+        "moves": int(len(ply)),
+        "overall": {
+            "acpl":         r(loss.mean()) if len(loss) else None,
+            "accuracy":     r(accuracy.mean()) if len(loss) else None,
+            "blunder_rate": round(float(blunder.mean()), 3) if len(loss) else None,
+            "score":        round(float(h["score"][finished].mean()), 3) if finished.any() else None,
+        },
+        "recent_games": [{
+            "file":     str(h["name"][i]),
+            "acpl":     r(game_acpl[i]),
+            "accuracy": r(game_acc[i]),
+            "blunders": int(game_blun[i]),
+            "score":    r(h["score"][i], 1),
+            "rolling_acpl": r(rolling[i]),
+        } for i in range(tail.start, tail.stop)],
+        "phases":     phases,
+        "by_color":   _grouped(np.where(h["color"] == 0, "white", "black"),
+                               h["score"], game_loss, game_moves),
+        "by_opening": _grouped(h["opening"], h["score"], game_loss, game_moves, limit=10),
+        "by_persona": _grouped(h["persona"], h["score"], game_loss, game_moves),
+    }
+
+
 # ---------------------------------------------------------------------------
 # Commands
 # ---------------------------------------------------------------------------
 def cmd_load(args) -> dict:
-    profile = load_profile(args.profile)
+    profile = read_profile(args)
     return {"ok": True, "profile": profile}
 
 
 def cmd_update(args) -> dict:
     """
     Read the completed game state, compute ELO, update profile.
-    Also archives the game file to ~/.chess_coach/games/.
+    Also archives the game file to --games-dir (~/.chess_coach/games/).
     """
     if not os.path.exists(args.state):
         return {"ok": False, "error": f"State file not found: {args.state}"}
@@ -97,26 +440,25 @@ def cmd_update(args) -> dict:
     records   = state.get("move_records", [])
     user_color = state.get("color", "white")
 
-    elo_result = estimate_elo(records, player=user_color)
+    elo_result = estimate_elo(records, player=user_color, stats=state.get("stats"))
     if elo_result["elo"] is None:
         return {"ok": False, "error": "Not enough moves to estimate ELO.", "details": elo_result}
 
-    profile = load_profile(args.profile)
-    profile["games_played"] += 1
-    profile["elo_history"].append(elo_result["elo"])
+    with editing_profile(args) as profile:
+        profile["games_played"] += 1
+        profile["elo_history"].append(elo_result["elo"])
 
-    smoothed = smoothed_elo(profile["elo_history"])
-    profile["elo_current"] = smoothed
-    profile["level"] = elo_to_level(smoothed)
+        smoothed = smoothed_elo(profile["elo_history"])
+        profile["elo_current"] = smoothed
+        profile["level"] = elo_to_level(smoothed)
 
-    save_profile(profile, args.profile)
+    archive_path = archive_game(state, games_dir_for(args))
 
-    # Archive the game
-    os.makedirs(GAMES_DIR, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    archive_path = os.path.join(GAMES_DIR, f"game_{ts}.json")
-    with open(archive_path, "w") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    try:
+        explorer.index_game(explorer.connect(args.explorer_db), state,
+                            source=os.path.basename(archive_path))
+    except sqlite3.Error as e:
+        print(f"Warning: explorer index not updated: {e}", file=sys.stderr)
 
     return {
         "ok":              True,
@@ -131,9 +473,7 @@ def cmd_update(args) -> dict:
     }
 
 
-def cmd_recommend(args) -> dict:
-    """Return the recommended difficulty level based on profile history."""
-    profile  = load_profile(args.profile)
+def recommendation(profile: dict) -> dict:
     elo      = profile.get("elo_current")
     level    = profile.get("level", "intermediate")
     games    = profile.get("games_played", 0)
@@ -148,7 +488,6 @@ def cmd_recommend(args) -> dict:
         note = f"Based on {games} games. Smoothed ELO: {elo}."
 
     return {
-        "ok":                True,
         "nickname":          nickname,
         "recommended_level": level,
         "elo_current":       elo,
@@ -157,20 +496,40 @@ def cmd_recommend(args) -> dict:
     }
 
 
+def cmd_recommend(args) -> dict:
+    """Return the recommended difficulty level based on profile history."""
+    if args.users:
+        users = [u.strip() for u in args.users.split(",") if u.strip()]
+        found = profile_store.load_many(profile_store.connect(args.store), users)
+        return {"ok": True, "players": {u: recommendation(found.get(u) or new_profile())
+                                        for u in users}}
+    return {"ok": True, **recommendation(read_profile(args))}
+
+
 def cmd_set_nickname(args) -> dict:
     """Persist the player's nickname to their profile."""
-    profile = load_profile(args.profile)
-    profile["nickname"] = args.name
-    save_profile(profile, args.profile)
+    with editing_profile(args) as profile:
+        profile["nickname"] = args.name
     return {"ok": True, "nickname": args.name}
 
 
+def cmd_stats(args) -> dict:
+    """Vectorized statistics over every archived game."""
+    if np is None:
+        return {"ok": False, "error": "profile.py stats needs NumPy (pip install numpy)."}
+    start   = time.perf_counter()
+    history = load_history(games_dir_for(args), args.cache)
+    stats   = history_stats(history, args.window, args.last)
+    return {"ok": True, **stats, "seconds": round(time.perf_counter() - start, 3)}
+
+
 def cmd_history(args) -> dict:
     """List all archived game files with basic metadata."""
-    if not os.path.exists(GAMES_DIR):
+    games_dir = games_dir_for(args)
+    if not os.path.exists(games_dir):
         return {"ok": True, "games": [], "note": "No games archived yet."}
 
-    files = sorted(glob.glob(os.path.join(GAMES_DIR, "game_*.json")))
+    files = sorted(glob.glob(os.path.join(games_dir, "game_*.json")))
     games = []
     for path in files[-20:]:   # show last 20
         try:
@@ -178,7 +537,7 @@ def cmd_history(args) -> dict:
                 s = json.load(f)
             records    = s.get("move_records", [])
             user_color = s.get("color", "white")
-            elo_data   = estimate_elo(records, player=user_color)
+            elo_data   = estimate_elo(records, player=user_color, stats=s.get("stats"))
             games.append({
                 "file":       os.path.basename(path),
                 "result":     s.get("result", "*"),
@@ -201,21 +560,45 @@ def main():
     p = argparse.ArgumentParser(description="Player profile manager")
     p.add_argument("--profile", default=DEFAULT_PROFILE,
                    help="Path to profile JSON file")
+    p.add_argument("--user",    default=None,
+                   help="Player ID in the multi-user profile store (overrides --profile)")
+    p.add_argument("--store",   default=profile_store.DEFAULT_STORE,
+                   help="Profile store database used with --user / --users")
     sub = p.add_subparsers(dest="command")
 
     sub.add_parser("load")
-    sub.add_parser("recommend")
-    sub.add_parser("history")
+    rec = sub.add_parser("recommend")
+    rec.add_argument("--users", default=None,
+                     help="Comma-separated store player IDs to recommend for in one query")
+    hst = sub.add_parser("history")
+    hst.add_argument("--games-dir", default=None)
 
     upd = sub.add_parser("update")
     upd.add_argument("--state", required=True,
                      help="Path to completed game state JSON")
+    upd.add_argument("--games-dir",   default=None,
+                     help="Archive directory for finished games")
+    upd.add_argument("--explorer-db", default=explorer.DEFAULT_DB,
+                     help="Opening explorer database to add the game to")
+
+    stt = sub.add_parser("stats")
+    stt.add_argument("--games-dir", default=None)
+    stt.add_argument("--cache",     default=None,
+                     help="Stats cache file (default: one per games directory)")
+    stt.add_argument("--window",    type=int, default=10,
+                     help="Games in the rolling ACPL window")
+    stt.add_argument("--last",      type=int, default=20,
+                     help="Recent games to list individually")
 
     sn = sub.add_parser("set_nickname")
     sn.add_argument("--name", required=True, help="Player's nickname")
 
     args = p.parse_args()
     args.profile = os.path.expanduser(args.profile)
+    args.store   = os.path.expanduser(args.store)
+    for attr in ("explorer_db", "games_dir", "cache"):
+        if getattr(args, attr, None):
+            setattr(args, attr, os.path.expanduser(getattr(args, attr)))
 
     dispatch = {
         "load":         cmd_load,
@@ -223,6 +606,7 @@ def main():
         "recommend":    cmd_recommend,
         "history":      cmd_history,
         "set_nickname": cmd_set_nickname,
+        "stats":        cmd_stats,
     }
     result = dispatch[args.command](args)
     print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,90 @@
+"""
+profile_store.py — Multi-user profile store for hosted deployments.
+
+Imported by profile.py (--user ID). Not a CLI of its own.
+
+One row per player in a SQLite database (default ~/.chess_coach/profiles.db)
+holding the same fields as the single-player profile.json; elo_history is a
+JSON array. The database runs in WAL mode, so any number of readers proceed
+while one writer commits. Writers take the write lock up front
+(BEGIN IMMEDIATE) for their whole read-modify-write, so concurrent updates of
+the same player queue instead of overwriting each other.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+DEFAULT_STORE = os.path.expanduser("~/.chess_coach/profiles.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    user          TEXT PRIMARY KEY,
+    nickname      TEXT,
+    games_played  INTEGER NOT NULL DEFAULT 0,
+    elo_history   TEXT    NOT NULL DEFAULT '[]',   -- JSON array of ints
+    elo_current   INTEGER,
+    level         TEXT    NOT NULL DEFAULT 'intermediate',
+    last_updated  TEXT
+) WITHOUT ROWID;
+"""
+
+COLUMNS = ("nickname", "games_played", "elo_history", "elo_current", "level", "last_updated")
+
+UPSERT = f"""
+INSERT INTO players (user, {", ".join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (user) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in COLUMNS)}
+"""
+
+
+def connect(path: str = DEFAULT_STORE) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Autocommit mode: transactions are opened explicitly by transaction()
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """Write transaction that holds the database write lock from the start."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _row_to_profile(row: tuple) -> dict:
+    profile = dict(zip(COLUMNS, row))
+    profile["elo_history"] = json.loads(profile["elo_history"])
+    return profile
+
+
+def load(conn: sqlite3.Connection, user: str) -> dict | None:
+    """The player's profile, or None if the user has no row yet."""
+    row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM players WHERE user = ?",
+                       (user,)).fetchone()
+    return _row_to_profile(row) if row else None
+
+
+def save(conn: sqlite3.Connection, user: str, profile: dict) -> None:
+    conn.execute(UPSERT, (user, profile.get("nickname"), profile.get("games_played", 0),
+                          json.dumps(profile.get("elo_history", [])), profile.get("elo_current"),
+                          profile.get("level", "intermediate"), profile.get("last_updated")))
+
+
+def load_many(conn: sqlite3.Connection, users: list[str]) -> dict[str, dict]:
+    """Profiles of many users in one query ({user: profile}; unknown users are absent)."""
+    rows = conn.execute(
+        f"SELECT user, {', '.join(COLUMNS)} FROM players "
+        "WHERE user IN (SELECT value FROM json_each(?))",
+        (json.dumps(users),),
+    )
+    return {row[0]: _row_to_profile(row[1:]) for row in rows}
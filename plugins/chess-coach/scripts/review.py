@@ -3,7 +3,23 @@
 review.py — Generate a Markdown game review from a saved state file.
 
 Usage:
-  python3 review.py --state FILE [--output FILE]
+  python3 review.py --state FILE [--output FILE] [--analyze-depth D] [--workers N] [--engine CMD]
+  python3 review.py batch [--games-dir DIR] [--output-dir DIR] [--workers N] [--analyze-depth D]
+                          [--engine CMD]
+
+--analyze-depth re-searches every position of the game at depth D (in a
+process pool of N workers) and classifies moves by the searched evals
+instead of the static scores stored in the move records; the move table
+then also shows the engine's best alternative. With --engine the positions
+are searched by that UCI engine instead (backends.py; N warm engine
+processes), and the reported analysis includes the backend's latency.
+
+batch reviews every game JSON in an archive into <output-dir>/<game>.md.
+Each review starts with a stamp line holding the game file's hash, the
+engine version and the analysis depth; games whose review carries the
+current stamp are skipped, so a rerun only redoes new or changed games (or
+everything after an engine change). Files are streamed and at most a few
+reviews per worker are in flight, so memory does not grow with the archive.
 
 Output sections:
   1. Game Summary  (result, players, level, ELO estimate, date)
@@ -17,13 +33,23 @@ Default output: ~/.chess_coach/reviews/<timestamp>.md
 """
 
 import argparse
+import glob
+import hashlib
 import json
 import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(__file__))
-from common import classify_move, estimate_elo, board_from_state
+from common import (
+    classify_move, estimate_elo, board_from_state, evaluate, get_top_moves, weights_id,
+    pv_to_san, score_to_winrate,
+)
+from tactics import detect_motifs, new_motifs
+import bitbase
+from backends import get_backend, EngineError
 
 import chess
 import chess.pgn
@@ -48,6 +74,99 @@ def build_pgn(state: dict) -> str:
     return str(game)
 
 
+# ---------------------------------------------------------------------------
+# Engine re-analysis
+# ---------------------------------------------------------------------------
+# Searched evals are clamped so a found mate does not swamp ACPL and the
+# blunder threshold (the same cap Lichess uses for accuracy).
+EVAL_CAP = 1000
+
+
+def _analyze_chunk(fens: list[str], depth: int) -> list[tuple[int, list[str]]]:
+    """
+    Search consecutive positions in order with one shared transposition
+    table; neighbouring positions share most of their trees.
+    Returns (White-perspective score, best line as UCI) per position.
+    """
+    tt: dict = {}
+    out = []
+    for fen in fens:
+        board = chess.Board(fen)
+        if board.is_game_over():
+            out.append((evaluate(board), []))
+            continue
+        best = get_top_moves(board, depth, 1, tt)[0]
+        out.append((best["score"], [m.uci() for m in best["pv"]]))
+    return out
+
+
+def _analyze_position(backend, board: chess.Board, depth: int) -> tuple[int, list[str]]:
+    if board.is_game_over():
+        return evaluate(board), []
+    best = backend.top_moves(board, depth, 1)[0]
+    return best["score"], [m.uci() for m in best["pv"]]
+
+
+def analyze_game(state: dict, depth: int, workers: int = 1,
+                 engine: str | None = None) -> list[dict]:
+    """
+    Search every position of the game (start through final) at `depth`.
+    Positions are split into contiguous chunks so each worker walks a run of
+    consecutive positions; workers <= 1 searches in-process.
+    engine: UCI engine command; positions are then sent to a pool of
+    `workers` engine processes from threads (the engines do the work).
+    Returns one {"score", "pv_uci"} dict per position.
+    """
+    board  = chess.Board()
+    fens   = [board.fen()]
+    boards = [board.copy()]
+    for uci in state.get("moves_uci", []):
+        board.push(chess.Move.from_uci(uci))
+        fens.append(board.fen())
+        boards.append(board.copy())
+
+    if engine:
+        backend = get_backend(engine, size=max(1, workers))
+        with ThreadPoolExecutor(max(1, workers)) as pool:
+            results = list(pool.map(lambda b: _analyze_position(backend, b, depth), boards))
+    elif workers <= 1:
+        results = _analyze_chunk(fens, depth)
+    else:
+        # Two chunks per worker evens out slow middlegame stretches
+        size   = max(1, -(-len(fens) // (workers * 2)))
+        chunks = [fens[i:i + size] for i in range(0, len(fens), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [r for part in pool.map(_analyze_chunk, chunks, [depth] * len(chunks))
+                       for r in part]
+    return [{"score": score, "pv_uci": pv} for score, pv in results]
+
+
+def apply_analysis(state: dict, analysis: list[dict]) -> list[dict]:
+    """
+    Copy of the move records with scores replaced by searched evals, plus
+    the best alternative (best_move_san / best_pv_san) for each move.
+    """
+    board   = chess.Board()
+    records = []
+    for i, r in enumerate(state.get("move_records", [])):
+        if i + 1 >= len(analysis):
+            break
+        before = max(-EVAL_CAP, min(EVAL_CAP, analysis[i]["score"]))
+        after  = max(-EVAL_CAP, min(EVAL_CAP, analysis[i + 1]["score"]))
+        pv     = [chess.Move.from_uci(u) for u in analysis[i]["pv_uci"]]
+        best_san = pv_to_san(board, pv) if pv else []
+        records.append({
+            **r,
+            "score_before_cp": before,
+            "score_after_cp":  after,
+            "winrate_white":   score_to_winrate(after, chess.WHITE),
+            "best_move_san":   best_san[0] if best_san else None,
+            "best_pv_san":     best_san,
+        })
+        board.push(chess.Move.from_uci(r["move_uci"]))
+    return records
+
+
 # ---------------------------------------------------------------------------
 # ASCII win-probability chart
 # ---------------------------------------------------------------------------
@@ -106,8 +225,13 @@ def build_move_table(records: list[dict]) -> str:
     if not records:
         return "(no moves)"
 
-    rows = ["| # | Player | Move | Quality | W Win% | Coaching |",
-            "|---|--------|------|---------|--------|---------|"]
+    searched = any("best_move_san" in r for r in records)
+    if searched:
+        rows = ["| # | Player | Move | Quality | Best | W Win% | Coaching |",
+                "|---|--------|------|---------|------|--------|---------|"]
+    else:
+        rows = ["| # | Player | Move | Quality | W Win% | Coaching |",
+                "|---|--------|------|---------|--------|---------|"]
 
     for i, r in enumerate(records):
         player   = "White ⬜" if r["player"] == "white" else "Black ⬛"
@@ -120,15 +244,35 @@ def build_move_table(records: list[dict]) -> str:
         coaching = r.get("coaching") or ""
         # First line only, truncated, pipe-escaped
         note     = coaching.split("\n")[0][:55].replace("|", "ǀ") if coaching else "—"
-        rows.append(f"| {i+1} | {player} | **{move}** | {icon} {quality} | {wr_pct} | {note} |")
+        if searched:
+            best = r.get("best_move_san") or "—"
+            rows.append(f"| {i+1} | {player} | **{move}** | {icon} {quality} | {best} | {wr_pct} | {note} |")
+        else:
+            rows.append(f"| {i+1} | {player} | **{move}** | {icon} {quality} | {wr_pct} | {note} |")
 
     return "\n".join(rows)
 
 
+# ---------------------------------------------------------------------------
+# Tactical motifs per ply
+# ---------------------------------------------------------------------------
+def tactics_by_ply(state: dict) -> list[list[dict]]:
+    """For each ply, the tactical motifs that the move newly created."""
+    board  = chess.Board()
+    before = detect_motifs(board)
+    result = []
+    for uci in state.get("moves_uci", []):
+        board.push(chess.Move.from_uci(uci))
+        after = detect_motifs(board)
+        result.append(new_motifs(before, after))
+        before = after
+    return result
+
+
 # ---------------------------------------------------------------------------
 # Blunders & mistakes
 # ---------------------------------------------------------------------------
-def build_blunders(records: list[dict]) -> str:
+def build_blunders(records: list[dict], tactics: list[list[dict]] | None = None) -> str:
     bad = []
     for i, r in enumerate(records):
         before = r["score_before_cp"]
@@ -136,17 +280,26 @@ def build_blunders(records: list[dict]) -> str:
         delta  = (after - before) if r["player"] == "white" else -(after - before)
         if delta <= -50:
             quality, icon = classify_move(delta)
+            allowed = [m["text"] for m in (tactics[i] if tactics and i < len(tactics) else [])
+                       if m["side"] != r["player"]]
             bad.append((i + 1, r["player"], r["move_san"], quality, icon, delta,
-                        r.get("coaching") or ""))
+                        r.get("coaching") or "", allowed, r.get("best_pv_san") or []))
 
     if not bad:
         return "No significant mistakes or blunders detected. Well played! 🎉"
 
     lines = []
-    for (num, player, move_san, quality, icon, delta, coaching) in bad:
+    for (num, player, move_san, quality, icon, delta, coaching, allowed, best_pv) in bad:
         side = "White" if player == "white" else "Black"
         lines.append(f"### Move {num} — {side}: **{move_san}**  {icon} {quality.upper()}")
         lines.append(f"Eval change: {delta / 100:+.2f} pawns\n")
+        if best_pv and best_pv[0] != move_san:
+            lines.append(f"Best was **{best_pv[0]}**: {' '.join(best_pv)}\n")
+        if allowed:
+            lines.append("Tactics allowed:")
+            for text in allowed[:3]:
+                lines.append(f"- {text}")
+            lines.append("")
         if coaching:
             for line in coaching.split("\n"):
                 lines.append(f"> {line}")
@@ -161,7 +314,7 @@ def build_elo_section(state: dict) -> str:
     records    = state.get("move_records", [])
     user_color = state.get("color", "white")
 
-    elo_data = estimate_elo(records, player=user_color)
+    elo_data = estimate_elo(records, player=user_color, stats=state.get("stats"))
 
     lines = []
     if elo_data["elo"] is None:
@@ -200,7 +353,15 @@ def build_elo_section(state: dict) -> str:
 # ---------------------------------------------------------------------------
 # Main generator
 # ---------------------------------------------------------------------------
-def generate_review(state: dict, output_path: str) -> dict:
+def build_review(state: dict, analysis: list[dict] | None = None) -> tuple[str, dict]:
+    """
+    The Markdown review and the ELO estimate it reports. With `analysis`
+    (from analyze_game), quality labels, ELO and the win-rate chart use the
+    searched evals.
+    """
+    if analysis is not None:
+        # Searched evals replace the recorded scores, so the running totals no longer apply
+        state = {**state, "move_records": apply_analysis(state, analysis), "stats": None}
     records    = state.get("move_records", [])
     result     = state.get("result") or "*"
     level      = state.get("level",  "?")
@@ -218,7 +379,7 @@ def generate_review(state: dict, output_path: str) -> dict:
     }.get(result, result)
 
     final_wr = records[-1]["winrate_white"] if records else 0.5
-    elo_data = estimate_elo(records, player=user_color)
+    elo_data = estimate_elo(records, player=user_color, stats=state.get("stats"))
     elo_str  = str(elo_data["elo"]) if elo_data["elo"] else "N/A"
 
     md = []
@@ -252,7 +413,7 @@ def generate_review(state: dict, output_path: str) -> dict:
 
     md.append("\n---\n")
     md.append("## ⚠️ Mistakes & Blunders\n")
-    md.append(build_blunders(records))
+    md.append(build_blunders(records, tactics_by_ply(state)))
 
     md.append("\n---\n")
     md.append("## 🎯 ELO Estimate\n")
@@ -261,10 +422,28 @@ def generate_review(state: dict, output_path: str) -> dict:
     md.append("\n---\n")
     md.append("*Generated by Chess Coach skill.*")
 
-    content = "\n".join(md)
+    return "\n".join(md), elo_data
+
+
+def generate_review(
+    state: dict,
+    output_path: str,
+    analysis: list[dict] | None = None,
+    stamp: str | None = None,
+) -> dict:
+    """
+    Write the Markdown review (see build_review).
+    stamp: optional first line (see batch mode).
+    """
+    content, elo_data = build_review(state, analysis)
+    move_count = state.get("move_count", 0)
+    if stamp:
+        content = stamp + "\n" + content
     os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         f.write(content)
+    os.replace(tmp_path, output_path)   # a stamped review is never half-written
 
     return {
         "ok":          True,
@@ -274,9 +453,150 @@ def generate_review(state: dict, output_path: str) -> dict:
     }
 
 
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+ENGINE_SOURCES   = ("common.py", "searchboard.py", "bitbase.py", "mate.py", "tactics.py", "review.py")
+MAX_BATCH_ERRORS = 20
+
+
+def engine_version() -> str:
+    """Hash of the sources and data that shape a review; changes whenever the engine does."""
+    h = hashlib.sha1()
+    for name in ENGINE_SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), "rb") as f:
+            h.update(f.read())
+    for directory in (bitbase.USER_DIR, bitbase.BUNDLED_DIR):   # endgame tables the search probes
+        for path in sorted(glob.glob(os.path.join(directory, "*.bb"))):
+            h.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                h.update(f.read())
+    h.update(weights_id.encode())   # tuned eval tables (tune.py install)
+    return h.hexdigest()[:12]
+
+
+def review_stamp(game_bytes: bytes, version: str, depth: int) -> str:
+    digest = hashlib.sha256(game_bytes).hexdigest()
+    return f"<!-- chess-coach review: game={digest} engine={version} depth={depth} -->"
+
+
+def _read_stamp(path: str) -> str | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.readline().rstrip("\n")
+    except OSError:
+        return None
+
+
+def review_file(game_path: str, output_path: str, depth: int, version: str,
+                engine: str | None = None) -> str:
+    """Review one archived game unless its review is current. Returns "reviewed" or "skipped"."""
+    with open(game_path, "rb") as f:
+        raw = f.read()
+    stamp = review_stamp(raw, version, depth)
+    if _read_stamp(output_path) == stamp:
+        return "skipped"
+    state    = json.loads(raw)
+    analysis = analyze_game(state, depth, engine=engine) if depth > 0 else None
+    generate_review(state, output_path, analysis, stamp)
+    return "reviewed"
+
+
+def _iter_games(games_dir: str):
+    with os.scandir(games_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(".json"):
+                yield entry.path
+
+
+def review_archive(games_dir: str, output_dir: str, workers: int = 1, depth: int = 0,
+                   engine: str | None = None) -> dict:
+    """Review every game in `games_dir`, keeping at most 2 * workers jobs in flight."""
+    version = engine_version()
+    if engine:   # an external engine's reviews are not the built-in's
+        version += "+" + hashlib.sha1(engine.encode()).hexdigest()[:8]
+    counts  = {"reviewed": 0, "skipped": 0, "failed": 0}
+    errors: list[dict] = []
+    start   = time.perf_counter()
+
+    def job(game_path: str) -> tuple:
+        name = os.path.splitext(os.path.basename(game_path))[0] + ".md"
+        return game_path, os.path.join(output_dir, name), depth, version, engine
+
+    def record(game_path: str, outcome) -> None:
+        """outcome: callable returning "reviewed"/"skipped" or raising."""
+        try:
+            counts[outcome()] += 1
+        except Exception as e:
+            counts["failed"] += 1
+            if len(errors) < MAX_BATCH_ERRORS:
+                errors.append({"file": os.path.basename(game_path), "error": str(e)})
+
+    os.makedirs(output_dir, exist_ok=True)
+    if workers <= 1:
+        for game_path in _iter_games(games_dir):
+            record(game_path, lambda: review_file(*job(game_path)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: dict = {}
+            for game_path in _iter_games(games_dir):
+                if len(pending) >= 2 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        record(pending.pop(fut), fut.result)
+                pending[pool.submit(review_file, *job(game_path))] = game_path
+            for fut in list(pending):
+                record(pending.pop(fut), fut.result)
+
+    elapsed = time.perf_counter() - start
+    games   = counts["reviewed"] + counts["skipped"] + counts["failed"]
+    return {
+        "ok":             True,
+        "engine_version": version,
+        "games":          games,
+        **counts,
+        "seconds":        round(elapsed, 2),
+        "games_per_sec":  round(games / elapsed, 1) if elapsed else None,
+        "reviews_per_sec": round(counts["reviewed"] / elapsed, 1) if elapsed else None,
+        "errors":         errors,
+    }
+
+
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------
+def cmd_batch(args) -> dict:
+    if not os.path.isdir(args.games_dir):
+        return {"ok": False, "error": f"Games directory not found: {args.games_dir}"}
+    return review_archive(args.games_dir, args.output_dir, args.workers, args.analyze_depth,
+                          args.engine)
+
+
+def cmd_review(args) -> dict:
+    with open(args.state) as f:
+        state = json.load(f)
+
+    analysis = None
+    if args.analyze_depth > 0:
+        start    = time.perf_counter()
+        try:
+            analysis = analyze_game(state, args.analyze_depth, args.workers, args.engine)
+        except EngineError as e:
+            return {"ok": False, "error": str(e)}
+        elapsed  = time.perf_counter() - start
+
+    result = generate_review(state, args.output, analysis)
+    if analysis is not None:
+        result["analysis"] = {
+            "depth":     args.analyze_depth,
+            "workers":   args.workers,
+            "positions": len(analysis),
+            "seconds":   round(elapsed, 2),
+            "backend":   get_backend(args.engine).stats(),
+        }
+    return result
+
+
 def main():
     p = argparse.ArgumentParser(description="Generate a Markdown game review")
     p.add_argument("--state",  default="~/.chess_coach/current_game.json")
@@ -284,14 +604,33 @@ def main():
     default_out = os.path.expanduser(f"~/.chess_coach/reviews/review_{ts}.md")
     p.add_argument("--output", default=default_out)
 
+    p.add_argument("--analyze-depth", type=int, default=0,
+                   help="Re-search every position at this depth (0 = use stored scores)")
+    p.add_argument("--workers",       type=int, default=os.cpu_count() or 1,
+                   help="Processes for --analyze-depth")
+    p.add_argument("--engine",        default=None,
+                   help="UCI engine command for --analyze-depth (default: built-in search)")
+
+    sub = p.add_subparsers(dest="command")
+    bt = sub.add_parser("batch", help="Review every game in an archive")
+    bt.add_argument("--games-dir",     default="~/.chess_coach/games")
+    bt.add_argument("--output-dir",    default="~/.chess_coach/reviews/archive")
+    bt.add_argument("--workers",       type=int, default=os.cpu_count() or 1)
+    bt.add_argument("--analyze-depth", type=int, default=0)
+    bt.add_argument("--engine",        default=None)
+
     args = p.parse_args()
     args.state  = os.path.expanduser(args.state)
     args.output = os.path.expanduser(args.output)
+    if args.command == "batch":
+        args.games_dir  = os.path.expanduser(args.games_dir)
+        args.output_dir = os.path.expanduser(args.output_dir)
 
-    with open(args.state) as f:
-        state = json.load(f)
-
-    result = generate_review(state, args.output)
+    dispatch = {
+        None:    cmd_review,
+        "batch": cmd_batch,
+    }
+    result = dispatch[args.command](args)
     print(json.dumps(result, ensure_ascii=False, indent=2))
 
 
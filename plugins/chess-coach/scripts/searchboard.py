@@ -0,0 +1,373 @@
+"""
+searchboard.py — Compact board for the search's inner loop.
+
+Library module (no CLI). Imported by common.py (minimax) and bench.py.
+
+python-chess's Board.push/pop and legal_moves are built for correctness
+and convenience: Move objects, a copy of the board state per push, lazy
+legality checks. The search only needs make/unmake and the moves, so
+SearchBoard keeps:
+
+  - a mailbox (piece type per square, 0 = empty) and python-chess style
+    bitboards (per piece type, per colour, occupied);
+  - moves as ints: from | to << 6 | promotion << 12 (see encode / decode);
+  - an undo stack of (move, captured piece, capture square, castling
+    rights, en passant square, halfmove clock), so pop restores in place.
+
+Moves are generated pseudo-legally; the search pushes each one and skips
+it if left_in_check(), so legality costs one attack test per move actually
+searched. castling_rights, ep_square, turn, halfmove_clock and the
+bitboard attributes mirror chess.Board's, so the evaluation (and the
+bitbase probe) read a SearchBoard as they read a chess.Board. Standard
+chess only (no Chess960 castling).
+
+chess.Board stays the API boundary: build a SearchBoard from one, search,
+and decode the resulting moves. perft() checks the move generator against
+python-chess (tests/test_searchboard.py, bench.py perft).
+"""
+
+import chess
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = chess.PIECE_TYPES
+WHITE, BLACK = chess.WHITE, chess.BLACK
+
+_BB           = chess.BB_SQUARES
+_KNIGHT       = chess.BB_KNIGHT_ATTACKS
+_KING         = chess.BB_KING_ATTACKS
+_PAWN_ATTACKS = chess.BB_PAWN_ATTACKS
+_DIAG_MASKS, _DIAG = chess.BB_DIAG_MASKS, chess.BB_DIAG_ATTACKS
+_RANK_MASKS, _RANK = chess.BB_RANK_MASKS, chess.BB_RANK_ATTACKS
+_FILE_MASKS, _FILE = chess.BB_FILE_MASKS, chess.BB_FILE_ATTACKS
+_PROMOTIONS   = (QUEEN << 12, KNIGHT << 12, ROOK << 12, BISHOP << 12)
+_BACK_RANK    = [chess.BB_RANK_8, chess.BB_RANK_1]   # indexed by colour
+
+# Castling: (rook corner, king to, rook from, rook to, squares that must be
+# empty, squares the king crosses) per colour
+_CASTLES = [
+    [(chess.BB_H8, chess.G8, chess.H8, chess.F8, chess.BB_F8 | chess.BB_G8, (chess.F8, chess.G8)),
+     (chess.BB_A8, chess.C8, chess.A8, chess.D8, chess.BB_B8 | chess.BB_C8 | chess.BB_D8,
+      (chess.D8, chess.C8))],
+    [(chess.BB_H1, chess.G1, chess.H1, chess.F1, chess.BB_F1 | chess.BB_G1, (chess.F1, chess.G1)),
+     (chess.BB_A1, chess.C1, chess.A1, chess.D1, chess.BB_B1 | chess.BB_C1 | chess.BB_D1,
+      (chess.D1, chess.C1))],
+]
+
+
+def encode(move: chess.Move) -> int:
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode(move: int) -> chess.Move:
+    return chess.Move(move & 63, move >> 6 & 63, move >> 12 or None)
+
+
+class SearchBoard:
+    def __init__(self, board: chess.Board):
+        if board.chess960:
+            raise ValueError("SearchBoard supports standard chess only")
+        self.pieces      = [0] * 7   # bitboard per piece type (index 0 unused)
+        self.mailbox     = [0] * 64
+        self.occupied_co = [board.occupied_co[BLACK], board.occupied_co[WHITE]]
+        self.occupied    = board.occupied
+        for pt in chess.PIECE_TYPES:
+            self.pieces[pt] = board.pieces_mask(pt, WHITE) | board.pieces_mask(pt, BLACK)
+            for sq in chess.scan_forward(self.pieces[pt]):
+                self.mailbox[sq] = pt
+        self.turn            = board.turn
+        self.castling_rights = board.clean_castling_rights()
+        self.ep_square       = board.ep_square
+        self.halfmove_clock  = board.halfmove_clock
+        self.stack: list[tuple] = []
+
+    # chess.Board-compatible views (read by the evaluation and bitbase.probe)
+    @property
+    def pawns(self) -> int:
+        return self.pieces[PAWN]
+
+    @property
+    def knights(self) -> int:
+        return self.pieces[KNIGHT]
+
+    @property
+    def bishops(self) -> int:
+        return self.pieces[BISHOP]
+
+    @property
+    def rooks(self) -> int:
+        return self.pieces[ROOK]
+
+    @property
+    def queens(self) -> int:
+        return self.pieces[QUEEN]
+
+    @property
+    def kings(self) -> int:
+        return self.pieces[KING]
+
+    def pieces_mask(self, piece_type: int, color: chess.Color) -> int:
+        return self.pieces[piece_type] & self.occupied_co[color]
+
+    def piece_type_at(self, square: int) -> int | None:
+        return self.mailbox[square] or None
+
+    def king(self, color: chess.Color) -> int:
+        return (self.pieces[KING] & self.occupied_co[color]).bit_length() - 1
+
+    # -----------------------------------------------------------------------
+    # Attacks
+    # -----------------------------------------------------------------------
+    def is_attacked(self, square: int, by: chess.Color) -> bool:
+        attackers = self.occupied_co[by]
+        pieces    = self.pieces
+        if (_KNIGHT[square] & pieces[KNIGHT] & attackers
+                or _KING[square] & pieces[KING] & attackers
+                or _PAWN_ATTACKS[not by][square] & pieces[PAWN] & attackers):
+            return True
+        occupied = self.occupied
+        queens   = pieces[QUEEN]
+        if _DIAG[square][_DIAG_MASKS[square] & occupied] & (pieces[BISHOP] | queens) & attackers:
+            return True
+        return bool((_RANK[square][_RANK_MASKS[square] & occupied]
+                     | _FILE[square][_FILE_MASKS[square] & occupied]) & (pieces[ROOK] | queens) & attackers)
+
+    def is_check(self) -> bool:
+        return self.is_attacked(self.king(self.turn), not self.turn)
+
+    def left_in_check(self) -> bool:
+        """After push: did the move leave the mover's own king attacked (illegal)?"""
+        return self.is_attacked(self.king(not self.turn), self.turn)
+
+    # -----------------------------------------------------------------------
+    # Move generation
+    # -----------------------------------------------------------------------
+    def pseudo_legal_moves(self) -> list[int]:
+        """Every move by the rules of piece movement; some may leave the king in check."""
+        return self.captures() + self.quiets()
+
+    def staged_moves(self):
+        """pseudo_legal_moves lazily: captures and promotions, then quiet moves only if asked for."""
+        yield from self.captures()
+        yield from self.quiets()
+
+    def _piece_attacks(self, pt: int, frm: int, occupied: int) -> int:
+        if pt == KNIGHT:
+            return _KNIGHT[frm]
+        if pt == KING:
+            return _KING[frm]
+        attacks = 0
+        if pt != ROOK:
+            attacks = _DIAG[frm][_DIAG_MASKS[frm] & occupied]
+        if pt != BISHOP:
+            attacks |= _RANK[frm][_RANK_MASKS[frm] & occupied] | _FILE[frm][_FILE_MASKS[frm] & occupied]
+        return attacks
+
+    def captures(self) -> list[int]:
+        """Captures (en passant included) and promotions."""
+        us       = self.turn
+        own      = self.occupied_co[us]
+        enemy    = self.occupied_co[not us]
+        occupied = self.occupied
+        pieces   = self.pieces
+        moves: list[int] = []
+
+        # Pawns, in bulk by shifting the pawn bitboard
+        pawns   = pieces[PAWN] & own
+        targets = enemy if self.ep_square is None else enemy | _BB[self.ep_square]
+        if us == WHITE:
+            left    = (pawns << 7) & ~chess.BB_FILE_H & targets
+            right   = (pawns << 9) & ~chess.BB_FILE_A & targets
+            pushes  = (pawns << 8) & ~occupied & chess.BB_RANK_8
+            forward, promo_rank, d_left, d_right = 8, chess.BB_RANK_8, 7, 9
+        else:
+            left    = (pawns >> 9) & ~chess.BB_FILE_H & targets
+            right   = (pawns >> 7) & ~chess.BB_FILE_A & targets
+            pushes  = (pawns >> 8) & ~occupied & chess.BB_RANK_1
+            forward, promo_rank, d_left, d_right = -8, chess.BB_RANK_1, -9, -7
+        for bb, delta in ((left, d_left), (right, d_right), (pushes, forward)):
+            while bb:
+                b   = bb & -bb
+                to  = b.bit_length() - 1
+                bb ^= b
+                move = (to - delta) | to << 6
+                if b & promo_rank:
+                    moves.extend(move | p for p in _PROMOTIONS)
+                else:
+                    moves.append(move)
+
+        for pt in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            bb = pieces[pt] & own
+            while bb:
+                b   = bb & -bb
+                frm = b.bit_length() - 1
+                bb ^= b
+                hits = self._piece_attacks(pt, frm, occupied) & enemy
+                while hits:
+                    t = hits & -hits
+                    hits ^= t
+                    moves.append(frm | (t.bit_length() - 1) << 6)
+        return moves
+
+    def quiets(self) -> list[int]:
+        """Non-capturing moves other than promotions, castling included."""
+        us       = self.turn
+        own      = self.occupied_co[us]
+        occupied = self.occupied
+        pieces   = self.pieces
+        empty    = ~occupied & chess.BB_ALL
+        moves: list[int] = []
+
+        pawns = pieces[PAWN] & own
+        if us == WHITE:
+            single  = (pawns << 8) & empty & ~chess.BB_RANK_8
+            double  = ((single & chess.BB_RANK_3) << 8) & empty
+            forward = 8
+        else:
+            single  = (pawns >> 8) & empty & ~chess.BB_RANK_1
+            double  = ((single & chess.BB_RANK_6) >> 8) & empty
+            forward = -8
+        for bb, delta in ((single, forward), (double, 2 * forward)):
+            while bb:
+                b   = bb & -bb
+                to  = b.bit_length() - 1
+                bb ^= b
+                moves.append((to - delta) | to << 6)
+
+        for pt in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            bb = pieces[pt] & own
+            while bb:
+                b   = bb & -bb
+                frm = b.bit_length() - 1
+                bb ^= b
+                quiet = self._piece_attacks(pt, frm, occupied) & empty
+                while quiet:
+                    t = quiet & -quiet
+                    quiet ^= t
+                    moves.append(frm | (t.bit_length() - 1) << 6)
+
+        # Castling: rights, empty path, king not in check and not crossing attacked squares
+        if self.castling_rights & _BACK_RANK[us]:
+            king = self.king(us)
+            for corner, king_to, _, _, between, crossed in _CASTLES[us]:
+                if (self.castling_rights & corner and not occupied & between
+                        and not self.is_attacked(king, not us)
+                        and not any(self.is_attacked(sq, not us) for sq in crossed)):
+                    moves.append(king | king_to << 6)
+        return moves
+
+    def is_pseudo_legal_hint(self, move: int) -> bool:
+        """Cheap sanity check for a move from another position (a TT hit): own piece on from, not on to."""
+        own = self.occupied_co[self.turn]
+        return bool(own >> (move & 63) & 1) and not own >> (move >> 6 & 63) & 1
+
+    def legal_moves(self) -> list[int]:
+        moves = []
+        for move in self.pseudo_legal_moves():
+            self.push(move)
+            if not self.left_in_check():
+                moves.append(move)
+            self.pop()
+        return moves
+
+    def has_legal_move(self) -> bool:
+        for move in self.staged_moves():
+            self.push(move)
+            illegal = self.left_in_check()
+            self.pop()
+            if not illegal:
+                return True
+        return False
+
+    # -----------------------------------------------------------------------
+    # Make / unmake
+    # -----------------------------------------------------------------------
+    def push(self, move: int) -> None:
+        frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+        us, them = self.turn, not self.turn
+        pieces, mailbox, co = self.pieces, self.mailbox, self.occupied_co
+        pt       = mailbox[frm]
+        captured = mailbox[to]
+        cap_sq   = to
+        if not captured and pt == PAWN and to == self.ep_square:
+            captured, cap_sq = PAWN, (to - 8 if us == WHITE else to + 8)
+        self.stack.append((move, captured, cap_sq, self.castling_rights, self.ep_square,
+                           self.halfmove_clock))
+
+        if captured:
+            cap_bb = _BB[cap_sq]
+            pieces[captured] ^= cap_bb
+            co[them] ^= cap_bb
+            mailbox[cap_sq] = 0
+        from_bb, to_bb = _BB[frm], _BB[to]
+        pieces[pt] ^= from_bb
+        new = promotion or pt
+        pieces[new] |= to_bb
+        co[us] ^= from_bb | to_bb
+        mailbox[frm] = 0
+        mailbox[to]  = new
+
+        self.ep_square = None
+        if pt == PAWN:
+            self.halfmove_clock = 0
+            if to - frm in (16, -16):
+                self.ep_square = (frm + to) >> 1
+        else:
+            self.halfmove_clock = 0 if captured else self.halfmove_clock + 1
+            if pt == KING:
+                if to - frm in (2, -2):
+                    _, _, rook_from, rook_to, _, _ = _CASTLES[us][0 if to > frm else 1]
+                    rook_bb = _BB[rook_from] | _BB[rook_to]
+                    pieces[ROOK] ^= rook_bb
+                    co[us] ^= rook_bb
+                    mailbox[rook_from] = 0
+                    mailbox[rook_to]   = ROOK
+                self.castling_rights &= ~_BACK_RANK[us]
+        if self.castling_rights:
+            self.castling_rights &= ~(from_bb | to_bb)
+        self.occupied = co[0] | co[1]
+        self.turn = them
+
+    def pop(self) -> int:
+        move, captured, cap_sq, castling, ep_square, halfmove = self.stack.pop()
+        frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+        them = self.turn
+        us   = not them
+        pieces, mailbox, co = self.pieces, self.mailbox, self.occupied_co
+        new = mailbox[to]
+        pt  = PAWN if promotion else new
+        from_bb, to_bb = _BB[frm], _BB[to]
+        pieces[new] ^= to_bb
+        pieces[pt]  |= from_bb
+        co[us] ^= from_bb | to_bb
+        mailbox[to]  = 0
+        mailbox[frm] = pt
+        if captured:
+            cap_bb = _BB[cap_sq]
+            pieces[captured] |= cap_bb
+            co[them] |= cap_bb
+            mailbox[cap_sq] = captured
+        if pt == KING and to - frm in (2, -2):
+            _, _, rook_from, rook_to, _, _ = _CASTLES[us][0 if to > frm else 1]
+            rook_bb = _BB[rook_from] | _BB[rook_to]
+            pieces[ROOK] ^= rook_bb
+            co[us] ^= rook_bb
+            mailbox[rook_to]   = 0
+            mailbox[rook_from] = ROOK
+        self.castling_rights = castling
+        self.ep_square       = ep_square
+        self.halfmove_clock  = halfmove
+        self.occupied = co[0] | co[1]
+        self.turn = us
+        return move
+
+
+def perft(board: SearchBoard, depth: int) -> int:
+    """Leaf count of the legal move tree to `depth` (compare chess.Board perft counts)."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in board.pseudo_legal_moves():
+        board.push(move)
+        if not board.left_in_check():
+            nodes += perft(board, depth - 1) if depth > 1 else 1
+        board.pop()
+    return nodes
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+server.py — asyncio HTTP / WebSocket front-end for hosted games.
+
+Usage:
+  python3 server.py [--host 127.0.0.1] [--port 8765] [--workers N] [--hot N] [--spill-dir DIR]
+
+On start it prints one JSON line ({"ok": true, "host": ..., "port": ...};
+--port 0 picks a free port), then serves until SIGINT / SIGTERM.
+
+HTTP (JSON bodies and responses, keep-alive):
+  POST /games                     {color, level, mode, player, game_id?}  new_game
+  GET  /games/{id}                                                       status
+  GET  /games/{id}/legal                                                 legal
+  POST /games/{id}/move           {move}                                 move
+  POST /games/{id}/ai_move        {persona?}                             ai_move
+  POST /games/{id}/evaluate_user  {move: uci}                            coach.py evaluate_user
+  GET  /games/{id}/review[?depth=N]    (N <= MAX_REVIEW_DEPTH)          review.py Markdown
+  GET  /health                                                           session/pool counters
+
+WebSocket: GET /games/{id}/ws streams {"event": "move", ...} (SAN, UCI, FEN,
+eval, win rate) for every move played in the game, whoever played it.
+Clients may also send {"command": "move" | "ai_move" | ..., ...} frames and
+get {"event": "result", ...} back. Bodies may only carry the fields listed
+above for their command, with values of the kind COMMAND_FIELDS allows
+(CLI choices, move text, persona ids); anything else is a 400.
+
+Games live in a sessions.SessionManager. Command functions run on a thread
+pool, so the event loop only parses and routes. The main searches
+(get_best_move, evaluate_user, review analysis) run in the manager's process
+pool; ai_move's forced-mate probe (engine.py MATE_PROBE_*, node-bounded)
+runs on the command's thread in this process.
+Only the standard library is used.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import signal
+import struct
+import sys
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(__file__))
+from sessions import SessionManager, SPILL_DIR, GAME_ID
+import coach
+import engine
+import review
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES   = 1024 * 1024
+WS_MAGIC         = "258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+# Body fields a client may set, per command (never file paths or search
+# hooks), with the values each accepts: a tuple of choices or a pattern for
+# a string
+MOVE_TEXT = re.compile(r"[A-Za-z0-9=+#-]{2,10}")     # SAN or UCI
+NICKNAME  = re.compile(r"[^\x00-\x1f\x7f]{1,64}")
+COMMAND_FIELDS = {
+    "new_game":      {"color": engine.COLORS, "level": engine.LEVELS, "mode": engine.MODES,
+                      "player": NICKNAME},
+    "move":          {"move": MOVE_TEXT},
+    "ai_move":       {"persona": engine.PERSONA_ID},
+    "evaluate_user": {"move": MOVE_TEXT},
+    "status":        {},
+    "legal":         {},
+}
+
+
+def _valid(value, spec) -> bool:
+    if isinstance(spec, tuple):
+        return isinstance(value, str) and value in spec
+    return isinstance(value, str) and spec.fullmatch(value) is not None
+
+# Deepest review analysis a client may ask for (the advanced level's depth)
+MAX_REVIEW_DEPTH = engine.DEPTH_MAP["advanced"]
+
+# Fields of a move / ai_move result pushed to WebSocket subscribers
+MOVE_EVENT_FIELDS = ("move_san", "move_uci", "fen", "turn", "score_cp", "winrate_white",
+                     "is_check", "is_game_over", "result", "pv_san", "book")
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------------------------------------------------------------------------
+# Pool jobs (run in worker processes)
+# ---------------------------------------------------------------------------
+def _review_job(state: dict, depth: int) -> str:
+    analysis = review.analyze_game(state, depth) if depth > 0 else None
+    return review.build_review(state, analysis)[0]
+
+
+# ---------------------------------------------------------------------------
+# WebSocket framing (RFC 6455; server frames are never masked)
+# ---------------------------------------------------------------------------
+def ws_accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + WS_MAGIC).encode()).digest()).decode()
+
+
+def ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def ws_read_frame(reader: asyncio.StreamReader) -> tuple[int, bool, bytes]:
+    """(opcode, fin, payload) of the next frame, unmasked."""
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if n > MAX_BODY_BYTES:
+        raise HttpError(413, "WebSocket frame too large")
+    mask = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return b0 & 0x0F, bool(b0 & 0x80), payload
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+class GameServer:
+    def __init__(self, manager: SessionManager, threads: int = 64):
+        self.manager = manager
+        self.threads = ThreadPoolExecutor(threads, thread_name_prefix="game")
+        self.subscribers: dict[str, set[asyncio.StreamWriter]] = {}
+
+    async def _blocking(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.threads, partial(fn, *args, **kwargs))
+
+    # -- Commands ------------------------------------------------------------
+    async def command(self, game_id: str, command: str, body: dict) -> dict:
+        if command not in COMMAND_FIELDS:
+            raise HttpError(400, f"Unknown command: {command}")
+        options = {k: v for k, v in body.items() if k not in ("command", "game_id")}
+        fields  = COMMAND_FIELDS[command]
+        unknown = set(options) - set(fields)
+        if unknown:
+            raise HttpError(400, f"Unexpected fields for {command}: {', '.join(sorted(unknown))}")
+        for name, value in options.items():
+            if not _valid(value, fields[name]):
+                raise HttpError(400, f"Bad value for {command} {name}: {value!r}"[:200])
+        if command == "evaluate_user":
+            return await self.evaluate_user(game_id, body)
+        result = await self._blocking(self.manager.run, game_id, command, **options)
+        if result.get("ok") and command in ("move", "ai_move"):
+            event = {"event": "move", "game_id": game_id, "command": command,
+                     **{k: result.get(k) for k in MOVE_EVENT_FIELDS}}
+            await self.broadcast(game_id, event)
+        return result
+
+    async def evaluate_user(self, game_id: str, body: dict) -> dict:
+        if not body.get("move"):
+            return {"ok": False, "error": "evaluate_user needs a move (UCI)"}
+        state = await self._blocking(self.manager.snapshot, game_id)
+        if state is None:
+            return {"ok": False, "error": f"Unknown game: {game_id}"}
+        return await self._in_pool(game_id, coach.evaluate_user, state, body["move"])
+
+    async def review(self, game_id: str, depth: int) -> dict:
+        state = await self._blocking(self.manager.snapshot, game_id)
+        if state is None:
+            return {"ok": False, "error": f"Unknown game: {game_id}"}
+        markdown = await self._in_pool(game_id, _review_job, state, depth)
+        return {"ok": True, "game_id": game_id, "depth": depth, "markdown": markdown}
+
+    async def _in_pool(self, game_id: str, fn, *args):
+        pool = self.manager.pool
+        if pool is None:
+            return await self._blocking(fn, *args)
+        return await self._blocking(pool.run, game_id, fn, *args)
+
+    async def broadcast(self, game_id: str, event: dict) -> None:
+        frame = ws_frame(json.dumps(event, ensure_ascii=False).encode())
+        for writer in list(self.subscribers.get(game_id, ())):
+            try:
+                writer.write(frame)
+                await writer.drain()
+            except ConnectionError:
+                self.subscribers[game_id].discard(writer)
+
+    # -- HTTP ----------------------------------------------------------------
+    async def route(self, method: str, target: str, body: dict) -> dict:
+        url   = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["health"] and method == "GET":
+            return {"ok": True, **self.manager.stats()}
+        if parts == ["games"] and method == "POST":
+            game_id = body.pop("game_id", None) or uuid.uuid4().hex[:12]
+            result  = await self.command(game_id, "new_game", body)
+            return {**result, "game_id": game_id}
+        if len(parts) < 2 or parts[0] != "games" or not GAME_ID.fullmatch(parts[1]):
+            raise HttpError(404, f"No route for {url.path}")
+
+        game_id, action = parts[1], parts[2] if len(parts) > 2 else "status"
+        allowed = {"status": "GET", "legal": "GET", "review": "GET", "move": "POST",
+                   "ai_move": "POST", "evaluate_user": "POST"}
+        if action not in allowed or len(parts) > 3:
+            raise HttpError(404, f"No route for {url.path}")
+        if method != allowed[action]:
+            raise HttpError(405, f"{action} expects {allowed[action]}")
+        if action == "review":
+            depth = parse_qs(url.query).get("depth", ["0"])[0]
+            if not depth.isdigit() or int(depth) > MAX_REVIEW_DEPTH:
+                raise HttpError(400, f"depth must be an integer from 0 to {MAX_REVIEW_DEPTH}")
+            return await self.review(game_id, int(depth))
+        return await self.command(game_id, action, body)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not request_line:
+                    break
+                version, headers = "HTTP/1.0", {}
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = await self._read_headers(reader)
+                    if headers.get("upgrade", "").lower() == "websocket":
+                        await self.websocket(target, headers, reader, writer)
+                        return
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY_BYTES:
+                        raise HttpError(413, "Request body too large")
+                    raw  = await reader.readexactly(length) if length else b""
+                    body = json.loads(raw) if raw.strip() else {}
+                    if not isinstance(body, dict):
+                        raise HttpError(400, "Body must be a JSON object")
+                    status, result = 200, await self.route(method, target, body)
+                except HttpError as e:
+                    status, result = e.status, {"ok": False, "error": str(e)}
+                except (ValueError, UnicodeDecodeError) as e:
+                    status, result = 400, {"ok": False, "error": f"Bad request: {e}"}
+                except Exception:
+                    traceback.print_exc()
+                    status, result = 500, {"ok": False, "error": "Internal server error"}
+
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                self._respond(writer, status, result, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_headers(self, reader: asyncio.StreamReader) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        size = 0
+        while True:
+            line = await reader.readline()
+            size += len(line)
+            if size > MAX_HEADER_BYTES:
+                raise HttpError(413, "Headers too large")
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    def _respond(self, writer: asyncio.StreamWriter, status: int, result: dict,
+                 keep_alive: bool) -> None:
+        payload = json.dumps(result, ensure_ascii=False).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+            + payload
+        )
+
+    # -- WebSocket -----------------------------------------------------------
+    async def websocket(self, target: str, headers: dict, reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter) -> None:
+        parts = [p for p in urlsplit(target).path.split("/") if p]
+        if (len(parts) != 3 or parts[0] != "games" or parts[2] != "ws"
+                or not GAME_ID.fullmatch(parts[1]) or "sec-websocket-key" not in headers):
+            raise HttpError(404, f"No WebSocket route for {target}")
+        game_id = parts[1]
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {ws_accept_key(headers['sec-websocket-key'])}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        self.subscribers.setdefault(game_id, set()).add(writer)
+        message = b""
+        try:
+            while True:
+                opcode, fin, payload = await ws_read_frame(reader)
+                if opcode == 0x8:                          # close
+                    writer.write(ws_frame(payload[:2], 0x8))
+                    break
+                if opcode == 0x9:                          # ping
+                    writer.write(ws_frame(payload, 0xA))
+                    continue
+                if opcode not in (0x0, 0x1):
+                    continue
+                message += payload
+                if not fin:
+                    continue
+                try:
+                    body = json.loads(message)
+                    result = await self.command(game_id, body.get("command", "status"), body)
+                except HttpError as e:
+                    result = {"ok": False, "error": str(e)}
+                except (ValueError, AttributeError, TypeError) as e:
+                    result = {"ok": False, "error": f"Bad message: {e}"}
+                message = b""
+                writer.write(ws_frame(json.dumps({"event": "result", **result},
+                                                 ensure_ascii=False).encode()))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, HttpError):
+            pass
+        finally:
+            self.subscribers[game_id].discard(writer)
+            if not self.subscribers[game_id]:
+                del self.subscribers[game_id]
+
+
+async def serve(args) -> None:
+    with SessionManager(args.spill_dir, max_hot=args.hot, workers=args.workers) as manager:
+        app    = GameServer(manager)
+        server = await asyncio.start_server(app.handle, args.host, args.port)
+        port   = server.sockets[0].getsockname()[1]
+        print(json.dumps({"ok": True, "host": args.host, "port": port,
+                          "workers": manager.pool.workers if manager.pool else 0}), flush=True)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:   # Windows
+                pass
+        async with server:
+            await stop.wait()
+        app.threads.shutdown(wait=True)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Chess coach game server")
+    p.add_argument("--host",      default="127.0.0.1")
+    p.add_argument("--port",      type=int, default=8765)
+    p.add_argument("--workers",   type=int, default=None,
+                   help="Search processes (default: CPU count)")
+    p.add_argument("--hot",       type=int, default=256,
+                   help="Games kept in memory; the rest spill to --spill-dir")
+    p.add_argument("--spill-dir", default=SPILL_DIR)
+    args = p.parse_args()
+    args.spill_dir = os.path.expanduser(args.spill_dir)
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
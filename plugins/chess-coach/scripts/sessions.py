@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+sessions.py — Host many concurrent games in one process.
+
+Library module (no CLI). A SessionManager holds GameSessions (state dict and
+live board) plus the loaded personas, and runs the engine.py command
+functions against them, so a move costs no process start, JSON parse,
+move-list replay or persona file read:
+
+    with SessionManager(max_hot=256, workers=4) as mgr:
+        mgr.run("g1", "new_game", color="black")
+        mgr.run("g1", "ai_move", persona="tal")
+        mgr.run("g1", "move", move="e5")
+
+Memory: the most recently used `max_hot` sessions stay in memory; colder
+ones are spilled to <spill_dir>/<game_id>.json (the same format as an
+engine.py --state file) and reloaded on their next command.
+
+CPU: the minimax search of ai_move runs in a bounded process pool
+(FairPool). Queued searches start round-robin across games, so one game
+submitting many searches cannot starve the others.
+
+run() is thread-safe and blocking; commands on one game are serialized,
+commands on different games run concurrently.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(__file__))
+import engine
+from common import board_from_state, get_best_move
+
+import chess
+
+SPILL_DIR = os.path.expanduser("~/.chess_coach/sessions")
+
+# Per-command defaults, matching the engine.py CLI
+COMMAND_DEFAULTS = {
+    "new_game": {"color": "white", "level": "auto", "mode": "play", "player": "human"},
+    "move":     {"move": None},
+    "ai_move":  {"persona": None, "book": None,
+                 "bundled_persona_dir": engine.BUNDLED_PERSONA_DIR_DEFAULT},
+    "status":   {},
+    "legal":    {},
+}
+
+COMMANDS = {
+    "new_game": engine.cmd_new_game,
+    "move":     engine.cmd_move,
+    "ai_move":  engine.cmd_ai_move,
+    "status":   engine.cmd_status,
+    "legal":    engine.cmd_legal,
+}
+
+GAME_ID = re.compile(r"[\w-]{1,128}")
+
+
+# ---------------------------------------------------------------------------
+# Fair process pool
+# ---------------------------------------------------------------------------
+class FairPool:
+    """
+    Process pool with at most `workers` tasks in flight. Callers waiting for a
+    worker are queued per key (game) and admitted round-robin across keys.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers   = workers or os.cpu_count() or 1
+        # spawn, not fork: the host is multi-threaded, and a forked child can
+        # inherit a lock another thread was holding
+        self._executor = ProcessPoolExecutor(self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._free     = self.workers
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._cond     = threading.Condition()
+
+    def run(self, key: str, fn, *args):
+        """Run fn(*args) in a worker once it is this key's turn; blocks until done."""
+        ticket = object()
+        with self._cond:
+            self._queues.setdefault(key, deque()).append(ticket)
+            while not (self._free and self._head() is ticket):
+                self._cond.wait()
+            queue = self._queues[key]
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)   # next turn goes to another game
+            else:
+                del self._queues[key]
+            self._free -= 1
+            self._cond.notify_all()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._cond:
+                self._free += 1
+                self._cond.notify_all()
+
+    def _head(self) -> object | None:
+        # Caller holds self._cond
+        return self._queues[next(iter(self._queues))][0] if self._queues else None
+
+    def waiting(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _pool_search(fen: str, moves_uci: list[str], depth: int, blunder_pc: float,
+                 aggression: float) -> tuple[str | None, int, list[str]]:
+    """get_best_move in a worker process; moves travel as UCI strings."""
+    board = chess.Board(fen)
+    for uci in moves_uci:
+        board.push_uci(uci)
+    move, score, pv = get_best_move(board, depth, blunder_pc, aggression, with_pv=True)
+    return (move.uci() if move else None), score, [m.uci() for m in pv]
+
+
+# ---------------------------------------------------------------------------
+# Sessions
+# ---------------------------------------------------------------------------
+class GameSession:
+    """One hosted game: its state dict and live board."""
+
+    def __init__(self, game_id: str, state: dict | None = None):
+        self.game_id = game_id
+        self.state   = state
+        self.board   = board_from_state(state) if state else chess.Board()
+        self.dirty   = False
+        self.lock    = threading.Lock()   # serializes commands on this game
+        self.pins    = 0                  # commands using it; pinned sessions are never spilled
+
+
+class SessionManager:
+    def __init__(self, spill_dir: str = SPILL_DIR, max_hot: int = 256,
+                 workers: int | None = None):
+        self.spill_dir = spill_dir
+        self.max_hot   = max_hot
+        self.pool      = FairPool(workers) if workers != 0 else None   # 0: search in-thread
+        self._hot: OrderedDict[str, GameSession] = OrderedDict()
+        self._lock     = threading.Lock()
+        self._personas: dict[str, dict | None] = {}
+        self.counters  = {"spilled": 0, "reloaded": 0}
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def spill_path(self, game_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{game_id}.json")
+
+    # -- LRU -----------------------------------------------------------------
+    def _acquire(self, game_id: str, create: bool) -> GameSession | None:
+        with self._lock:
+            session = self._hot.get(game_id)
+            if session is None:
+                path = self.spill_path(game_id)
+                if os.path.exists(path):
+                    session = GameSession(game_id, engine.load_state(path))
+                    self.counters["reloaded"] += 1
+                elif create:
+                    session = GameSession(game_id)
+                else:
+                    return None
+                self._hot[game_id] = session
+            self._hot.move_to_end(game_id)
+            session.pins += 1
+            self._evict()
+            return session
+
+    def _release(self, session: GameSession) -> None:
+        with self._lock:
+            session.pins -= 1
+            self._evict()
+
+    def _evict(self) -> None:
+        # Caller holds self._lock; spill least recently used unpinned sessions
+        for game_id in list(self._hot):
+            if len(self._hot) <= self.max_hot:
+                break
+            session = self._hot[game_id]
+            if session.pins:
+                continue
+            self._spill(session)
+            del self._hot[game_id]
+            self.counters["spilled"] += 1
+
+    def _spill(self, session: GameSession) -> None:
+        if session.dirty and session.state is not None:
+            engine.save_state(session.state, self.spill_path(session.game_id))
+            session.dirty = False
+
+    # -- Commands ------------------------------------------------------------
+    def run(self, game_id: str, command: str, **options) -> dict:
+        """Run an engine.py command (e.g. "move", move="e4") against one game."""
+        if not GAME_ID.fullmatch(game_id):
+            return {"ok": False, "error": f"Invalid game id: {game_id!r}"}
+        if command not in COMMANDS:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+        unknown = set(options) - set(COMMAND_DEFAULTS[command])
+        if unknown:
+            return {"ok": False, "error": f"Unknown options for {command}: {', '.join(sorted(unknown))}"}
+        session = self._acquire(game_id, create=command == "new_game")
+        if session is None:
+            return {"ok": False, "error": f"Unknown game: {game_id}"}
+        try:
+            with session.lock:
+                if session.state is None and command != "new_game":
+                    return {"ok": False, "error": f"Unknown game: {game_id}"}
+                args = argparse.Namespace(**{**COMMAND_DEFAULTS[command], **options})
+                args.state   = self.spill_path(game_id)
+                args.session = session
+                if command == "ai_move":
+                    if args.persona:
+                        args.persona_data = self._persona(args.persona, args.bundled_persona_dir)
+                    if self.pool is not None:
+                        args.search = partial(self._search, game_id)
+                return COMMANDS[command](args)
+        finally:
+            self._release(session)
+
+    def snapshot(self, game_id: str) -> dict | None:
+        """A deep copy of the game's state (for work done outside the session lock)."""
+        if not GAME_ID.fullmatch(game_id):
+            return None
+        session = self._acquire(game_id, create=False)
+        if session is None:
+            return None
+        try:
+            with session.lock:
+                return json.loads(json.dumps(session.state)) if session.state else None
+        finally:
+            self._release(session)
+
+    def _persona(self, persona_id: str, bundled_dir: str) -> dict | None:
+        if persona_id not in self._personas:
+            self._personas[persona_id] = engine.load_persona_for_engine(persona_id, bundled_dir)
+        return self._personas[persona_id]
+
+    def _search(self, game_id: str, board: chess.Board, depth: int, blunder_pc: float,
+                aggression: float, with_pv: bool = True) -> tuple:
+        """Drop-in for get_best_move(..., with_pv=True) that runs in the pool."""
+        move_uci, score, pv_uci = self.pool.run(game_id, _pool_search, board.root().fen(),
+                                                [m.uci() for m in board.move_stack],
+                                                depth, blunder_pc, aggression)
+        return ((chess.Move.from_uci(move_uci) if move_uci else None), score,
+                [chess.Move.from_uci(u) for u in pv_uci])
+
+    # -- Lifecycle -----------------------------------------------------------
+    def flush(self) -> None:
+        """Write every dirty in-memory game to its spill file."""
+        with self._lock:
+            for session in self._hot.values():
+                with session.lock:
+                    self._spill(session)
+
+    def close(self) -> None:
+        self.flush()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hot": len(self._hot), "max_hot": self.max_hot, **self.counters,
+                    "workers": self.pool.workers if self.pool else 0}
@@ -0,0 +1,230 @@
+"""
+tactics.py — Tactical motif detection from attack bitboards.
+
+Imported by coach.py and review.py.
+Do not run directly.
+
+detect_motifs(board) finds, for both sides at once:
+  hanging     enemy piece that can be won by capture (SEE gain)
+  fork        one piece attacking two or more valuable targets
+  pin         slider attacking a piece shielding a more valuable one
+  skewer      slider attacking a piece with a less valuable one behind it
+  discovered  own piece blocking an own slider's attack on a target
+  overloaded  enemy piece that is the sole defender of two attacked pieces
+
+Every motif is reported from the side that benefits from it.
+"""
+
+import chess
+
+from common import PIECE_VALUES
+
+SLIDERS = (chess.BISHOP, chess.ROOK, chess.QUEEN)
+
+# Captures gaining less than this are exchanges, not hanging pieces
+HANGING_MIN_GAIN = 50
+
+
+def color_name(color: chess.Color) -> str:
+    return "white" if color == chess.WHITE else "black"
+
+
+def _sq(square: int) -> str:
+    return chess.square_name(square)
+
+
+def _slider_attacks(piece_type: int, square: int, occupied: int) -> int:
+    """Attack mask of a bishop/rook/queen on `square` given an occupancy mask."""
+    mask = 0
+    if piece_type in (chess.BISHOP, chess.QUEEN):
+        mask |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    if piece_type in (chess.ROOK, chess.QUEEN):
+        mask |= (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                 | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    return mask
+
+
+def attackers(board: chess.Board, color: chess.Color, square: int, occupied: int) -> int:
+    """Attackers of `square` by `color` for an arbitrary occupancy (x-ray aware)."""
+    diag  = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    lines = (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+             | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    queens = board.queens
+    mask = (
+        (chess.BB_KNIGHT_ATTACKS[square] & board.knights)
+        | (chess.BB_KING_ATTACKS[square] & board.kings)
+        | (diag & (board.bishops | queens))
+        | (lines & (board.rooks | queens))
+        | (chess.BB_PAWN_ATTACKS[not color][square] & board.pawns)
+    )
+    return mask & board.occupied_co[color] & occupied
+
+
+def see(board: chess.Board, from_square: int, to_square: int) -> int:
+    """
+    Static exchange evaluation of capturing on `to_square` with the piece on
+    `from_square`. Returns the expected material gain (cp) for the capturer.
+    Pins are ignored, as is usual for SEE.
+    """
+    piece = board.piece_type_at(from_square)
+    color = board.color_at(from_square)
+    victim = board.piece_type_at(to_square)
+    gains = [PIECE_VALUES[victim] if victim else 0]
+    on_square = PIECE_VALUES[piece]
+    occupied = board.occupied & ~chess.BB_SQUARES[from_square]
+    side = not color
+
+    while True:
+        att = attackers(board, side, to_square, occupied)
+        if not att:
+            break
+        for pt in chess.PIECE_TYPES:
+            bb = att & board.pieces_mask(pt, side)
+            if bb:
+                break
+        if pt == chess.KING and attackers(board, not side, to_square, occupied):
+            break  # the king cannot capture into a defended square
+        gains.append(on_square - gains[-1])
+        on_square = PIECE_VALUES[pt]
+        occupied &= ~(bb & -bb)
+        side = not side
+
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+
+def _label(board: chess.Board, square: int) -> str:
+    piece = board.piece_at(square)
+    return f"{chess.piece_name(piece.piece_type)} on {_sq(square)}"
+
+
+def detect_motifs(board: chess.Board) -> list[dict]:
+    """
+    Return tactical motifs for both sides in the position.
+
+    Each motif is {"motif", "side", "squares", "text"} where side is the
+    color ("white"/"black") that benefits and squares lists the pieces
+    involved, the acting piece first.
+    """
+    # One pass over the pieces builds the attack and attacked-by tables
+    attacks: dict[int, int] = {}
+    attacked_by = {chess.WHITE: [0] * 64, chess.BLACK: [0] * 64}
+    for sq in chess.scan_forward(board.occupied):
+        color = board.color_at(sq)
+        mask = board.attacks_mask(sq)
+        attacks[sq] = mask
+        bit = chess.BB_SQUARES[sq]
+        table = attacked_by[color]
+        for target in chess.scan_forward(mask):
+            table[target] |= bit
+
+    motifs: list[dict] = []
+
+    def add(motif: str, color: chess.Color, squares: list[int], text: str) -> None:
+        motifs.append({
+            "motif":   motif,
+            "side":    color_name(color),
+            "squares": [_sq(s) for s in squares],
+            "text":    text,
+        })
+
+    # Best capture gain against each piece, reused by several motifs
+    win_gain: dict[int, int] = {}
+    for sq in attacks:
+        color = board.color_at(sq)
+        if board.piece_type_at(sq) == chess.KING:
+            continue
+        best = 0
+        for att in chess.scan_forward(attacked_by[not color][sq]):
+            best = max(best, see(board, att, sq))
+        if best >= HANGING_MIN_GAIN:
+            win_gain[sq] = best
+
+    for color in chess.COLORS:
+        enemy = not color
+        own_occ = board.occupied_co[color]
+        enemy_occ = board.occupied_co[enemy]
+        cname = color_name(color).capitalize()
+        ename = color_name(enemy).capitalize()
+
+        # Hanging pieces
+        for sq, gain in win_gain.items():
+            if board.color_at(sq) == enemy:
+                add("hanging", color, [sq],
+                    f"{ename} {_label(board, sq)} is hanging (wins ~{gain} cp)")
+
+        for sq in chess.scan_forward(own_occ):
+            pt = board.piece_type_at(sq)
+            value = PIECE_VALUES[pt]
+
+            # Forks: kings, undefended/losing pieces or pieces worth more than the forker
+            targets = [
+                t for t in chess.scan_forward(attacks[sq] & enemy_occ)
+                if board.piece_type_at(t) == chess.KING
+                or PIECE_VALUES[board.piece_type_at(t)] > value
+                or t in win_gain
+            ]
+            if len(targets) >= 2 and pt != chess.KING:
+                names = " and ".join(_label(board, t) for t in targets)
+                add("fork", color, [sq] + targets, f"{cname} {_label(board, sq)} forks {names}")
+
+            if pt not in SLIDERS:
+                continue
+
+            # Pins and skewers: x-ray through the first enemy piece on each line
+            for front in chess.scan_forward(attacks[sq] & enemy_occ):
+                xray = _slider_attacks(pt, sq, board.occupied & ~chess.BB_SQUARES[front])
+                behind = xray & ~attacks[sq] & chess.ray(sq, front) & enemy_occ
+                if not behind:
+                    continue
+                back = chess.lsb(behind)
+                front_pt = board.piece_type_at(front)
+                back_pt = board.piece_type_at(back)
+                if PIECE_VALUES[back_pt] > PIECE_VALUES[front_pt] and (
+                        back_pt == chess.KING or PIECE_VALUES[back_pt] > value
+                        or not attacked_by[enemy][back]):
+                    kind = "absolute" if back_pt == chess.KING else "relative"
+                    add("pin", color, [sq, front, back],
+                        f"{cname} {_label(board, sq)} pins the {_label(board, front)} "
+                        f"to the {_label(board, back)} ({kind})")
+                elif PIECE_VALUES[front_pt] > PIECE_VALUES[back_pt] and (
+                        front_pt == chess.KING or PIECE_VALUES[front_pt] > value):
+                    add("skewer", color, [sq, front, back],
+                        f"{cname} {_label(board, sq)} skewers the {_label(board, front)} "
+                        f"and the {_label(board, back)}")
+
+            # Discovered attacks: an own piece masks this slider's attack
+            for blocker in chess.scan_forward(attacks[sq] & own_occ):
+                xray = _slider_attacks(pt, sq, board.occupied & ~chess.BB_SQUARES[blocker])
+                behind = xray & ~attacks[sq] & chess.ray(sq, blocker) & enemy_occ
+                if not behind:
+                    continue
+                target = chess.lsb(behind)
+                target_pt = board.piece_type_at(target)
+                if (target_pt == chess.KING or PIECE_VALUES[target_pt] > value
+                        or not attacked_by[enemy][target]):
+                    add("discovered", color, [blocker, sq, target],
+                        f"Moving the {cname.lower()} {_label(board, blocker)} uncovers the "
+                        f"{_label(board, sq)} against the {_label(board, target)}")
+
+        # Overloaded defenders: sole defender of two or more attacked enemy pieces
+        duties: dict[int, list[int]] = {}
+        for sq in chess.scan_forward(enemy_occ & ~board.kings):
+            defenders = attacked_by[enemy][sq]
+            if attacked_by[color][sq] and chess.popcount(defenders) == 1:
+                duties.setdefault(chess.lsb(defenders), []).append(sq)
+        for defender, guarded in duties.items():
+            if len(guarded) >= 2:
+                names = " and ".join(_sq(g) for g in guarded)
+                add("overloaded", color, [defender] + guarded,
+                    f"{ename} {_label(board, defender)} is overloaded defending {names}")
+
+    return motifs
+
+
+def new_motifs(before: list[dict], after: list[dict]) -> list[dict]:
+    """Motifs present in `after` that were not already present in `before`."""
+    seen = {(m["motif"], m["side"], tuple(m["squares"])) for m in before}
+    return [m for m in after if (m["motif"], m["side"], tuple(m["squares"])) not in seen]
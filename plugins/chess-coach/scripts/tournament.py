@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+tournament.py — Engine-vs-engine matches between levels and personas.
+
+Commands:
+  round_robin --players A,B,... [--rounds N] [--workers N] [--pgn FILE]
+              Every pair plays N opening pairs (2N games); prints an ELO table
+  sprt        --a A --b B [--elo0 E0] [--elo1 E1] [--alpha A] [--beta B]
+              [--max-games N] [--workers N] [--pgn FILE]
+              A vs. B until the SPRT accepts H1 (A is at least elo1 stronger)
+              or H0 (at most elo0), or --max-games is reached
+
+Common options: --opening-plies N (default 6), --max-plies N (default 160),
+--seed N, --workers N (default: CPU count).
+
+A player is a level (beginner / intermediate / advanced), a persona id
+(bundled or user), or uci:<command> for an external UCI engine (e.g. an
+older checkout's uci.py, to check a search change). An optional @D sets
+the search depth: tal@2, intermediate@3. Built-in players can switch
+evaluation terms (common.EVAL_SWITCHES) on or off with /+term or /-term:
+advanced@2/-mobility/-king_safety. Moves come from get_best_move
+with the player's depth, blunder rate and aggression; persona books are
+not used, so the games measure the search.
+
+Openings are drawn from the ECO table (data/eco.tsv) and cut to
+--opening-plies; each is played twice with colours reversed. Games that
+reach --max-plies are adjudicated on the static evaluation (a win beyond
+ADJUDICATE_CP, else a draw). Games run in a process pool.
+
+All output: JSON to stdout (and PGN to --pgn).
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+import common
+from common import evaluate, get_best_move, apply_weights, weights_snapshot, _read_eco_tsv, EVAL_SWITCHES
+from engine import DEPTH_MAP, BLUNDER_MAP, BUNDLED_PERSONA_DIR_DEFAULT, load_persona_for_engine
+from backends import get_backend
+
+import chess
+import chess.pgn
+
+ADJUDICATE_CP = 500
+
+
+# ---------------------------------------------------------------------------
+# Players
+# ---------------------------------------------------------------------------
+def resolve_player(spec: str) -> dict:
+    """Player spec -> {"name", "depth", "blunder_pc", "aggression"[, "switches"]} or {"name", "engine"}."""
+    toggles = [] if spec.startswith("uci:") else spec.split("/")[1:]
+    name, _, depth = (spec if spec.startswith("uci:") else spec.split("/")[0]).partition("@")
+    if name.startswith("uci:"):
+        player = {"name": spec, "engine": name[4:], "depth": 8}
+    elif name in DEPTH_MAP:
+        player = {"name": spec, "depth": DEPTH_MAP[name], "blunder_pc": BLUNDER_MAP[name],
+                  "aggression": 0.0}
+    else:
+        persona = load_persona_for_engine(name, BUNDLED_PERSONA_DIR_DEFAULT)
+        if persona is None:
+            raise ValueError(f"Unknown player: {name} (not a level or persona)")
+        player = {"name": spec, "depth": persona.get("depth", 2),
+                  "blunder_pc": persona.get("blunder_rate", 0.0),
+                  "aggression": persona.get("aggression", 0.0)}
+    if depth:
+        player["depth"] = int(depth)
+    for toggle in toggles:
+        if toggle[:1] not in ("+", "-") or toggle[1:] not in EVAL_SWITCHES:
+            raise ValueError(f"Bad eval switch: {toggle} (+/- one of {', '.join(EVAL_SWITCHES)})")
+        player.setdefault("switches", {})[toggle[1:]] = toggle[0] == "+"
+    return player
+
+
+def choose_move(player: dict, board: chess.Board) -> chess.Move:
+    if "engine" in player:
+        return get_backend(player["engine"]).top_moves(board, player["depth"], 1)[0]["move"]
+    move, _ = get_best_move(board, player["depth"], player["blunder_pc"], player["aggression"])
+    return move
+
+
+# ---------------------------------------------------------------------------
+# Games
+# ---------------------------------------------------------------------------
+def sample_openings(count: int, plies: int, rng: random.Random) -> list[list[str]]:
+    """`count` distinct ECO lines cut to `plies` half-moves, as UCI."""
+    entries, _ = _read_eco_tsv()
+    lines = set()
+    for _, _, moves in entries:
+        sans = moves.split()
+        if len(sans) >= plies:
+            board = chess.Board()
+            lines.add(tuple(board.push_san(san).uci() for san in sans[:plies]))
+    pool = sorted(lines)
+    rng.shuffle(pool)
+    # More games than distinct lines: cycle through them again
+    return [list(pool[i % len(pool)]) for i in range(count)]
+
+
+def play_game(white: dict, black: dict, opening: list[str], max_plies: int,
+              seed: int) -> dict:
+    """One game from `opening`; returns {"white", "black", "result", "moves_uci", "termination"}."""
+    random.seed(seed)   # get_best_move shuffles and blunders with the global RNG
+    board = chess.Board()
+    for uci in opening:
+        board.push_uci(uci)
+
+    # Players carrying "weights" (tune.py check) swap the eval tables per move,
+    # players with "switches" the evaluation terms. Adjudication uses the
+    # built-in tables and default terms; both are restored after the game.
+    weighted = "weights" in white or "weights" in black
+    switched = "switches" in white or "switches" in black
+    defaults = dict(EVAL_SWITCHES)
+    tables   = {**weights_snapshot(), "id": common.weights_id} if weighted else None
+    termination = "normal"
+    while True:
+        outcome = board.outcome()
+        if outcome is not None:
+            result = outcome.result()
+            break
+        if board.is_repetition(3) or board.halfmove_clock >= 100:
+            result = "1/2-1/2"
+            break
+        if len(board.move_stack) >= max_plies:
+            EVAL_SWITCHES.update(defaults)
+            if weighted:
+                apply_weights(None)
+            score = evaluate(board)
+            result = "1-0" if score >= ADJUDICATE_CP else "0-1" if score <= -ADJUDICATE_CP else "1/2-1/2"
+            termination = "adjudication"
+            break
+        player = white if board.turn == chess.WHITE else black
+        if weighted:
+            apply_weights(player.get("weights"))
+        if switched:
+            EVAL_SWITCHES.update({**defaults, **player.get("switches", {})})
+        board.push(choose_move(player, board))
+    EVAL_SWITCHES.update(defaults)
+    if weighted:
+        apply_weights(tables)
+
+    return {"white": white["name"], "black": black["name"], "result": result,
+            "moves_uci": [m.uci() for m in board.move_stack], "opening_plies": len(opening),
+            "termination": termination}
+
+
+def game_pgn(game: dict, round_no: int) -> str:
+    pgn = chess.pgn.Game()
+    pgn.headers["Event"]  = "chess-coach tournament"
+    pgn.headers["Round"]  = str(round_no)
+    pgn.headers["White"]  = game["white"]
+    pgn.headers["Black"]  = game["black"]
+    pgn.headers["Result"] = game["result"]
+    pgn.headers["Termination"] = game["termination"]
+    node = pgn
+    for i, uci in enumerate(game["moves_uci"]):
+        node = node.add_variation(chess.Move.from_uci(uci))
+        if i + 1 == game["opening_plies"]:
+            node.comment = "end of opening"
+    return str(pgn)
+
+
+def _pool(workers: int | None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(workers or os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+def _write_pgn(path: str | None, games: list[dict]) -> None:
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        for i, game in enumerate(games, start=1):
+            f.write(game_pgn(game, i) + "\n\n")
+
+
+# ---------------------------------------------------------------------------
+# Ratings
+# ---------------------------------------------------------------------------
+POINTS = {"1-0": (1.0, 0.0), "0-1": (0.0, 1.0), "1/2-1/2": (0.5, 0.5)}
+
+
+def expected(diff: float) -> float:
+    return 1 / (1 + 10 ** (-diff / 400))
+
+
+def elo_table(names: list[str], games: list[dict]) -> list[dict]:
+    """
+    Maximum-likelihood (Bradley-Terry) ratings, mean 0, with one virtual draw
+    per pairing so a 100% score stays finite.
+    """
+    n = {a: {b: 1.0 for b in names if b != a} for a in names}           # games a vs b
+    s = {a: {b: 0.5 for b in names if b != a} for a in names}           # a's points vs b
+    record = {a: {"games": 0, "wins": 0, "draws": 0, "losses": 0, "points": 0.0} for a in names}
+    for g in games:
+        w, b = g["white"], g["black"]
+        pw, pb = POINTS[g["result"]]
+        n[w][b] += 1
+        n[b][w] += 1
+        s[w][b] += pw
+        s[b][w] += pb
+        for player, pts in ((w, pw), (b, pb)):
+            r = record[player]
+            r["games"] += 1
+            r["points"] += pts
+            r["wins" if pts == 1 else "draws" if pts == 0.5 else "losses"] += 1
+
+    rating = {a: 0.0 for a in names}
+    for _ in range(200):
+        for a in names:
+            e = sum(n[a][b] * expected(rating[a] - rating[b]) for b in n[a])
+            d = sum(n[a][b] * expected(rating[a] - rating[b]) * (1 - expected(rating[a] - rating[b]))
+                    for b in n[a])
+            rating[a] += (sum(s[a].values()) - e) / (d * math.log(10) / 400) if d else 0
+        mean = sum(rating.values()) / len(rating)
+        rating = {a: r - mean for a, r in rating.items()}
+
+    rows = [{"player": a, "elo": round(rating[a]), **record[a],
+             "score_pct": round(100 * record[a]["points"] / record[a]["games"], 1)
+             if record[a]["games"] else None} for a in names]
+    return sorted(rows, key=lambda r: -r["elo"])
+
+
+# ---------------------------------------------------------------------------
+# SPRT
+# ---------------------------------------------------------------------------
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    """
+    Log-likelihood ratio of H1 (elo = elo1) vs. H0 (elo = elo0) for the
+    trinomial W/D/L counts, in the usual normal approximation. Half a game
+    is added to each outcome so a one-sided start still has a variance.
+    """
+    wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+    total = wins + draws + losses
+    score = (wins + 0.5 * draws) / total
+    var = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / total
+    s0, s1 = expected(elo0), expected(elo1)
+    return (s1 - s0) * (2 * score - s0 - s1) / (2 * var / total)
+
+
+def sprt_bounds(alpha: float, beta: float) -> tuple[float, float]:
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def elo_interval(wins: int, draws: int, losses: int) -> dict:
+    """Elo difference with a 95% interval from the score's standard error."""
+    total = wins + draws + losses
+    score = (wins + 0.5 * draws) / total
+    var = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / total
+    margin = 1.96 * math.sqrt(var / total)
+
+    def elo(p: float) -> float:
+        p = min(max(p, 1e-6), 1 - 1e-6)
+        return round(-400 * math.log10(1 / p - 1), 1)
+
+    return {"elo": elo(score), "low": elo(score - margin), "high": elo(score + margin)}
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+def cmd_round_robin(args) -> dict:
+    specs   = [p.strip() for p in args.players.split(",") if p.strip()]
+    players = [resolve_player(spec) for spec in specs]
+    if len(players) < 2 or len(set(specs)) != len(specs):
+        return {"ok": False, "error": "Need at least two distinct players"}
+
+    rng  = random.Random(args.seed)
+    jobs = []
+    for i, a in enumerate(players):
+        for b in players[i + 1:]:
+            for opening in sample_openings(args.rounds, args.opening_plies, rng):
+                jobs += [(a, b, opening), (b, a, opening)]
+
+    start = time.perf_counter()
+    with _pool(args.workers) as pool:
+        futures = [pool.submit(play_game, w, b, opening, args.max_plies, rng.randrange(2 ** 32))
+                   for w, b, opening in jobs]
+        games = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    _write_pgn(args.pgn, games)
+
+    return {
+        "ok":           True,
+        "games":        len(games),
+        "seconds":      round(elapsed, 1),
+        "adjudicated":  sum(g["termination"] == "adjudication" for g in games),
+        "table":        elo_table(specs, games),
+        "pgn":          args.pgn,
+    }
+
+
+def cmd_sprt(args) -> dict:
+    a, b   = resolve_player(args.a), resolve_player(args.b)
+    lower, upper = sprt_bounds(args.alpha, args.beta)
+    rng    = random.Random(args.seed)
+    workers = args.workers or os.cpu_count() or 1
+    counts = {"wins": 0, "draws": 0, "losses": 0}
+    games: list[dict] = []
+    llr, verdict = 0.0, "inconclusive"
+    start = time.perf_counter()
+
+    openings = iter(sample_openings(math.ceil(args.max_games / 2), args.opening_plies, rng))
+
+    with _pool(workers) as pool:
+        while len(games) < args.max_games and verdict == "inconclusive":
+            # One batch = one opening pair per worker; test after each batch.
+            # An odd --max-games ends with a single game from the last opening.
+            budget  = args.max_games - len(games)
+            futures = []
+            for _ in range(min(workers, math.ceil(budget / 2))):
+                opening = next(openings)
+                for a_white in (True, False)[:budget - len(futures)]:
+                    w, bl = (a, b) if a_white else (b, a)
+                    futures.append((pool.submit(play_game, w, bl, opening, args.max_plies,
+                                                rng.randrange(2 ** 32)), a_white))
+            for f, a_white in futures:
+                game = f.result()
+                games.append(game)
+                pa = POINTS[game["result"]][0 if a_white else 1]
+                counts["wins" if pa == 1 else "draws" if pa == 0.5 else "losses"] += 1
+            llr = sprt_llr(counts["wins"], counts["draws"], counts["losses"], args.elo0, args.elo1)
+            if llr >= upper:
+                verdict = "H1"
+            elif llr <= lower:
+                verdict = "H0"
+    elapsed = time.perf_counter() - start
+    _write_pgn(args.pgn, games)
+
+    return {
+        "ok":       True,
+        "a":        a["name"],
+        "b":        b["name"],
+        "verdict":  verdict,
+        "meaning":  {"H1": f"{a['name']} is stronger by at least {args.elo1:g} Elo",
+                     "H0": f"{a['name']} is not stronger by more than {args.elo0:g} Elo",
+                     "inconclusive": "max games reached before a decision"}[verdict],
+        "games":    len(games),
+        **counts,
+        "llr":      round(llr, 3),
+        "bounds":   [round(lower, 3), round(upper, 3)],
+        "elo_diff": elo_interval(counts["wins"], counts["draws"], counts["losses"]),
+        "seconds":  round(elapsed, 1),
+        "pgn":      args.pgn,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+def main():
+    p   = argparse.ArgumentParser(description="Engine-vs-engine tournaments")
+    sub = p.add_subparsers(dest="command")
+
+    def common_options(sp):
+        sp.add_argument("--opening-plies", type=int, default=6)
+        sp.add_argument("--max-plies",     type=int, default=160)
+        sp.add_argument("--seed",          type=int, default=0)
+        sp.add_argument("--workers",       type=int, default=None)
+        sp.add_argument("--pgn",           default=None, help="Write all games to this PGN file")
+
+    rr = sub.add_parser("round_robin")
+    rr.add_argument("--players", required=True, help="Comma-separated, e.g. beginner,tal@2,fischer")
+    rr.add_argument("--rounds",  type=int, default=2, help="Opening pairs per pairing")
+    common_options(rr)
+
+    sp = sub.add_parser("sprt")
+    sp.add_argument("--a",         required=True, help="Candidate player")
+    sp.add_argument("--b",         required=True, help="Baseline player")
+    sp.add_argument("--elo0",      type=float, default=0.0)
+    sp.add_argument("--elo1",      type=float, default=20.0)
+    sp.add_argument("--alpha",     type=float, default=0.05)
+    sp.add_argument("--beta",      type=float, default=0.05)
+    sp.add_argument("--max-games", type=int, default=2000)
+    common_options(sp)
+
+    args = p.parse_args()
+    if not args.command:
+        p.print_help()
+        sys.exit(1)
+    if args.pgn:
+        args.pgn = os.path.expanduser(args.pgn)
+
+    dispatch = {
+        "round_robin": cmd_round_robin,
+        "sprt":        cmd_sprt,
+    }
+    try:
+        result = dispatch[args.command](args)
+    except ValueError as e:
+        result = {"ok": False, "error": str(e)}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+tune.py — Texel tuning of the evaluation tables against game results.
+
+Commands:
+  extract  [--games-dir DIR] [--pgn FILE ...] [--output FILE] [--skip-plies N]
+           Quiet positions + game results from the archive (all users) and PGNs
+  fit      [--positions FILE] [--output FILE] [--epochs N] [--lr X] [--l2 X]
+           Fit the tables by minimizing the sigmoid prediction error; writes a
+           versioned weights file
+  install  (--weights FILE | --reset)
+           Make a weights file the one evaluate() loads at startup
+           (common.EVAL_WEIGHTS), or go back to the built-in tables
+  check    --weights FILE [--games N] [--player LEVEL] [--workers N]
+           Before/after match: tuned vs. built-in tables (tournament.py games)
+
+The evaluation outside the endgame bitbases is linear in two weights per
+(piece type, square), a middlegame one (PIECE_VALUES[pt] + PST[pt][sq]) and
+an endgame one (PIECE_VALUES_EG, PST_EG), blended by the game phase p:
+eval = p * sum(mg) + (1 - p) * sum(eg) + fixed, where fixed holds the terms
+not tuned here (pawn structure, mobility, king safety). A position is stored as the indices of its
+pieces' weights and their signs (+1 White, -1 Black), padded to 32, plus p
+and fixed. The predicted White score is sigmoid(K * eval) with
+sigmoid(x) = 1 / (1 + 10^(-x / 400)):
+
+  - K is fitted first, with the starting weights fixed (Texel's method);
+  - the weights are then fitted by Adam on the mean squared error against
+    the results (1 / 0.5 / 0), with an L2 pull towards the starting tables.
+    Gradients are gathered for all positions at once with np.bincount, so
+    an epoch over millions of positions is a few vector operations.
+
+10% of the positions are held out; fit reports the error on both parts
+before and after. Quiet = not in check, no capture of a more valuable or
+undefended piece available, and the move played next is not a capture or
+promotion, so the static eval is a fair estimate of the position.
+
+Needs NumPy. All output: JSON to stdout.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common import (
+    PIECE_VALUES, PHASE_WEIGHTS, PHASE_MAX, WEIGHTS_VERSION, EVAL_WEIGHTS, pst_index,
+    weights_snapshot, load_weights, pawn_key, extra_terms,
+)
+
+import chess
+import chess.pgn
+
+try:
+    import numpy as np
+except ImportError:   # optional: only this tool needs it
+    np = None
+
+GAMES_DIR      = os.path.expanduser("~/.chess_coach/games/")
+POSITIONS_FILE = os.path.expanduser("~/.chess_coach/tuning/positions.npz")
+TUNING_DIR     = os.path.expanduser("~/.chess_coach/tuning")
+N_FEATURES     = 6 * 64         # one weight per (piece type, square) and game stage
+PAD            = 2 * N_FEATURES # index of the always-zero padding weight
+MAX_PIECES     = 32
+RESULTS        = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+# ---------------------------------------------------------------------------
+# Extraction
+# ---------------------------------------------------------------------------
+def features(board: chess.Board) -> tuple[list[int], list[int], float, float]:
+    """Middlegame weight indices and signs of every piece on the board, the phase (0-1)
+    and the fixed (untuned) part of the eval."""
+    idx, sign, phase = [], [], 0
+    for sq, piece in board.piece_map().items():
+        idx.append((piece.piece_type - 1) * 64 + pst_index(sq, piece.color))
+        sign.append(1 if piece.color == chess.WHITE else -1)
+        phase += PHASE_WEIGHTS[piece.piece_type]
+    phase = min(phase, PHASE_MAX) / PHASE_MAX
+    fixed_mg, fixed_eg = extra_terms(board, pawn_key(board))
+    return idx, sign, phase, fixed_mg * phase + fixed_eg * (1 - phase)
+
+
+def is_quiet(board: chess.Board, next_move: chess.Move | None) -> bool:
+    if board.is_check():
+        return False
+    if next_move is not None and (board.is_capture(next_move) or next_move.promotion):
+        return False
+    for move in board.generate_legal_captures():
+        victim = board.piece_type_at(move.to_square) or chess.PAWN   # en passant
+        if (PIECE_VALUES[victim] > PIECE_VALUES[board.piece_type_at(move.from_square)]
+                or not board.is_attacked_by(not board.turn, move.to_square)):
+            return False
+    return True
+
+
+def game_positions(moves: list[chess.Move], result: float, skip_plies: int,
+                   board: chess.Board | None = None) -> list[tuple]:
+    """Quiet positions of one game (after the first `skip_plies`) with its result."""
+    board = board or chess.Board()
+    out = []
+    for ply, move in enumerate(moves + [None]):
+        if (ply >= skip_plies and chess.popcount(board.occupied) > 4
+                and not board.is_game_over() and is_quiet(board, move)):
+            out.append((*features(board), result))
+        if move is None:
+            break
+        board.push(move)
+    return out
+
+
+def archive_games(games_dir: str):
+    """(moves, result) of every finished game JSON under games_dir (all users)."""
+    for root, _, files in os.walk(games_dir):
+        for name in sorted(files):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(root, name)) as f:
+                    state = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if state.get("result") in RESULTS and state.get("moves_uci"):
+                yield [chess.Move.from_uci(u) for u in state["moves_uci"]], RESULTS[state["result"]]
+
+
+def pgn_games(path: str):
+    with open(path) as f:
+        pgn = io.StringIO(f.read())
+    while True:
+        game = chess.pgn.read_game(pgn)
+        if game is None:
+            break
+        result = game.headers.get("Result")
+        if result in RESULTS and not game.errors:
+            yield list(game.mainline_moves()), RESULTS[result], game.board()
+
+
+def _pack(positions: list[tuple[list[int], list[int], float, float, float]]) -> dict:
+    n    = len(positions)
+    idx  = np.full((n, MAX_PIECES), PAD, dtype=np.int16)
+    sign = np.zeros((n, MAX_PIECES), dtype=np.int8)
+    for i, (ix, sg, *_) in enumerate(positions):
+        idx[i, :len(ix)]  = ix
+        sign[i, :len(sg)] = sg
+    phase  = np.array([p[2] for p in positions], dtype=np.float32)
+    fixed  = np.array([p[3] for p in positions], dtype=np.float32)
+    result = np.array([p[4] for p in positions], dtype=np.float32)
+    return {"idx": idx, "sign": sign, "phase": phase, "fixed": fixed, "result": result}
+
+
+def _eg_idx(idx: "np.ndarray") -> "np.ndarray":
+    """Endgame weight indices matching middlegame ones (the pad stays the pad)."""
+    return np.where(idx == PAD, PAD, idx + N_FEATURES)
+
+
+# ---------------------------------------------------------------------------
+# Fitting
+# ---------------------------------------------------------------------------
+STAGES = (("piece_values", "pst"), ("piece_values_eg", "pst_eg"))   # weight blocks, in order
+
+
+def weights_vector(weights: dict) -> "np.ndarray":
+    """Tables -> one weight per feature, middlegame block then endgame block (+ the zero pad).
+    Kings: PST only (values cancel)."""
+    w = np.zeros(2 * N_FEATURES + 1)
+    for stage, (values, tables) in enumerate(STAGES):
+        for pt in chess.PIECE_TYPES:
+            name  = chess.piece_name(pt)
+            value = 0 if pt == chess.KING else weights[values][name]
+            start = stage * N_FEATURES + (pt - 1) * 64
+            w[start:start + 64] = value + np.array(weights[tables][name])
+    return w
+
+
+def vector_weights(w: "np.ndarray") -> dict:
+    """Inverse of weights_vector: piece value = mean over the squares a piece can stand on."""
+    weights = {"version": WEIGHTS_VERSION}
+    for stage, (values, tables) in enumerate(STAGES):
+        weights[values], weights[tables] = {}, {}
+        for pt in chess.PIECE_TYPES:
+            name  = chess.piece_name(pt)
+            start = stage * N_FEATURES + (pt - 1) * 64
+            table = w[start:start + 64].copy()
+            if pt == chess.KING:
+                value = PIECE_VALUES[chess.KING]
+            else:
+                squares = slice(8, 56) if pt == chess.PAWN else slice(0, 64)
+                value   = int(round(table[squares].mean()))
+            pst = np.rint(table - (0 if pt == chess.KING else value)).astype(int)
+            if pt == chess.PAWN:
+                pst[:8] = pst[56:] = 0   # no pawns on the back ranks
+            weights[values][name] = int(value)
+            weights[tables][name] = pst.tolist()
+    return weights
+
+
+def _predict(w, data, k):
+    idx, sign, phase = data["idx"], data["sign"], data["phase"]
+    e = ((w[idx] * sign).sum(axis=1) * phase + (w[_eg_idx(idx)] * sign).sum(axis=1) * (1 - phase)
+         + data["fixed"])
+    return 1 / (1 + 10 ** (-k * e / 400)), e
+
+
+def mse(w, data, k) -> float:
+    p, _ = _predict(w, data, k)
+    return float(np.mean((data["result"] - p) ** 2))
+
+
+def fit_k(w, data, lo: float = 0.01, hi: float = 4.0) -> float:
+    """Golden-section search for the K minimizing the error at fixed weights."""
+    g = (5 ** 0.5 - 1) / 2
+    a, b = lo, hi
+    for _ in range(40):
+        c, d = b - g * (b - a), a + g * (b - a)
+        if mse(w, data, c) < mse(w, data, d):
+            b = d
+        else:
+            a = c
+    return (a + b) / 2
+
+
+def fit_weights(w0, data, k: float, epochs: int, lr: float, l2: float) -> "np.ndarray":
+    """Adam on mean squared error + l2 * |w - w0|^2."""
+    idx, sign, phase, r = data["idx"], data["sign"], data["phase"], data["result"]
+    flat_idx = np.concatenate([idx.ravel(), _eg_idx(idx).ravel()]).astype(np.int64)
+    n = len(r)
+    w = w0.copy()
+    m = np.zeros_like(w)
+    v = np.zeros_like(w)
+    b1, b2, eps = 0.9, 0.999, 1e-8
+    scale = k * np.log(10) / 400
+    for t in range(1, epochs + 1):
+        p, _ = _predict(w, data, k)
+        # d/d(eval) of (r - p)^2, then scattered onto every piece's two weights
+        g_eval = -2 * (r - p) * p * (1 - p) * scale / n
+        g_mg   = sign * (g_eval * phase)[:, None]
+        g_eg   = sign * (g_eval * (1 - phase))[:, None]
+        grad = np.bincount(flat_idx, weights=np.concatenate([g_mg.ravel(), g_eg.ravel()]),
+                           minlength=2 * N_FEATURES + 1)
+        grad += 2 * l2 * (w - w0)
+        grad[PAD] = 0
+        m = b1 * m + (1 - b1) * grad
+        v = b2 * v + (1 - b2) * grad ** 2
+        w -= lr * (m / (1 - b1 ** t)) / (np.sqrt(v / (1 - b2 ** t)) + eps)
+        w[PAD] = 0
+    return w
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+def cmd_extract(args) -> dict:
+    start = time.perf_counter()
+    positions, games = [], 0
+    sources = [(moves, result, None) for moves, result in archive_games(args.games_dir)]
+    for path in args.pgn or []:
+        sources.extend(pgn_games(os.path.expanduser(path)))
+    for moves, result, board in sources:
+        positions.extend(game_positions(moves, result, args.skip_plies, board))
+        games += 1
+    if not positions:
+        return {"ok": False, "error": "No quiet positions from finished games found."}
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    np.savez_compressed(args.output, **_pack(positions))
+    return {"ok": True, "games": games, "positions": len(positions), "output": args.output,
+            "seconds": round(time.perf_counter() - start, 2)}
+
+
+def cmd_fit(args) -> dict:
+    if not os.path.exists(args.positions):
+        return {"ok": False, "error": f"No positions file: {args.positions} (run extract first)"}
+    with np.load(args.positions) as f:
+        if "fixed" not in f:
+            return {"ok": False, "error": f"{args.positions} predates the current eval terms "
+                                          "(run extract again)"}
+        data = {k: f[k] for k in ("idx", "sign", "phase", "fixed", "result")}
+    n = len(data["result"])
+    order = np.random.default_rng(args.seed).permutation(n)
+    cut   = n - max(1, n // 10) if n > 1 else n
+    train = {k: v[order[:cut]] for k, v in data.items()}
+    valid = {k: v[order[cut:]] for k, v in data.items()} if cut < n else train
+
+    start = time.perf_counter()
+    w0 = weights_vector(weights_snapshot())
+    k  = fit_k(w0, train)
+    w  = fit_weights(w0, train, k, args.epochs, args.lr, args.l2)
+    weights = vector_weights(w)
+    w_out   = weights_vector(weights)   # as rounded into the file
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "positions":   n,
+        "k":           round(k, 4),
+        "train_error": {"before": round(mse(w0, train, k), 6), "after": round(mse(w_out, train, k), 6)},
+        "valid_error": {"before": round(mse(w0, valid, k), 6), "after": round(mse(w_out, valid, k), 6)},
+        "epochs":      args.epochs,
+        "seconds":     round(elapsed, 2),
+    }
+    body = json.dumps({key: weights[key] for stage in STAGES for key in stage}, sort_keys=True)
+    weights = {"version": WEIGHTS_VERSION, "id": hashlib.sha1(body.encode()).hexdigest()[:12],
+               "created": datetime.now().isoformat(timespec="seconds"), "tuning": report,
+               **weights}
+
+    output = args.output or os.path.join(
+        TUNING_DIR, f"weights_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(weights, f, indent=1)
+    return {"ok": True, "output": output, "id": weights["id"], **report,
+            "piece_values": weights["piece_values"], "piece_values_eg": weights["piece_values_eg"]}
+
+
+def cmd_install(args) -> dict:
+    if args.reset:
+        if os.path.exists(EVAL_WEIGHTS):
+            os.remove(EVAL_WEIGHTS)
+        return {"ok": True, "installed": None, "note": "evaluate() uses the built-in tables"}
+    try:
+        weights = load_weights(args.weights)
+    except (OSError, ValueError) as e:
+        return {"ok": False, "error": str(e)}
+    os.makedirs(os.path.dirname(EVAL_WEIGHTS), exist_ok=True)
+    shutil.copyfile(args.weights, EVAL_WEIGHTS)
+    return {"ok": True, "installed": EVAL_WEIGHTS, "id": weights.get("id")}
+
+
+def cmd_check(args) -> dict:
+    from tournament import resolve_player, play_game, sample_openings, elo_interval, POINTS, _pool
+
+    try:
+        tuned_weights = load_weights(args.weights)
+    except (OSError, ValueError) as e:
+        return {"ok": False, "error": str(e)}
+    tuned    = {**resolve_player(args.player), "name": "tuned", "weights": tuned_weights}
+    baseline = {**resolve_player(args.player), "name": "builtin", "weights": None}
+
+    rng    = random.Random(args.seed)
+    jobs   = []
+    for opening in sample_openings(max(1, args.games // 2), args.opening_plies, rng):
+        jobs += [(tuned, baseline, opening, True), (baseline, tuned, opening, False)]
+    counts = {"wins": 0, "draws": 0, "losses": 0}
+    start  = time.perf_counter()
+    with _pool(args.workers) as pool:
+        futures = [(pool.submit(play_game, w, b, opening, args.max_plies, rng.randrange(2 ** 32)),
+                    tuned_white) for w, b, opening, tuned_white in jobs]
+        for f, tuned_white in futures:
+            pts = POINTS[f.result()["result"]][0 if tuned_white else 1]
+            counts["wins" if pts == 1 else "draws" if pts == 0.5 else "losses"] += 1
+
+    return {"ok": True, "weights": args.weights, "id": tuned_weights.get("id"),
+            "player": args.player, "games": len(jobs), **counts,
+            "elo_diff": elo_interval(counts["wins"], counts["draws"], counts["losses"]),
+            "seconds": round(time.perf_counter() - start, 1)}
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+def main():
+    p   = argparse.ArgumentParser(description="Texel tuning of the evaluation tables")
+    sub = p.add_subparsers(dest="command")
+
+    ex = sub.add_parser("extract")
+    ex.add_argument("--games-dir",  default=GAMES_DIR)
+    ex.add_argument("--pgn",        action="append", help="PGN file (repeatable)")
+    ex.add_argument("--output",     default=POSITIONS_FILE)
+    ex.add_argument("--skip-plies", type=int, default=8,
+                    help="Ignore the opening (book moves say little about the eval)")
+
+    ft = sub.add_parser("fit")
+    ft.add_argument("--positions", default=POSITIONS_FILE)
+    ft.add_argument("--output",    default=None,
+                    help="Weights file (default: ~/.chess_coach/tuning/weights_<time>.json)")
+    ft.add_argument("--epochs",    type=int,   default=500)
+    ft.add_argument("--lr",        type=float, default=1.0, help="Adam step in centipawns")
+    ft.add_argument("--l2",        type=float, default=1e-6,
+                    help="Pull towards the starting tables (guards against thin data)")
+    ft.add_argument("--seed",      type=int,   default=0)
+
+    ins = sub.add_parser("install")
+    grp = ins.add_mutually_exclusive_group(required=True)
+    grp.add_argument("--weights")
+    grp.add_argument("--reset", action="store_true")
+
+    ck = sub.add_parser("check")
+    ck.add_argument("--weights",       required=True)
+    ck.add_argument("--games",         type=int, default=40)
+    ck.add_argument("--player",        default="intermediate",
+                    help="Level or persona both sides play as")
+    ck.add_argument("--opening-plies", type=int, default=6)
+    ck.add_argument("--max-plies",     type=int, default=160)
+    ck.add_argument("--workers",       type=int, default=None)
+    ck.add_argument("--seed",          type=int, default=0)
+
+    args = p.parse_args()
+    if not args.command:
+        p.print_help()
+        sys.exit(1)
+    if args.command in ("extract", "fit") and np is None:
+        result = {"ok": False, "error": f"tune.py {args.command} needs NumPy (pip install numpy)."}
+    else:
+        dispatch = {
+            "extract": cmd_extract,
+            "fit":     cmd_fit,
+            "install": cmd_install,
+            "check":   cmd_check,
+        }
+        result = dispatch[args.command](args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
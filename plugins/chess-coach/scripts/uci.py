@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+uci.py — UCI protocol front-end for the chess-coach search.
+
+Usage:
+  python3 uci.py        then speak UCI on stdin / stdout (any GUI or match runner)
+
+Supported commands:
+  uci, isready, debug, setoption, ucinewgame, quit
+  position (startpos | fen FEN) [moves ...]
+  go [depth N] [nodes N] [movetime MS] [wtime MS btime MS winc MS binc MS movestogo N]
+     [infinite] [ponder]
+  stop, ponderhit
+
+Options:
+  Persona  combo   Bundled or user persona; sets the search depth cap,
+                   blunder rate and aggression (and book, if the persona has one)
+  Book     string  Polyglot .bin book probed before searching (overrides the persona's)
+
+The search is common.py's minimax, run by iterative deepening on a worker
+thread (SearchControl counts nodes and enforces node / time limits and
+stop); after each completed depth an `info depth .. score .. nodes .. nps ..
+pv ..` line is printed. An interrupted iteration is discarded.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common import (
+    search_root, pick_root_move, mate_in, SearchControl, SearchAborted, MATE_BOUND,
+)
+from engine import load_persona_for_engine, BUNDLED_PERSONA_DIR_DEFAULT
+from book import book_move, resolve_book
+
+import chess
+
+ENGINE_NAME   = "chess-coach"
+ENGINE_AUTHOR = "chess-coach contributors"
+
+MAX_DEPTH     = 64
+MOVE_OVERHEAD = 0.05    # seconds kept back per move for I/O latency
+DEFAULT_MOVES_TO_GO = 30
+SOFT_STOP     = 0.5     # no new iteration once this share of the soft limit is gone
+
+
+def persona_ids(bundled_dir: str = BUNDLED_PERSONA_DIR_DEFAULT) -> list[str]:
+    ids = set()
+    for directory in (bundled_dir, os.path.expanduser("~/.chess_coach/personas")):
+        if os.path.isdir(directory):
+            ids.update(name[:-5] for name in os.listdir(directory) if name.endswith(".json"))
+    return sorted(ids)
+
+
+def time_budget(limits: dict, turn: chess.Color) -> tuple[float | None, float | None]:
+    """
+    (soft, hard) seconds for this move. No new iteration starts after the soft
+    limit; the search is aborted at the hard limit. (None, None) = no clock.
+    """
+    if "movetime" in limits:
+        hard = max(0.01, limits["movetime"] / 1000 - MOVE_OVERHEAD)
+        return hard, hard
+    left = limits.get("wtime" if turn == chess.WHITE else "btime")
+    if left is None:
+        return None, None
+    left  = left / 1000
+    inc   = limits.get("winc" if turn == chess.WHITE else "binc", 0) / 1000
+    togo  = limits.get("movestogo") or DEFAULT_MOVES_TO_GO
+    soft  = left / togo + inc * 0.75
+    hard  = min(soft * 3, left * 0.5)
+    return max(0.01, soft - MOVE_OVERHEAD), max(0.01, hard - MOVE_OVERHEAD)
+
+
+def uci_score(score: int, turn: chess.Color) -> str:
+    """A White-perspective searched score as a UCI `score` from the mover's side."""
+    mate = mate_in(score)
+    if mate is not None:
+        return f"mate {mate if turn == chess.WHITE else -mate}"
+    return f"cp {score if turn == chess.WHITE else -score}"
+
+
+class UciEngine:
+    def __init__(self, out=None):
+        self.out     = out or (lambda line: print(line, flush=True))
+        self.board   = chess.Board()
+        self.options = {"Persona": "none", "Book": ""}
+        self.persona: dict | None = None
+        self.tt: dict = {}
+        self.ctl: SearchControl | None = None
+        self.thread: threading.Thread | None = None
+        self.pondering = False
+        self.infinite  = False
+        self.soft_limit: float | None = None
+        self.hard_limit: float | None = None
+        self.started   = 0.0
+        self.debug     = False
+
+    # -- Protocol ------------------------------------------------------------
+    def handle(self, line: str) -> bool:
+        """Process one input line; False on quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        cmd, rest = tokens[0], tokens[1:]
+        if cmd == "uci":
+            self.out(f"id name {ENGINE_NAME}")
+            self.out(f"id author {ENGINE_AUTHOR}")
+            personas = " ".join(f"var {p}" for p in ["none", *persona_ids()])
+            self.out(f"option name Persona type combo default none {personas}")
+            self.out("option name Book type string default <empty>")
+            self.out("uciok")
+        elif cmd == "isready":
+            self.out("readyok")
+        elif cmd == "debug":
+            self.debug = rest[:1] == ["on"]
+        elif cmd == "setoption":
+            self.set_option(rest)
+        elif cmd == "ucinewgame":
+            self.wait()
+            self.tt.clear()
+        elif cmd == "position":
+            self.wait()
+            self.set_position(rest)
+        elif cmd == "go":
+            self.wait()
+            self.go(rest)
+        elif cmd == "stop":
+            self.stop()
+        elif cmd == "ponderhit":
+            self.ponderhit()
+        elif cmd == "quit":
+            self.stop()
+            return False
+        elif self.debug:
+            self.out(f"info string unknown command {cmd}")
+        return True
+
+    def set_option(self, tokens: list[str]) -> None:
+        # setoption name <id...> [value <x...>]
+        text = " ".join(tokens)
+        if not text.startswith("name "):
+            return
+        name, _, value = text[5:].partition(" value ")
+        name, value = name.strip(), value.strip()
+        if name.lower() == "persona":
+            self.options["Persona"] = value or "none"
+            self.persona = (None if value in ("", "none")
+                            else load_persona_for_engine(value, BUNDLED_PERSONA_DIR_DEFAULT))
+            if value not in ("", "none") and self.persona is None:
+                self.out(f"info string unknown persona {value}")
+        elif name.lower() == "book":
+            self.options["Book"] = "" if value in ("", "<empty>") else value
+
+    def set_position(self, tokens: list[str]) -> None:
+        if "moves" in tokens:
+            i = tokens.index("moves")
+            spec, moves = tokens[:i], tokens[i + 1:]
+        else:
+            spec, moves = tokens, []
+        # A malformed FEN or illegal move keeps the previous position
+        try:
+            board = chess.Board(" ".join(spec[1:])) if spec[:1] == ["fen"] else chess.Board()
+            for uci in moves:
+                board.push_uci(uci)
+        except ValueError as e:
+            self.out(f"info string bad position: {e}")
+            return
+        self.board = board
+
+    def go(self, tokens: list[str]) -> None:
+        limits: dict = {}
+        flags = {"infinite", "ponder"}
+        i = 0
+        while i < len(tokens):
+            if tokens[i] in flags:
+                limits[tokens[i]] = True
+                i += 1
+            elif tokens[i] == "searchmoves":
+                i = len(tokens)   # not supported: search all moves
+            elif i + 1 < len(tokens):
+                try:
+                    limits[tokens[i]] = int(tokens[i + 1])
+                except ValueError:
+                    pass
+                i += 2
+            else:
+                i += 1
+
+        self.pondering = bool(limits.get("ponder"))
+        self.infinite  = bool(limits.get("infinite"))
+        self.soft_limit, self.hard_limit = time_budget(limits, self.board.turn)
+        self.started = time.perf_counter()
+        self.ctl = SearchControl(max_nodes=limits.get("nodes"))
+        if self.hard_limit is not None and not self.pondering:
+            self.ctl.deadline = self.started + self.hard_limit
+
+        max_depth = limits.get("depth")
+        if max_depth is None:
+            max_depth = self.persona.get("depth", MAX_DEPTH) if self.persona else MAX_DEPTH
+            if not any(k in limits for k in ("wtime", "btime", "movetime", "nodes", "infinite",
+                                              "ponder")) and not self.persona:
+                max_depth = 3   # bare "go": a sensible default instead of searching forever
+
+        self.thread = threading.Thread(target=self._search, args=(self.board.copy(), max_depth,
+                                                                   self.ctl), daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.ctl is not None:
+            self.pondering = self.infinite = False
+            self.ctl.stopped = True
+        self.wait()
+
+    def ponderhit(self) -> None:
+        # The opponent played the predicted move: the clock starts now
+        if self.ctl is None or not self.pondering:
+            return
+        self.started = time.perf_counter()
+        if self.hard_limit is not None:
+            self.ctl.deadline = self.started + self.hard_limit
+        self.pondering = False
+
+    def wait(self) -> None:
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # -- Search --------------------------------------------------------------
+    def _search(self, board: chess.Board, max_depth: int, ctl: SearchControl) -> None:
+        best, ponder = self._choose(board, max_depth, ctl)
+        # In infinite / ponder mode bestmove must wait for stop (or ponderhit)
+        while (self.infinite or self.pondering) and not ctl.stopped:
+            time.sleep(0.005)
+        if best is None:
+            self.out("bestmove 0000")
+        else:
+            self.out(f"bestmove {best.uci()}" + (f" ponder {ponder.uci()}" if ponder else ""))
+
+    def _choose(self, board: chess.Board, max_depth: int,
+                ctl: SearchControl) -> tuple[chess.Move | None, chess.Move | None]:
+        moves = list(board.legal_moves)
+        if not moves:
+            return None, None
+
+        book_path = self.options["Book"] or (self.persona or {}).get("book")
+        if book_path:
+            move = book_move(resolve_book(book_path), board)
+            if move is not None:
+                self.out("info string book move")
+                return move, None
+
+        persona = self.persona or {}
+        if random.random() < persona.get("blunder_rate", 0.0):
+            self.out("info string persona blunder")
+            return random.choice(moves), None
+
+        aggression = persona.get("aggression", 0.0)
+        best = None
+        for depth in range(1, max_depth + 1):
+            try:
+                lines = search_root(board.copy(), depth, moves, self.tt, ctl,
+                                    n=None if aggression > 0 else 1)
+            except SearchAborted:
+                break
+            move, score, pv = pick_root_move(board, lines, aggression)
+            best = (move, pv)
+            elapsed = time.perf_counter() - self.started
+            self.out(f"info depth {depth} score {uci_score(score, board.turn)} nodes {ctl.nodes} "
+                     f"nps {int(ctl.nodes / elapsed) if elapsed else 0} time {int(elapsed * 1000)} "
+                     f"pv {' '.join(m.uci() for m in pv)}")
+            # Root lines sorted best-first: the next iteration's TT fills in that order
+            moves = [m for m, _, _ in sorted(lines, key=lambda l: l[1],
+                                             reverse=board.turn == chess.WHITE)]
+            if abs(score) >= MATE_BOUND or len(moves) == 1:
+                break   # forced mate found, or only move
+            if (self.soft_limit is not None and not self.pondering and not self.infinite
+                    and elapsed > self.soft_limit * SOFT_STOP):
+                break   # the next depth would most likely not finish in time
+
+        if best is None:   # aborted during depth 1
+            return moves[0], None
+        move, pv = best
+        return move, pv[1] if len(pv) > 1 else None
+
+
+def main():
+    engine = UciEngine()
+    for line in sys.stdin:
+        if not engine.handle(line.strip()):
+            break
+    engine.stop()
+
+
+if __name__ == "__main__":
+    main()
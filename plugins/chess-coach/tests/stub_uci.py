@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Stub UCI engine for backend tests.
+
+Legal moves are ranked in UCI-string order and scored 100, 90, 80, ...
+centipawns for the side to move; searchmoves keeps each move's score. Options:
+  MultiPV  lines reported per search
+  Hang     "true": ignore go (and stop) completely
+  Crash    "true": exit on the next go
+  Garbage  "true": answer go with an unparseable score
+"""
+
+import os
+import sys
+
+import chess
+
+
+def main():
+    board, multipv, hang, crash, garbage = chess.Board(), 1, False, False, False
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        cmd = tokens[0]
+        if cmd == "uci":
+            print(f"id name stub {os.getpid()}")
+            print("option name MultiPV type spin default 1 min 1 max 500")
+            print("option name Hang type check default false")
+            print("option name Crash type check default false")
+            print("option name Garbage type check default false")
+            print("uciok")
+        elif cmd == "isready":
+            print("readyok")
+        elif cmd == "setoption":
+            name, value = tokens[2], tokens[-1]
+            if name == "MultiPV":
+                multipv = int(value)
+            elif name == "Hang":
+                hang = value == "true"
+            elif name == "Crash":
+                crash = value == "true"
+            elif name == "Garbage":
+                garbage = value == "true"
+        elif cmd == "position":
+            board = chess.Board() if tokens[1] == "startpos" else chess.Board(" ".join(tokens[2:8]))
+            if "moves" in tokens:
+                for uci in tokens[tokens.index("moves") + 1:]:
+                    board.push_uci(uci)
+        elif cmd == "go" and crash:
+            sys.exit(1)
+        elif cmd == "go" and garbage:
+            print("info depth 1 score cp lots pv e2e4")
+            print("bestmove e2e4")
+        elif cmd == "go" and not hang:
+            ranked = sorted(board.legal_moves, key=lambda m: m.uci())
+            moves  = ranked
+            if "searchmoves" in tokens:
+                wanted = set(tokens[tokens.index("searchmoves") + 1:])
+                moves = [m for m in moves if m.uci() in wanted]
+            for i, move in enumerate(moves[:multipv]):
+                print(f"info depth 1 multipv {i + 1} score cp {100 - 10 * ranked.index(move)} "
+                      f"pv {move.uci()}")
+            print(f"bestmove {moves[0].uci()}" if moves else "bestmove 0000")
+        elif cmd == "quit":
+            break
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
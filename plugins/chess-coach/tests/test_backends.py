@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import chess
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from backends import UciBackend, PythonBackend, EngineError, uci_score
+from common import MATE_SCORE, mate_in
+from coach import evaluate_user
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+STUB    = [sys.executable, os.path.join(os.path.dirname(__file__), "stub_uci.py")]
+
+
+@pytest.fixture
+def stub():
+    backend = UciBackend(STUB, size=2, timeout=5)
+    yield backend
+    backend.close()
+
+
+def test_uci_scores_match_common_encoding():
+    assert uci_score("info score cp 35 pv e2e4".split(), chess.WHITE) == 35
+    assert uci_score("info score cp 35 pv e7e5".split(), chess.BLACK) == -35
+    assert mate_in(uci_score("info score mate 2 pv a1a8".split(), chess.WHITE)) == 2
+    assert mate_in(uci_score("info score mate 1 pv a8a1".split(), chess.BLACK)) == -1
+    assert uci_score("info score mate 0".split(), chess.WHITE) == -MATE_SCORE
+
+
+def test_multipv_lines_and_searchmoves(stub):
+    board = chess.Board()
+    board.push_uci("e2e4")
+    lines = stub.top_moves(board, 8, 3)
+    assert [l["move"].uci() for l in lines] == ["a7a5", "a7a6", "b7b5"]
+    assert [l["score"] for l in lines] == [-100, -90, -80]   # Black to move: White perspective
+    only = stub.top_moves(board, 8, 1, moves=[chess.Move.from_uci("e7e5")])
+    assert only[0]["move"].uci() == "e7e5"
+
+
+def test_processes_stay_warm_and_pool_is_bounded(stub):
+    board = chess.Board()
+    threads = [threading.Thread(target=stub.top_moves, args=(board, 1, 1)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = stub.stats()
+    assert stats["requests"] == 6 and stats["errors"] == 0
+    assert stats["running"] <= 2 and stats["restarts"] == 0
+    assert stats["p50_ms"] is not None
+
+
+def test_hung_and_crashed_engines_are_replaced():
+    hung = UciBackend(STUB, timeout=0.5, options={"Hang": "true"})
+    with pytest.raises(EngineError):
+        hung.top_moves(chess.Board(), 1, 1)
+    assert hung.stats()["errors"] == 1 and hung.stats()["running"] == 0
+    hung.close()
+
+    crashing = UciBackend(STUB, timeout=5, options={"Crash": "true"})
+    with pytest.raises(EngineError):
+        crashing.top_moves(chess.Board(), 1, 1)
+    assert crashing.stats()["restarts"] == 1
+    crashing.close()
+
+    with pytest.raises(EngineError):
+        UciBackend(["/nonexistent/engine"]).top_moves(chess.Board(), 1, 1)
+
+
+def test_unparseable_output_does_not_leak_processes():
+    garbled = UciBackend(STUB, size=1, timeout=5, options={"Garbage": "true"})
+    for _ in range(3):   # a leaked process would make later calls wait for the pool
+        with pytest.raises(EngineError, match="Unreadable engine output"):
+            garbled.top_moves(chess.Board(), 1, 1)
+    assert garbled.stats()["running"] == 0 and garbled.stats()["errors"] == 3
+    garbled.close()
+
+
+def test_evaluate_user_on_either_backend(stub):
+    state = {"moves_uci": ["e2e4"], "moves_san": ["e4"]}
+    builtin = evaluate_user(state, "e7e5", PythonBackend())
+    assert builtin["ok"] and builtin["move_san"] == "e5"
+
+    external = evaluate_user(state, "e7e5", stub)
+    assert external["best_move_san"] == "a5"                 # the stub's top choice
+    assert external["user_score_cp"] > external["best_score_cp"]
+
+
+def test_review_with_engine(tmp_path):
+    state = tmp_path / "game.json"
+    state.write_text(json.dumps({"moves_uci": ["e2e4", "e7e5", "g1f3"],
+                                 "moves_san": ["e4", "e5", "Nf3"], "move_records": []}))
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/review.py", "--state", str(state),
+                        "--output", str(tmp_path / "r.md"), "--analyze-depth", "4",
+                        "--workers", "2", "--engine", " ".join(STUB)],
+                       capture_output=True, text=True)
+    out = json.loads(r.stdout)
+    assert out["ok"]
+    assert out["analysis"]["positions"] == 4
+    assert out["analysis"]["backend"]["requests"] == 4
@@ -0,0 +1,51 @@
+import os
+import random
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from bitbase import probe, _Generator
+from common import evaluate, KNOWN_WIN
+
+
+def test_kpk_king_on_sixth_wins_either_side_to_move():
+    assert probe(chess.Board("4k3/8/4K3/4P3/8/8/8/8 w - - 0 1")) == (chess.WHITE, True)
+    assert probe(chess.Board("4k3/8/4K3/4P3/8/8/8/8 b - - 0 1")) == (chess.WHITE, True)
+
+
+def test_kpk_rook_pawn_is_drawn():
+    assert probe(chess.Board("k7/8/K7/P7/8/8/8/8 w - - 0 1")) == (chess.WHITE, False)
+
+
+def test_krk_hanging_rook_is_drawn_with_bare_king_to_move():
+    assert probe(chess.Board("8/8/8/8/8/8/4k3/4K2r w - - 0 1")) is not None
+    assert probe(chess.Board("8/8/8/8/8/8/3Kr3/7k b - - 0 1")) == (chess.BLACK, False)
+
+
+def test_black_strong_side_matches_mirrored_position():
+    rng = random.Random(3)
+    checked = 0
+    while checked < 200:
+        board = chess.Board(None)
+        sq = rng.sample(chess.SQUARES, 3)
+        board.set_piece_at(sq[0], chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(sq[1], chess.Piece(chess.KING, chess.BLACK))
+        board.set_piece_at(sq[2], chess.Piece(rng.choice([chess.PAWN, chess.ROOK]), chess.WHITE))
+        board.turn = rng.choice(chess.COLORS)
+        if not board.is_valid():
+            continue
+        assert probe(board)[1] == probe(board.mirror())[1]
+        checked += 1
+
+
+def test_evaluate_uses_bitbase_results():
+    assert evaluate(chess.Board("k7/8/K7/P7/8/8/8/8 w - - 0 1")) == 0
+    assert evaluate(chess.Board("4k3/8/4K3/4P3/8/8/8/8 b - - 0 1")) > KNOWN_WIN
+    assert evaluate(chess.Board("8/8/8/3k4/8/8/8/2q1K3 w - - 0 1")) < -KNOWN_WIN
+
+
+def test_generator_index_round_trip():
+    gen = _Generator("kbnk", {})
+    idx = gen.encode(1, chess.E1, chess.E8, [chess.C1, chess.G1])
+    assert gen.decode(idx) == (1, chess.E1, chess.E8, [chess.C1, chess.G1])
+    assert gen.legal(1, chess.E1, chess.E8, [chess.C1, chess.G1])
+    assert not gen.legal(0, chess.E1, chess.E2, [chess.C1, chess.G1])
@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+import chess
+import chess.polyglot
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from book import build, book_move, book_entries, games_from_pgn
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+PGN = """[White "Fischer"]
+[Black "Other"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 Nf6 4. O-O 1-0
+
+[White "Other"]
+[Black "Fischer"]
+[Result "0-1"]
+
+1. d4 Nf6 2. c4 g6 0-1
+
+[White "Fischer"]
+[Black "Other"]
+[Result "1/2-1/2"]
+
+1. e4 c5 2. Nf3 d6 1/2-1/2
+
+[White "Fischer"]
+[Black "Other"]
+[Result "1-0"]
+
+1. c4 e5 1-0
+"""
+
+
+def make_book(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    pgn.write_text(PGN)
+    path = str(tmp_path / "fischer.bin")
+    return build(games_from_pgn(str(pgn), "Fischer"), path), path
+
+
+def test_book_is_sorted_polyglot(tmp_path):
+    info, path = make_book(tmp_path)
+    raw = open(path, "rb").read()
+    assert len(raw) == info["entries"] * 16
+    keys = [int.from_bytes(raw[i:i + 8], "big") for i in range(0, len(raw), 16)]
+    assert keys == sorted(keys)
+
+
+def test_weights_follow_player_frequency(tmp_path):
+    _, path = make_book(tmp_path)
+    moves = {e["move_san"]: e["weight"] for e in book_entries(path, chess.Board())}
+    assert moves == {"e4": 2, "c4": 1}
+    # Only the named player's moves are recorded
+    board = chess.Board()
+    board.push_san("e4")
+    assert book_entries(path, board) == []
+
+
+def test_castling_round_trips_through_polyglot_encoding(tmp_path):
+    _, path = make_book(tmp_path)
+    board = chess.Board()
+    for san in "e4 e5 Nf3 Nc6 Bb5 Nf6".split():
+        board.push_san(san)
+    assert book_move(path, board) == board.parse_san("O-O")
+
+
+def test_missing_book_returns_none(tmp_path):
+    assert book_move(str(tmp_path / "nope.bin"), chess.Board()) is None
+    # A book built later in the same process is found on the next lookup
+    assert book_move(str(tmp_path / "fischer.bin"), chess.Board()) is None
+    _, path = make_book(tmp_path)
+    assert book_move(path, chess.Board()) is not None
+
+
+def test_rebuilt_book_is_reopened(tmp_path):
+    path  = str(tmp_path / "grow.bin")
+    small = [(["e2e4"], {chess.WHITE})]
+    large = [(["e2e4", "e7e5"], {chess.WHITE, chess.BLACK}), (["d2d4", "d7d5", "c2c4"], {chess.WHITE})]
+    build(small, path)
+    assert [e["move_uci"] for e in book_entries(path, chess.Board())] == ["e2e4"]
+    build(large, path)   # larger, same path
+    assert {e["move_uci"] for e in book_entries(path, chess.Board())} == {"e2e4", "d2d4"}
+    board = chess.Board()
+    board.push_uci("e2e4")
+    assert book_move(path, board) == chess.Move.from_uci("e7e5")
+    build([(["d2d4"], {chess.WHITE})], path)   # smaller again
+    assert [e["move_uci"] for e in book_entries(path, chess.Board())] == ["d2d4"]
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_ai_move_plays_from_book(tmp_path):
+    _, path = make_book(tmp_path)
+    state = str(tmp_path / "game.json")
+    subprocess.run([sys.executable, f"{SCRIPTS}/engine.py", "new_game", "--color", "white",
+                    "--state", state], capture_output=True)
+    subprocess.run([sys.executable, f"{SCRIPTS}/engine.py", "move", "--move", "d4",
+                    "--state", state], capture_output=True)
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/engine.py", "ai_move", "--state", state,
+                        "--book", path], capture_output=True, text=True)
+    result = json.loads(r.stdout)
+    assert result["move_san"] == "Nf6"
+    assert result["book"] is True
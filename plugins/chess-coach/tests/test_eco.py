@@ -0,0 +1,52 @@
+import os
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import common
+from common import (
+    detect_opening, detect_eco, classify_opening, opening_step,
+    compile_eco_index, read_eco_index, write_eco_index, ECO_INDEX,
+)
+
+
+def test_names_common_lines():
+    assert detect_eco("e4 e5 Nf3 Nc6 Bb5".split())[0] == "C60"
+    assert detect_opening("e4 c5".split()).startswith("Sicilian Defense")
+    assert detect_opening([]) is None
+
+
+def test_transposition_reaches_same_name():
+    direct = detect_eco("d4 d5 c4 e6 Nc3 Nf6".split())
+    transposed = detect_eco("c4 e6 Nc3 d5 d4 Nf6".split())
+    assert direct is not None and direct == transposed
+
+
+def test_leaving_book_keeps_last_name():
+    node, named = classify_opening("e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 a6 h4 h5 a4".split())
+    assert node is None
+    assert named[1] == "Sicilian Defense: Najdorf Variation"
+
+
+def test_incremental_steps_match_full_replay():
+    moves = "e4 e6 d4 d5 Nc3 Bb4 e5 c5 a3 Bxc3+ bxc3 Ne7 Qg4".split()
+    board = chess.Board()
+    last = None
+    for i, san in enumerate(moves):
+        board.push_san(san)
+        node, named = opening_step(board)
+        last = named or last
+        assert (node, last) == classify_opening(moves[:i + 1])
+
+
+def test_bundled_index_matches_tsv():
+    entries, crc = common._read_eco_tsv()
+    assert len(entries) >= 500
+    assert read_eco_index(ECO_INDEX, crc) == compile_eco_index(entries)
+
+
+def test_stale_index_is_rejected(tmp_path):
+    path = str(tmp_path / "eco.idx")
+    write_eco_index({1: -1, 2: 0}, 1234, path)
+    assert read_eco_index(path, 1234) == {1: -1, 2: 0}
+    assert read_eco_index(path, 4321) is None
+    assert read_eco_index(str(tmp_path / "missing.idx"), 1234) is None
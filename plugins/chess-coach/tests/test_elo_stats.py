@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from common import estimate_elo, new_game_stats, add_move_stats
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def engine(*args):
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/engine.py", *args],
+                       capture_output=True, text=True)
+    return json.loads(r.stdout)
+
+
+def test_running_totals_match_full_scan(sample_game_records):
+    records = sample_game_records[0]["move_records"]
+    stats = new_game_stats()
+    for r in records:
+        add_move_stats(stats, r)
+    for color in ("white", "black"):
+        assert estimate_elo(records, color, stats) == estimate_elo(records, color)
+
+
+def test_engine_keeps_stats_and_status_reports_live_elo(tmp_path):
+    state = str(tmp_path / "game.json")
+    engine("new_game", "--color", "white", "--level", "beginner", "--state", state)
+    for move in ["e4", "f3", "Qh5"]:
+        engine("move", "--move", move, "--state", state)
+        engine("ai_move", "--state", state)
+    saved = json.load(open(state))
+    for color in ("white", "black"):
+        assert (estimate_elo(saved["move_records"], color, saved["stats"])
+                == estimate_elo(saved["move_records"], color))
+    status = engine("status", "--state", state)
+    assert status["live_elo"]["white"]["move_count"] == 3
+
+
+def test_state_without_stats_is_rebuilt(tmp_path):
+    state = str(tmp_path / "game.json")
+    engine("new_game", "--state", state)
+    engine("move", "--move", "e4", "--state", state)
+    saved = json.load(open(state))
+    del saved["stats"]
+    json.dump(saved, open(state, "w"))
+    engine("ai_move", "--state", state)
+    saved = json.load(open(state))
+    assert saved["stats"]["white"]["moves"] == 1
+    assert saved["stats"]["black"]["moves"] == 1
@@ -0,0 +1,119 @@
+import os
+import random
+import sys
+
+import chess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from common import evaluate, eval_terms, move_terms, taper, pawn_structure, pawn_terms, pawn_key, \
+    activity_terms, EVAL_SWITCHES, PHASE_MAX, PASSED_MG, PASSED_EG, DOUBLED, ISOLATED, BACKWARD, \
+    PAWN_HASH, pawn_hash_stats
+from searchboard import SearchBoard, encode
+
+
+def _check_every_move(board):
+    search = SearchBoard(board)
+    terms  = eval_terms(search)
+    for move in board.legal_moves:
+        search.push(encode(move))
+        assert move_terms(search, terms) == eval_terms(search), (board.fen(), move.uci())
+        search.pop()
+
+
+def test_move_terms_track_eval_terms():
+    # Castling both ways for both sides, en passant, promotions with and without capture
+    for fen in ("r3k2r/pppppppp/8/8/8/8/PPPPPPPP/R3K2R w KQkq - 0 1",
+                "r3k2r/pppppppp/8/8/8/8/PPPPPPPP/R3K2R b KQkq - 0 1",
+                "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1",
+                "4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1",
+                "1n2k3/P7/8/8/8/8/7p/4K1N1 w - - 0 1",
+                "1n2k3/P7/8/8/8/8/7p/4K1N1 b - - 0 1"):
+        _check_every_move(chess.Board(fen))
+    rng = random.Random(0)
+    for _ in range(10):
+        board  = chess.Board()
+        search = SearchBoard(board)
+        terms  = eval_terms(search)
+        while not board.is_game_over() and len(board.move_stack) < 200:
+            move = rng.choice(list(board.legal_moves))
+            board.push(move)
+            search.push(encode(move))
+            terms = move_terms(search, terms)
+            assert terms == eval_terms(board), board.fen()
+
+
+def test_phase_and_taper():
+    assert eval_terms(chess.Board())[2] == PHASE_MAX
+    assert eval_terms(chess.Board("4k3/pppp4/8/8/8/8/PPPP4/4K3 w - - 0 1"))[2] == 0
+    assert taper(100, 300, PHASE_MAX) == 100 and taper(100, 300, 0) == 300
+    assert taper(100, 300, PHASE_MAX + 4) == 100   # extra queens
+
+
+def test_tables_read_from_each_side():
+    start = evaluate(chess.Board())
+    assert start == 0
+    assert evaluate(chess.Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")) > start
+    assert evaluate(chess.Board("rnbqkbnr/pppp1ppp/8/4p3/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")) < start
+    # Pawn endgame: a central king beats a cornered one, for both colours
+    assert evaluate(chess.Board("7k/pp6/8/8/3K4/8/PP6/8 w - - 0 1")) > 0
+    assert evaluate(chess.Board("8/pp6/8/3k4/8/8/PP6/K7 w - - 0 1")) < 0
+
+
+def _pawns(fen):
+    board = chess.Board(fen)
+    return pawn_structure(board.pieces_mask(chess.PAWN, chess.WHITE),
+                          board.pieces_mask(chess.PAWN, chess.BLACK))
+
+
+def test_pawn_structure_terms():
+    # Lone passer on e6: passed and isolated
+    assert _pawns("4k3/8/4P3/8/8/8/8/4K3 w - - 0 1")[1] == PASSED_EG[5] + ISOLATED[1]
+    # A blocker on an adjacent file ahead stops it being passed; symmetric for Black
+    assert _pawns("4k3/5p2/4P3/8/8/8/8/4K3 w - - 0 1") == (0, 0)
+    assert _pawns("4k3/8/8/8/8/4p3/8/4K3 w - - 0 1")[1] == -(PASSED_EG[5] + ISOLATED[1])
+    # Doubled isolated pawns (both blocked by a pawn on the same file)
+    mg, eg = _pawns("4k3/4p3/8/8/4P3/4P3/8/4K3 w - - 0 1")
+    assert eg == DOUBLED[1] + 2 * ISOLATED[1] - ISOLATED[1]
+    # d3 is backward: c4 has gone past it and d4 is covered by the e5 pawn
+    # (c4 is passed, e5 isolated)
+    mg, _ = _pawns("4k3/8/8/4p3/2P5/3P4/8/4K3 w - - 0 1")
+    assert mg == BACKWARD[0] + PASSED_MG[3] - ISOLATED[0]
+
+
+def test_pawn_hash_caches_by_pawn_key():
+    board = chess.Board("4k3/pp6/8/8/8/8/PP4N1/4K3 w - - 0 1")
+    PAWN_HASH.clear()
+    first = pawn_terms(board, pawn_key(board))
+    hits  = pawn_hash_stats["hits"]
+    board.push_uci("g2f4")   # piece moves keep the pawn key
+    assert pawn_terms(board, pawn_key(board)) == first and pawn_hash_stats["hits"] == hits + 1
+    search = SearchBoard(board)
+    terms  = eval_terms(search)
+    for move in ("a7a5", "b2b4", "a5b4"):
+        board.push_uci(move)
+        search.push(encode(chess.Move.from_uci(move)))
+        terms = move_terms(search, terms)
+        assert terms[3] == pawn_key(board)
+
+
+def test_mobility_and_king_safety():
+    # Same material; White's pieces are developed towards the black king
+    active  = chess.Board("r1b2rk1/ppp2ppp/2n5/3q2NQ/8/3B4/PPP2PPP/R4RK1 w - - 0 1")
+    passive = chess.Board("r1b2rk1/ppp2ppp/2n5/3q4/8/8/PPP2PPP/R1QB1RKN w - - 0 1")
+    assert activity_terms(active)[0] > activity_terms(passive)[0]
+    assert activity_terms(active, mobility=False)[0] > 0   # g5, h5 and d3 hit the king zone
+    assert activity_terms(active, mobility=False, king_safety=False) == (0, 0)
+    mirrored = active.mirror()
+    assert activity_terms(mirrored) == tuple(-v for v in activity_terms(active))
+
+
+def test_eval_switches():
+    board = chess.Board("r1b2rk1/ppp2ppp/2n5/3q2NQ/8/3B4/PPP2PPP/R4RK1 w - - 0 1")
+    full  = evaluate(board)
+    try:
+        for term in EVAL_SWITCHES:
+            EVAL_SWITCHES[term] = False
+        bare = evaluate(board)
+    finally:
+        EVAL_SWITCHES.update(dict.fromkeys(EVAL_SWITCHES, True))
+    assert bare == taper(*eval_terms(board)[:3]) and bare != full
@@ -0,0 +1,70 @@
+import os
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from explorer import connect, index_game, explore
+
+
+def game(moves_san, result, white="tester", black="ai", losses=None):
+    board = chess.Board()
+    uci, records = [], []
+    for i, san in enumerate(moves_san):
+        move = board.parse_san(san)
+        player = "white" if board.turn == chess.WHITE else "black"
+        loss = (losses or {}).get(i, 0)
+        records.append({"move_san": san, "move_uci": move.uci(), "player": player,
+                        "actor": white if player == "white" else black,
+                        "score_before_cp": 0,
+                        "score_after_cp": -loss if player == "white" else loss})
+        uci.append(move.uci())
+        board.push(move)
+    return {"moves_uci": uci, "move_records": records, "result": result,
+            "players": {"white": white, "black": black}}
+
+
+def test_stats_aggregate_per_move(tmp_path):
+    conn = connect(str(tmp_path / "x.db"))
+    index_game(conn, game(["e4", "e5"], "1-0"))
+    index_game(conn, game(["e4", "c5"], "0-1", losses={0: 40}))
+    index_game(conn, game(["d4", "d5"], "1/2-1/2"))
+    moves = {m["move_san"]: m for m in explore(conn, chess.Board(), actor="tester")}
+    assert moves["e4"]["games"] == 2
+    assert (moves["e4"]["wins"], moves["e4"]["losses"]) == (1, 1)
+    assert moves["e4"]["avg_cp_loss"] == 20.0
+    assert moves["d4"]["score"] == 0.5
+
+
+def test_reindexing_same_game_is_noop(tmp_path):
+    conn = connect(str(tmp_path / "x.db"))
+    g = game(["e4", "e5", "Nf3"], "1-0")
+    assert index_game(conn, g) is True
+    assert index_game(conn, g) is False
+    assert explore(conn, chess.Board())[0]["games"] == 1
+
+
+def test_distinct_games_with_the_same_moves_both_count(tmp_path):
+    conn = connect(str(tmp_path / "x.db"))
+    first, second = game(["f3", "e5", "g4", "Qh4#"], "0-1"), game(["f3", "e5", "g4", "Qh4#"], "0-1")
+    assert index_game(conn, {**first, "game_id": "a"}) is True
+    assert index_game(conn, {**second, "game_id": "b"}) is True
+    assert index_game(conn, {**second, "game_id": "b"}) is False
+    assert index_game(conn, first, source="game_1.json") is True   # archive name as identity
+    assert explore(conn, chess.Board())[0]["losses"] == 3
+
+
+def test_games_indexed_by_content_hash_are_not_recounted(tmp_path):
+    conn = connect(str(tmp_path / "x.db"))
+    legacy = game(["e4", "e5"], "1-0")
+    index_game(conn, legacy)   # no identity: content hash, as older indexes stored it
+    assert index_game(conn, legacy, source="game_1.json") is False
+
+
+def test_transposed_positions_share_stats(tmp_path):
+    conn = connect(str(tmp_path / "x.db"))
+    index_game(conn, game(["Nf3", "d5", "d4", "Nf6", "c4"], "1-0"))
+    index_game(conn, game(["d4", "d5", "Nf3", "Nf6", "c4"], "1-0"))
+    board = chess.Board()
+    for san in ["d4", "d5", "Nf3", "Nf6"]:
+        board.push_san(san)
+    moves = explore(conn, board)
+    assert len(moves) == 1 and moves[0]["games"] == 2
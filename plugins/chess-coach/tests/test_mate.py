@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from common import get_best_move, mate_in
+from mate import find_mate, is_mating_move
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+SCHOLAR_MOVES = ["e2e4", "e7e5", "f1c4", "b8c6", "d1h5", "g8f6"]
+
+
+def run(cmd):
+    r = subprocess.run(cmd, capture_output=True, text=True)
+    return json.loads(r.stdout)
+
+
+def scholar_state(tmp_path, level="beginner"):
+    state = str(tmp_path / "game.json")
+    run([sys.executable, f"{SCRIPTS}/engine.py", "new_game", "--level", level, "--state", state])
+    for uci in SCHOLAR_MOVES:
+        run([sys.executable, f"{SCRIPTS}/engine.py", "move", "--state", state, "--move", uci])
+    return state
+
+
+def test_find_mate_in_two_sacrifice():
+    board = chess.Board("r1b2k1r/ppp1bppp/8/1B1Q4/5q2/2P5/PPP2PPP/R3R1K1 w - - 1 0")
+    line = find_mate(board, 3)
+    assert [board.san(line[0])] == ["Qd8+"]
+    assert len(line) == 3
+
+
+def test_checks_only_finds_philidor_mate_in_four():
+    board = chess.Board("r6k/6pp/8/6N1/2Q5/8/5PPP/6K1 w - - 0 1")
+    line = find_mate(board, 4, checks_only=True)
+    assert len(line) == 7
+    b = board.copy()
+    for m in line:
+        b.push(m)
+    assert b.is_checkmate()
+
+
+def test_quiet_mate_needs_full_search():
+    board = chess.Board("k7/8/2K5/8/8/8/8/1R6 w - - 0 1")
+    assert find_mate(board, 2, checks_only=True) is None
+    assert len(find_mate(board, 2)) == 3
+    assert is_mating_move(board, chess.Move.from_uci("c6c7"), 2)
+
+
+def test_search_scores_carry_mate_distance():
+    board = chess.Board("k7/8/2K5/8/8/8/8/1R6 w - - 0 1")
+    move, score = get_best_move(board, depth=3)
+    assert mate_in(score) == 2
+    assert mate_in(-score) == -2
+    assert mate_in(150) is None
+
+
+def test_evaluate_user_flags_missed_mate(tmp_path):
+    state = scholar_state(tmp_path)
+    result = run([sys.executable, f"{SCRIPTS}/coach.py", "evaluate_user",
+                  "--state", state, "--move", "a2a3"])
+    assert result["missed_mate"] == {"mate_in": 1, "line_san": ["Qxf7#"]}
+    assert any("missed mate in 1" in l for l in result["coaching_lines"])
+
+
+def test_ai_move_never_fumbles_mate(tmp_path):
+    state = scholar_state(tmp_path, level="beginner")
+    result = run([sys.executable, f"{SCRIPTS}/engine.py", "ai_move", "--state", state])
+    assert result["move_san"] == "Qxf7#"
+    assert result["is_checkmate"] is True
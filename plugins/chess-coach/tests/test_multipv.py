@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from common import get_top_moves, get_best_move
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def test_top_moves_sorted_best_first_for_side_to_move():
+    board = chess.Board("rnbqkbnr/pppp1ppp/8/8/3pP3/8/PPP2PPP/RNBQKBNR w KQkq - 0 3")
+    lines = get_top_moves(board, depth=2, n=4)
+    assert len(lines) == 4
+    scores = [l["score"] for l in lines]
+    assert scores == sorted(scores, reverse=True)
+
+    board.push_san("Qxd4")
+    lines = get_top_moves(board, depth=2, n=4)
+    scores = [l["score"] for l in lines]
+    assert scores == sorted(scores)
+
+
+def test_top_moves_pv_starts_with_move_and_is_legal():
+    board = chess.Board()
+    for line in get_top_moves(board, depth=2, n=3):
+        assert line["pv"][0] == line["move"]
+        b = board.copy()
+        for m in line["pv"]:
+            assert m in b.legal_moves
+            b.push(m)
+
+
+def test_top_move_score_matches_best_move_score():
+    board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    top = get_top_moves(board, depth=2, n=1)[0]
+    _, best_score = get_best_move(board, depth=2)
+    assert top["score"] == best_score
+
+
+def test_analyze_cli_reports_multipv_lines(tmp_path):
+    state = str(tmp_path / "game.json")
+    subprocess.run([sys.executable, f"{SCRIPTS}/engine.py", "new_game",
+                    "--state", state], capture_output=True)
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/coach.py", "analyze",
+                        "--state", state, "--multipv", "3", "--depth", "2"],
+                       capture_output=True, text=True)
+    result = json.loads(r.stdout)
+    assert result["ok"] is True
+    assert [l["rank"] for l in result["lines"]] == [1, 2, 3]
+    assert all(l["pv_san"][0] == l["move_san"] for l in result["lines"])
+
+
+def test_transposition_table_does_not_change_scores():
+    board = chess.Board("r1bq1rk1/ppp2ppp/2np1n2/2b1p3/2B1P3/2PP1N2/PP3PPP/RNBQ1RK1 w - - 0 7")
+    tt: dict = {}
+    plain  = [(l["move"], l["score"]) for l in get_top_moves(board, 3, 5)]
+    shared = [(l["move"], l["score"]) for l in get_top_moves(board, 3, 5, tt)]
+    assert plain == shared
+    assert tt
+    # Reusing the filled table gives the same answer
+    assert [(l["move"], l["score"]) for l in get_top_moves(board, 3, 5, tt)] == plain
@@ -152,3 +152,31 @@ def test_import_pgn_creates_persona(tmp_path):
     assert persona["id"] == "fischer_test"
     assert persona["source"] == "pgn"
     assert "e4" in persona["opening_moves"]["white"]
+
+
+# ── explore tests ─────────────────────────────────────────────────────────
+
+def test_explore_after_import_pgn(tmp_path):
+    pgn_file = tmp_path / "test.pgn"
+    pgn_file.write_text(SAMPLE_PGN)
+    db = str(tmp_path / "explorer.db")
+    run([sys.executable, f"{SCRIPTS}/persona.py", "import_pgn",
+         "--pgn", str(pgn_file), "--player", "Fischer", "--id", "fischer_test",
+         "--explorer-db", db])
+    result = run([sys.executable, f"{SCRIPTS}/persona.py", "explore",
+                  "--moves", "e4 e5", "--actor", "Fischer", "--db", db])
+    assert result["ok"] is True
+    assert result["moves"][0]["move_san"] == "Nf3"
+    assert result["moves"][0]["wins"] == 1
+
+
+def test_explore_without_index_fails_cleanly(tmp_path):
+    result = run([sys.executable, f"{SCRIPTS}/persona.py", "explore",
+                  "--db", str(tmp_path / "missing.db")])
+    assert result["ok"] is False
+
+
+def test_explore_bad_fen_fails_cleanly(tmp_path):
+    result = run([sys.executable, f"{SCRIPTS}/persona.py", "explore",
+                  "--fen", "not a fen", "--db", str(tmp_path / "missing.db")])
+    assert result["ok"] is False and "Invalid FEN" in result["error"]
@@ -21,7 +21,8 @@ def run_adapter(pgn_text, player, tmp_path):
     out_dir.mkdir()
     result = subprocess.run(
         ["python3", f"{SCRIPTS}/pgn_adapter.py",
-         "--pgn", str(pgn_file), "--player", player, "--output", str(out_dir)],
+         "--pgn", str(pgn_file), "--player", player, "--output", str(out_dir),
+         "--explorer-db", str(tmp_path / "explorer.db")],
         capture_output=True, text=True
     )
     return json.loads(result.stdout), out_dir
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from common import get_best_move
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def run(cmd):
+    r = subprocess.run(cmd, capture_output=True, text=True)
+    return json.loads(r.stdout)
+
+
+def test_get_best_move_with_pv_returns_line_from_best_move():
+    board = chess.Board()
+    move, score, pv = get_best_move(board, depth=3, with_pv=True)
+    assert pv[0] == move
+    assert len(pv) == 3
+    b = board.copy()
+    for m in pv:
+        assert m in b.legal_moves
+        b.push(m)
+
+
+def test_get_best_move_default_still_returns_pair():
+    move, score = get_best_move(chess.Board(), depth=1)
+    assert move is not None
+
+
+def test_ai_move_persists_pv_and_explain_ai_reuses_it(tmp_path):
+    state = str(tmp_path / "game.json")
+    run([sys.executable, f"{SCRIPTS}/engine.py", "new_game", "--color", "black",
+         "--level", "intermediate", "--state", state])
+    run([sys.executable, f"{SCRIPTS}/engine.py", "ai_move", "--state", state])
+
+    record = json.load(open(state))["move_records"][-1]
+    assert record["search_depth"] == 2
+    assert record["pv_san"][0] == record["move_san"]
+    assert len(record["pv_uci"]) == 2
+    assert isinstance(record["search_score_cp"], int)
+    assert isinstance(record["tactics"], list)
+
+    result = run([sys.executable, f"{SCRIPTS}/coach.py", "explain_ai", "--state", state])
+    assert result["expected_line"] == record["pv_san"][1:]
+    assert any("Expected continuation" in l for l in result["coaching_lines"])
+    assert result["tactics"] == record["tactics"]
+    assert any("depth-2 search" in l for l in result["coaching_lines"])
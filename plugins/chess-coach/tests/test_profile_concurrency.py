@@ -0,0 +1,40 @@
+import json
+import os
+import subprocess
+import sys
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+WORKERS = 8
+
+
+def _finished_game(sample_game_records):
+    record = sample_game_records[0]
+    return {"color": "white", "result": record["result"], "players": record["players"],
+            "moves_uci": [r["move_uci"] for r in record["move_records"]],
+            "move_records": record["move_records"]}
+
+
+def test_concurrent_updates_lose_nothing(tmp_path, sample_game_records):
+    state = tmp_path / "game.json"
+    state.write_text(json.dumps(_finished_game(sample_game_records)))
+    profile, games_dir = tmp_path / "profile.json", tmp_path / "games"
+
+    procs = [subprocess.Popen(
+        [sys.executable, f"{SCRIPTS}/profile.py", "--profile", str(profile), "update",
+         "--state", str(state), "--games-dir", str(games_dir),
+         "--explorer-db", str(tmp_path / "explorer.db")],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) for _ in range(WORKERS)]
+    outputs = [json.loads(p.communicate()[0]) for p in procs]
+
+    assert all(o["ok"] for o in outputs)
+    saved = json.loads(profile.read_text())
+    assert saved["games_played"] == WORKERS
+    assert len(saved["elo_history"]) == WORKERS
+    assert sorted(o["games_played"] for o in outputs) == list(range(1, WORKERS + 1))
+
+    archived = sorted(os.listdir(games_dir))
+    assert len(archived) == WORKERS
+    assert all(name.startswith("game_") and name.endswith(".json") for name in archived)
+    for name in archived:
+        json.loads((games_dir / name).read_text())   # no half-written files
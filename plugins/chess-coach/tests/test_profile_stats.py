@@ -0,0 +1,136 @@
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+sys.path.insert(0, SCRIPTS)
+
+# Load by path: a plain `import profile` can resolve to the stdlib module
+_spec = importlib.util.spec_from_file_location("coach_profile", os.path.join(SCRIPTS, "profile.py"))
+coach_profile = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(coach_profile)
+load_history, history_stats = coach_profile.load_history, coach_profile.history_stats
+
+
+def _game(rng, color, result, opening, persona, plies=80):
+    records, score = [], 0
+    for ply in range(plies):
+        player = "white" if ply % 2 == 0 else "black"
+        sign   = 1 if player == "white" else -1
+        loss   = rng.choice([0, 0, 10, 30, 200])
+        after  = score - sign * loss
+        records.append({"player": player, "score_before_cp": score, "score_after_cp": after})
+        score = after
+    return {"color": color, "result": result, "opening": opening, "persona": persona,
+            "move_records": records}
+
+
+def _write_games(games_dir, n, start=0, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(games_dir, exist_ok=True)
+    for i in range(start, start + n):
+        state = _game(rng, rng.choice(["white", "black"]), rng.choice(["1-0", "0-1", "1/2-1/2"]),
+                      rng.choice(["Sicilian Defense", "French Defense"]), rng.choice(["kasparov", "none"]))
+        with open(os.path.join(games_dir, f"g{i:05d}.json"), "w") as f:
+            json.dump(state, f)
+
+
+def _reference_acpl(games_dir):
+    """Plain-Python ACPL over the user's moves of every game."""
+    losses = []
+    for name in sorted(os.listdir(games_dir)):
+        state = json.load(open(os.path.join(games_dir, name)))
+        sign = 1 if state["color"] == "white" else -1
+        losses += [max(0, sign * (r["score_before_cp"] - r["score_after_cp"]))
+                   for r in state["move_records"] if r["player"] == state["color"]]
+    return sum(losses) / len(losses)
+
+
+def test_stats_match_plain_python(tmp_path):
+    games_dir = str(tmp_path / "games")
+    _write_games(games_dir, 30)
+    stats = history_stats(load_history(games_dir, str(tmp_path / "stats.npz")), window=5, last=3)
+    assert stats["games"] == 30
+    assert stats["overall"]["acpl"] == round(_reference_acpl(games_dir), 1)
+    assert 0 <= stats["overall"]["accuracy"] <= 100
+    assert len(stats["recent_games"]) == 3
+    assert sum(p["moves"] for p in stats["phases"].values()) == stats["moves"]
+    assert sum(g["games"] for g in stats["by_color"]) == 30
+    assert {g["key"] for g in stats["by_persona"]} == {"kasparov", "none"}
+
+
+def test_perfect_game_scores_full_accuracy(tmp_path):
+    games_dir = tmp_path / "games"
+    games_dir.mkdir()
+    state = _game(random.Random(1), "white", "1-0", "Italian Game", "none")
+    for r in state["move_records"]:
+        r["score_before_cp"] = r["score_after_cp"] = 30
+    (games_dir / "g.json").write_text(json.dumps(state))
+    stats = history_stats(load_history(str(games_dir), str(tmp_path / "stats.npz")))
+    assert stats["overall"]["acpl"] == 0
+    assert stats["overall"]["accuracy"] == 100
+    assert stats["by_opening"][0] == {"key": "Italian Game", "games": 1, "score": 1.0, "acpl": 0.0}
+
+
+def test_cache_appends_new_games_and_rebuilds_on_delete(tmp_path):
+    games_dir, cache = str(tmp_path / "games"), str(tmp_path / "stats.npz")
+    _write_games(games_dir, 10)
+    load_history(games_dir, cache)
+    _write_games(games_dir, 5, start=10, seed=1)
+    h = load_history(games_dir, cache)
+    assert len(h["name"]) == 15
+    assert history_stats(h)["overall"]["acpl"] == round(_reference_acpl(games_dir), 1)
+
+    os.remove(os.path.join(games_dir, "g00003.json"))
+    h = load_history(games_dir, cache)
+    assert len(h["name"]) == 14
+    assert "g00003.json" not in h["name"].tolist()
+
+
+def test_cached_and_new_games_are_merged_in_archive_order(tmp_path):
+    games_dir = str(tmp_path / "games")
+    _write_games(games_dir, 10, start=5)
+    load_history(games_dir, str(tmp_path / "stats.npz"))
+    _write_games(games_dir, 5, seed=1)   # sort before every cached game
+    merged = load_history(games_dir, str(tmp_path / "stats.npz"))
+    fresh  = load_history(games_dir, str(tmp_path / "fresh.npz"))
+    assert merged["name"].tolist() == sorted(merged["name"].tolist())
+    for k in merged:
+        assert (merged[k] == fresh[k]).all(), k
+    assert history_stats(merged, window=5, last=3) == history_stats(fresh, window=5, last=3)
+
+
+def test_default_cache_is_per_games_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(coach_profile, "STATS_CACHE_DIR", str(tmp_path / "cache"))
+    alice, bob = str(tmp_path / "alice"), str(tmp_path / "bob")
+    _write_games(alice, 3)
+    _write_games(bob, 2, seed=1)
+    assert coach_profile.stats_cache_path(alice) != coach_profile.stats_cache_path(bob)
+    load_history(alice)
+    written = os.stat(coach_profile.stats_cache_path(alice)).st_mtime_ns
+    assert len(load_history(bob)["name"]) == 2
+    assert len(load_history(alice)["name"]) == 3
+    assert os.stat(coach_profile.stats_cache_path(alice)).st_mtime_ns == written   # not rebuilt
+
+
+def test_stats_on_10k_cached_games_is_fast(tmp_path):
+    games_dir, cache = str(tmp_path / "games"), str(tmp_path / "stats.npz")
+    rng = random.Random(2)
+    os.makedirs(games_dir)
+    for i in range(10_000):
+        state = _game(rng, "white", "1-0", "Sicilian Defense", "none", plies=60)
+        with open(os.path.join(games_dir, f"g{i:05d}.json"), "w") as f:
+            json.dump(state, f)
+    load_history(games_dir, cache)   # first run parses the JSON and fills the cache
+
+    start = time.perf_counter()
+    stats = history_stats(load_history(games_dir, cache))
+    assert time.perf_counter() - start < 1.0
+    assert stats["games"] == 10_000
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import profile_store
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def profile_cli(tmp_path, *args):
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/profile.py",
+                        "--profile", str(tmp_path / "profile.json"),
+                        "--store", str(tmp_path / "profiles.db"), *args],
+                       capture_output=True, text=True)
+    return json.loads(r.stdout)
+
+
+def _finished_game(tmp_path, sample_game_records):
+    record = sample_game_records[0]
+    path = tmp_path / "game.json"
+    path.write_text(json.dumps({
+        "color": "white", "result": record["result"], "players": record["players"],
+        "moves_uci": [r["move_uci"] for r in record["move_records"]],
+        "move_records": record["move_records"]}))
+    return str(path)
+
+
+def test_store_roundtrip_and_bulk_load(tmp_path):
+    conn = profile_store.connect(str(tmp_path / "profiles.db"))
+    assert profile_store.load(conn, "alice") is None
+    with profile_store.transaction(conn):
+        profile_store.save(conn, "alice", {"nickname": "Al", "games_played": 2,
+                                           "elo_history": [900, 1000], "elo_current": 966,
+                                           "level": "intermediate", "last_updated": None})
+        profile_store.save(conn, "bob", {"games_played": 0, "elo_history": []})
+    assert profile_store.load(conn, "alice")["elo_history"] == [900, 1000]
+    found = profile_store.load_many(conn, ["alice", "bob", "carol"])
+    assert set(found) == {"alice", "bob"}
+    assert found["bob"]["level"] == "intermediate"
+
+
+def test_users_are_kept_apart(tmp_path, sample_game_records):
+    state = _finished_game(tmp_path, sample_game_records)
+    profile_cli(tmp_path, "--user", "alice", "set_nickname", "--name", "Al")
+    for user in ("alice", "alice", "bob"):
+        out = profile_cli(tmp_path, "--user", user, "update", "--state", state,
+                          "--games-dir", str(tmp_path / "games" / user),
+                          "--explorer-db", str(tmp_path / "explorer.db"))
+        assert out["ok"]
+
+    alice = profile_cli(tmp_path, "--user", "alice", "load")["profile"]
+    assert alice["nickname"] == "Al"
+    assert alice["games_played"] == 2
+    assert profile_cli(tmp_path, "--user", "bob", "load")["profile"]["games_played"] == 1
+    assert len(os.listdir(tmp_path / "games" / "alice")) == 2
+    assert not (tmp_path / "profile.json").exists()   # the single-player file is untouched
+
+
+def test_bulk_recommend(tmp_path, sample_game_records):
+    state = _finished_game(tmp_path, sample_game_records)
+    profile_cli(tmp_path, "--user", "alice", "update", "--state", state,
+                "--games-dir", str(tmp_path / "games"),
+                "--explorer-db", str(tmp_path / "explorer.db"))
+    out = profile_cli(tmp_path, "recommend", "--users", "alice,nobody")
+    assert out["players"]["alice"]["games_played"] == 1
+    assert out["players"]["nobody"]["recommended_level"] == "intermediate"
+    assert out["players"]["nobody"]["games_played"] == 0
@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import review
+from common import evaluate
+from review import analyze_game, apply_analysis, generate_review, review_archive
+
+
+def make_state(moves_san):
+    board, records, uci = chess.Board(), [], []
+    for san in moves_san:
+        move   = board.parse_san(san)
+        player = "white" if board.turn == chess.WHITE else "black"
+        before = evaluate(board)
+        board.push(move)
+        records.append({"move_san": san, "move_uci": move.uci(), "player": player,
+                        "actor": "ai", "score_before_cp": before,
+                        "score_after_cp": evaluate(board), "winrate_white": 0.5,
+                        "coaching": None})
+        uci.append(move.uci())
+    return {"moves_uci": uci, "moves_san": list(moves_san), "move_records": records,
+            "color": "white", "result": None, "move_count": len(uci)}
+
+
+# 4...Qh4?? walks into Nxh4 (static scores barely move: the queen is not yet lost)
+HANGING = ["e4", "e5", "Nf3", "Nc6", "Bc4", "Qh4", "Nxh4"]
+
+
+def test_parallel_analysis_matches_serial():
+    state = make_state(HANGING)
+    assert analyze_game(state, 2, workers=1) == analyze_game(state, 2, workers=2)
+
+
+def test_analysis_flags_blunder_with_best_alternative():
+    state    = make_state(HANGING)
+    records  = apply_analysis(state, analyze_game(state, 2))
+    qh4      = records[5]
+    loss     = qh4["score_after_cp"] - qh4["score_before_cp"]   # Black moved
+    assert loss >= 500
+    assert qh4["best_move_san"] not in (None, "Qh4")
+    assert len(records) == len(HANGING)
+
+
+def test_review_shows_best_column(tmp_path):
+    state = make_state(HANGING)
+    out   = str(tmp_path / "review.md")
+    generate_review(state, out, analyze_game(state, 2))
+    text  = open(out, encoding="utf-8").read()
+    assert "| Best |" in text
+    assert "Best was" in text
+
+
+def write_archive(tmp_path, n=3):
+    games = tmp_path / "games"
+    games.mkdir()
+    for i in range(n):
+        (games / f"game_{i}.json").write_text(json.dumps(make_state(HANGING[:3 + i])))
+    return str(games), str(tmp_path / "reviews")
+
+
+def test_batch_skips_up_to_date_reviews(tmp_path):
+    games, out = write_archive(tmp_path)
+    first = review_archive(games, out)
+    assert (first["reviewed"], first["skipped"]) == (3, 0)
+    assert sorted(os.listdir(out)) == ["game_0.md", "game_1.md", "game_2.md"]
+
+    again = review_archive(games, out)
+    assert (again["reviewed"], again["skipped"]) == (0, 3)
+
+    # Editing one game only redoes that review
+    with open(os.path.join(games, "game_1.json"), "a") as f:
+        f.write("\n")
+    assert review_archive(games, out)["reviewed"] == 1
+
+
+def test_batch_redoes_everything_after_engine_change(tmp_path, monkeypatch):
+    games, out = write_archive(tmp_path)
+    review_archive(games, out)
+    monkeypatch.setattr(review, "engine_version", lambda: "changed")
+    assert review_archive(games, out)["reviewed"] == 3
+
+
+def test_engine_version_covers_search_sources_and_bitbases(tmp_path, monkeypatch):
+    assert {"searchboard.py", "bitbase.py", "mate.py"} <= set(review.ENGINE_SOURCES)
+    monkeypatch.setattr(review.bitbase, "USER_DIR", str(tmp_path))
+    before = review.engine_version()
+    (tmp_path / "kpk.bb").write_bytes(b"regenerated")
+    assert review.engine_version() != before
+
+
+def test_batch_parallel_reports_failures(tmp_path):
+    games, out = write_archive(tmp_path)
+    with open(os.path.join(games, "broken.json"), "w") as f:
+        f.write("{not json")
+    result = review_archive(games, out, workers=2)
+    assert (result["reviewed"], result["failed"]) == (3, 1)
+    assert result["errors"][0]["file"] == "broken.json"
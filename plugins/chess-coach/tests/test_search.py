@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+
+import chess
+import chess.polyglot
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from common import search_root, search_key, eval_terms, move_terms, mate_in, MATE_SCORE, SearchControl
+from searchboard import SearchBoard, encode
+
+
+def test_search_key_is_the_polyglot_key():
+    rng = random.Random(5)
+    for _ in range(10):
+        board  = chess.Board()
+        search = SearchBoard(board)
+        terms  = eval_terms(search)
+        while not board.is_game_over() and len(board.move_stack) < 120:
+            assert search_key(search, terms) == chess.polyglot.zobrist_hash(board)
+            move = rng.choice(list(board.legal_moves))
+            board.push(move)
+            search.push(encode(move))
+            terms = move_terms(search, terms)
+
+
+def _scores(board, depth, *moves):
+    lines = search_root(board, depth, [chess.Move.from_uci(m) for m in moves])
+    return [score for _, score, _ in lines]
+
+
+def test_mate_and_stalemate_from_the_move_loop():
+    board = chess.Board("k7/8/1K6/8/8/8/8/2Q5 w - - 0 1")
+    mate, stalemate = _scores(board, 2, "c1c8", "c1c7")
+    assert mate_in(mate) == 1 and stalemate == 0
+    # A mate at the horizon is still seen (the leaf checks for moves when in check)
+    assert _scores(board, 1, "c1c8") == [MATE_SCORE - 1]
+
+
+def test_repetition_and_fifty_move_draws():
+    # White is a queen up; Black's Kg8 repeats the position after Kg1
+    board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3Q2K1 w - - 0 1")
+    for uci in ("g1h1", "g8h8", "h1g1"):
+        board.push_uci(uci)
+    repeat, other = _scores(board, 1, "h8g8", "h7h6")
+    assert repeat == 0 and other > 500
+
+    board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3Q2K1 b - - 99 80")
+    assert _scores(board, 1, "g8h8") == [0]
+
+
+def test_null_window_multipv_matches_full_search():
+    for fen in ("r1bq1rk1/ppp2ppp/2np1n2/2b1p3/2B1P3/2PP1N2/PP3PPP/RNBQ1RK1 w - - 0 7",
+                "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 4 4"):
+        board = chess.Board(fen)
+        white = board.turn == chess.WHITE
+        full_ctl = SearchControl()
+        full = sorted(search_root(board, 3, ctl=full_ctl), key=lambda l: l[1], reverse=white)
+        for n in (1, 3):
+            ctl = SearchControl()
+            top = sorted(search_root(board, 3, ctl=ctl, n=n), key=lambda l: l[1], reverse=white)
+            assert [s for _, s, _ in top[:n]] == [s for _, s, _ in full[:n]]
+            assert len(top) == board.legal_moves.count()
+            assert ctl.nodes < full_ctl.nodes
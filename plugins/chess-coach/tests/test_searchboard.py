@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+
+import chess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from searchboard import SearchBoard, encode, decode, perft
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+
+def test_perft_counts():
+    # Standard perft positions: castling, en passant, promotions, pins and checks
+    for fen, depth, nodes in ((chess.STARTING_FEN, 3, 8902),
+                              (KIWIPETE, 2, 2039),
+                              ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 3, 2812),
+                              ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3, 9467),
+                              ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 2, 1486)):
+        assert perft(SearchBoard(chess.Board(fen)), depth) == nodes, fen
+
+
+def _state(board):
+    return (board.pieces[:], board.mailbox[:], board.occupied_co[:], board.occupied, board.turn,
+            board.castling_rights, board.ep_square, board.halfmove_clock)
+
+
+def test_moves_and_state_follow_python_chess():
+    rng = random.Random(7)
+    for _ in range(10):
+        board  = chess.Board()
+        search = SearchBoard(board)
+        while not board.is_game_over() and len(board.move_stack) < 150:
+            assert sorted(search.legal_moves()) == sorted(encode(m) for m in board.legal_moves), board.fen()
+            assert search.is_check() == board.is_check()
+            before = _state(search)
+            for move in search.pseudo_legal_moves():
+                search.push(move)
+                search.pop()
+                assert _state(search) == before
+            move = rng.choice(list(board.legal_moves))
+            assert decode(encode(move)) == move
+            board.push(move)
+            search.push(encode(move))
+            assert (search.occupied_co[chess.WHITE], search.occupied_co[chess.BLACK], search.pawns,
+                    search.kings, search.castling_rights, search.ep_square, search.halfmove_clock) == \
+                   (board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.pawns,
+                    board.kings, board.clean_castling_rights(), board.ep_square, board.halfmove_clock)
@@ -0,0 +1,129 @@
+import base64
+import http.client
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+
+import pytest
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+@pytest.fixture
+def server(tmp_path):
+    proc = subprocess.Popen([sys.executable, f"{SCRIPTS}/server.py", "--port", "0",
+                             "--workers", "1", "--spill-dir", str(tmp_path)],
+                            stdout=subprocess.PIPE, text=True)
+    port = json.loads(proc.stdout.readline())["port"]
+    yield port
+    proc.terminate()
+    proc.wait()
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.request(method, path, json.dumps(body) if body is not None else None)
+    resp = conn.getresponse()
+    data = json.loads(resp.read())
+    conn.close()
+    return resp.status, data
+
+
+def ws_connect(port, path):
+    sock = socket.create_connection(("127.0.0.1", port), timeout=60)
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n"
+                 f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                 f"Sec-WebSocket-Version: 13\r\n\r\n".encode())
+    handshake = b""
+    while not handshake.endswith(b"\r\n\r\n"):
+        handshake += sock.recv(1)
+    assert handshake.startswith(b"HTTP/1.1 101")
+    return sock
+
+
+def ws_send(sock, message):
+    payload, mask = json.dumps(message).encode(), os.urandom(4)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    sock.sendall(struct.pack("!BB", 0x81, 0x80 | len(payload)) + mask + masked)
+
+
+def ws_recv(sock):
+    def exactly(n):
+        data = b""
+        while len(data) < n:
+            data += sock.recv(n - len(data))
+        return data
+    _, n = exactly(2)
+    if n == 126:
+        n = struct.unpack("!H", exactly(2))[0]
+    return json.loads(exactly(n))
+
+
+def test_http_game_flow(server):
+    status, game = request(server, "POST", "/games", {"color": "white", "level": "beginner"})
+    assert status == 200 and game["ok"]
+    path = f"/games/{game['game_id']}"
+
+    _, ev = request(server, "POST", f"{path}/evaluate_user", {"move": "e2e4"})
+    assert ev["ok"] and ev["move_san"] == "e4"
+    _, mv = request(server, "POST", f"{path}/move", {"move": "e4"})
+    assert mv["ok"]
+    _, ai = request(server, "POST", f"{path}/ai_move", {})
+    assert ai["ok"] and ai["turn"] == "white"
+    _, st = request(server, "GET", path)
+    assert st["move_count"] == 2
+    _, rv = request(server, "GET", f"{path}/review?depth=1")
+    assert rv["ok"] and "Game Review" in rv["markdown"]
+
+    assert request(server, "GET", "/nowhere")[0] == 404
+    assert request(server, "GET", f"{path}/move")[0] == 405
+    assert request(server, "GET", "/games/unknown")[1]["error"] == "Unknown game: unknown"
+
+
+def test_websocket_streams_moves(server):
+    _, game = request(server, "POST", "/games", {"color": "black", "level": "beginner"})
+    sock = ws_connect(server, f"/games/{game['game_id']}/ws")
+
+    request(server, "POST", f"/games/{game['game_id']}/ai_move", {})
+    event = ws_recv(sock)
+    assert event["event"] == "move" and event["command"] == "ai_move"
+    assert "fen" in event and "score_cp" in event
+
+    ws_send(sock, {"command": "legal"})
+    result = ws_recv(sock)
+    assert result["event"] == "result" and result["legal_moves"]
+    sock.close()
+
+
+def test_body_fields_and_review_depth_are_checked(server):
+    status, game = request(server, "POST", "/games", {"color": "white", "book": "/etc/passwd"})
+    assert status == 400 and "book" in game["error"]
+    _, game = request(server, "POST", "/games", {"color": "white", "level": "beginner"})
+    path = f"/games/{game['game_id']}"
+    for body in ({"persona": "fischer", "bundled_persona_dir": "/tmp"}, {"search": "x"}):
+        status, result = request(server, "POST", f"{path}/ai_move", body)
+        assert status == 400 and not result["ok"]
+    assert request(server, "GET", f"{path}/review?depth=50")[0] == 400
+
+    sock = ws_connect(server, f"{path}/ws")
+    ws_send(sock, {"command": "move", "move": "e4", "book": "x"})
+    result = ws_recv(sock)
+    assert result["event"] == "result" and "book" in result["error"]
+    sock.close()
+
+
+def test_body_values_are_checked(server):
+    for body in ({"color": "purple"}, {"level": "godlike"}, {"color": ["x"]}, {"mode": 3}):
+        status, result = request(server, "POST", "/games", body)
+        assert status == 400 and not result["ok"], body
+    _, game = request(server, "POST", "/games", {"color": "white", "level": "beginner"})
+    path = f"/games/{game['game_id']}"
+    for body in ({"persona": "../../some/dir/x"}, {"persona": ["tal"]}):
+        assert request(server, "POST", f"{path}/ai_move", body)[0] == 400
+    assert request(server, "POST", f"{path}/move", {"move": {"uci": "e2e4"}})[0] == 400
+    status, result = request(server, "POST", f"{path}/move", {"move": "e2e4"})
+    assert status == 200 and result["ok"]
@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from sessions import SessionManager, FairPool
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def test_games_spill_and_reload(tmp_path):
+    with SessionManager(str(tmp_path), max_hot=1, workers=0) as mgr:
+        mgr.run("a", "new_game", color="white", level="beginner")
+        mgr.run("b", "new_game", color="black", level="beginner")
+        assert mgr.stats()["hot"] == 1
+        assert mgr.run("a", "move", move="e4")["ok"]        # reloaded from disk
+        assert mgr.run("b", "move", move="d4")["ok"]
+        assert mgr.run("a", "move", move="e5")["moves_san"] == ["e4", "e5"]
+        assert mgr.stats()["reloaded"] >= 2
+        assert not mgr.run("a", "move", move="Ke8")["ok"]    # illegal: state unchanged
+        assert mgr.run("a", "status")["moves_san"] == ["e4", "e5"]
+        assert mgr.run("missing", "status")["error"] == "Unknown game: missing"
+        assert not mgr.run("../x", "status")["ok"]
+        assert "search" in mgr.run("a", "ai_move", search=print)["error"]   # only COMMAND_DEFAULTS keys
+        assert mgr.run("a", "status")["moves_san"] == ["e4", "e5"]
+
+    # Spill files are ordinary engine.py state files
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/engine.py", "status",
+                        "--state", str(tmp_path / "a.json")], capture_output=True, text=True)
+    assert json.loads(r.stdout)["moves_san"] == ["e4", "e5"]
+
+
+def test_ai_move_searches_in_pool(tmp_path):
+    with SessionManager(str(tmp_path), workers=1) as mgr:
+        mgr.run("g", "new_game", color="black", level="intermediate")
+        out = mgr.run("g", "ai_move")
+        assert out["ok"]
+        assert out["pv_san"][0] == out["move_san"]
+        out = mgr.run("g", "ai_move", persona="tal")
+        assert out["persona_used"] == "tal"
+        out = mgr.run("g", "ai_move", persona="../personas/tal")   # ids are names, never paths
+        assert out["ok"] and out["persona_used"] is None
+
+
+def test_concurrent_games_are_independent(tmp_path):
+    with SessionManager(str(tmp_path), max_hot=2, workers=1) as mgr:
+        def play(game_id):
+            mgr.run(game_id, "new_game", color="white", level="beginner")
+            for move in ("e4", "Nf3", "Bc4"):
+                assert mgr.run(game_id, "move", move=move)["ok"]
+                assert mgr.run(game_id, "ai_move")["ok"]
+
+        threads = [threading.Thread(target=play, args=(f"g{i}",)) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for i in range(5):
+            assert mgr.run(f"g{i}", "status")["move_count"] == 6
+
+
+def test_fair_pool_round_robin():
+    pool = FairPool(1)
+    started = {}
+
+    def run(key, label, fn=time.monotonic, *args):
+        started[label] = pool.run(key, fn, *args)
+
+    busy = threading.Thread(target=run, args=("a", "busy", time.sleep, 0.5))
+    busy.start()
+    time.sleep(0.2)   # busy holds the only worker
+    threads = []
+    for key, label in [("a", "a1"), ("a", "a2"), ("b", "b1")]:
+        threads.append(threading.Thread(target=run, args=(key, label)))
+        threads[-1].start()
+        while pool.waiting() < len(threads):   # queue in a known order
+            time.sleep(0.01)
+    for t in [busy, *threads]:
+        t.join()
+    pool.shutdown()
+    # b1 is not queued behind all of a's searches
+    assert started["a1"] < started["b1"] < started["a2"]
@@ -0,0 +1,53 @@
+import os
+import sys
+import chess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from tactics import detect_motifs, see
+
+
+def motifs_of(fen, kind):
+    return [m for m in detect_motifs(chess.Board(fen)) if m["motif"] == kind]
+
+
+def test_see_undefended_and_defended_captures():
+    board = chess.Board("4k3/8/8/3n4/8/8/8/3QK3 w - - 0 1")
+    assert see(board, chess.D1, chess.D5) == 320
+    board = chess.Board("4k3/8/4p3/3n4/8/8/8/3QK3 w - - 0 1")
+    assert see(board, chess.D1, chess.D5) == 320 - 900
+
+
+def test_hanging_piece():
+    found = motifs_of("4k3/8/8/3n4/8/8/8/3QK3 w - - 0 1", "hanging")
+    assert [(m["side"], m["squares"]) for m in found] == [("white", ["d5"])]
+
+
+def test_knight_fork_on_king_and_rook():
+    found = motifs_of("r3k3/2N5/8/8/8/8/8/4K3 b - - 0 1", "fork")
+    assert found[0]["side"] == "white"
+    assert found[0]["squares"] == ["c7", "a8", "e8"]
+
+
+def test_absolute_pin():
+    found = motifs_of("4k3/8/2n5/1B6/8/8/8/4K3 w - - 0 1", "pin")
+    assert found[0]["squares"] == ["b5", "c6", "e8"]
+    assert "absolute" in found[0]["text"]
+
+
+def test_skewer_through_king():
+    found = motifs_of("r7/8/8/8/k7/8/8/R3K3 b - - 0 1", "skewer")
+    assert found[0]["squares"] == ["a1", "a4", "a8"]
+
+
+def test_discovered_attack():
+    found = motifs_of("6k1/4q3/8/8/4N3/8/8/4R1K1 w - - 0 1", "discovered")
+    assert any(m["side"] == "white" and m["squares"] == ["e4", "e1", "e7"] for m in found)
+
+
+def test_overloaded_defender():
+    found = motifs_of("6k1/4q3/8/2b1n3/N7/8/8/4R1K1 w - - 0 1", "overloaded")
+    assert found[0]["side"] == "white"
+    assert found[0]["squares"][0] == "e7"
+
+
+def test_start_position_is_quiet():
+    assert detect_motifs(chess.Board()) == []
@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+
+import chess
+import chess.pgn
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import common
+from common import evaluate, weights_snapshot
+from tournament import elo_table, sprt_llr, sprt_bounds, resolve_player, play_game, ADJUDICATE_CP
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def test_resolve_players():
+    assert resolve_player("beginner")["depth"] == 1
+    tal = resolve_player("tal@1")
+    assert tal["depth"] == 1 and tal["aggression"] > 0.5
+    assert resolve_player("uci:stockfish")["engine"] == "stockfish"
+    assert resolve_player("uci:/opt/sf/stockfish@12")["engine"] == "/opt/sf/stockfish"
+    assert resolve_player("advanced@2/-mobility/+pawns")["switches"] == {"mobility": False,
+                                                                         "pawns": True}
+    with pytest.raises(ValueError):
+        resolve_player("advanced/-nothing")
+    with pytest.raises(ValueError):
+        resolve_player("nobody")
+
+
+def test_elo_table_orders_by_strength():
+    games = ([{"white": "a", "black": "b", "result": "1-0"}] * 6
+             + [{"white": "b", "black": "c", "result": "1-0"}] * 6
+             + [{"white": "a", "black": "c", "result": "1/2-1/2"}] * 2)
+    table = elo_table(["c", "b", "a"], games)
+    assert [row["player"] for row in table] == ["a", "b", "c"]
+    assert abs(sum(row["elo"] for row in table)) <= 1
+    assert table[0]["wins"] == 6 and table[0]["draws"] == 2
+
+
+def test_sprt_decides_clear_results():
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert sprt_llr(40, 20, 5, 0, 20) > upper
+    assert sprt_llr(5, 20, 40, 0, 20) < lower
+    assert lower < sprt_llr(10, 10, 10, 0, 20) < upper
+
+
+def test_play_game_is_reproducible():
+    player = resolve_player("beginner")
+    first  = play_game(player, player, ["e2e4", "e7e5"], 16, seed=7)
+    second = play_game(player, player, ["e2e4", "e7e5"], 16, seed=7)
+    assert first == second
+    assert first["moves_uci"][:2] == ["e2e4", "e7e5"] and len(first["moves_uci"]) <= 16
+
+
+def test_weighted_game_adjudicates_with_builtin_tables():
+    # Both players value a pawn at 30 queens: adjudicating on their tables
+    # would turn any pawn up into a win
+    heavy = {**weights_snapshot(), "id": "heavy"}
+    heavy["piece_values"]["pawn"] = heavy["piece_values_eg"]["pawn"] = 30000
+    player = {**resolve_player("beginner@1"), "weights": heavy}
+    game   = play_game(player, player, ["e2e4", "d7d5", "e4d5", "g8f6"], 5, seed=3)
+    assert game["termination"] == "adjudication"
+    assert common.weights_id == "builtin" and common.PIECE_VALUES[chess.PAWN] == 100
+    board = chess.Board()
+    for uci in game["moves_uci"]:
+        board.push_uci(uci)
+    score = evaluate(board)
+    assert game["result"] == ("1-0" if score >= ADJUDICATE_CP else "0-1" if score <= -ADJUDICATE_CP
+                              else "1/2-1/2")
+
+
+def test_round_robin_cli_writes_pgn(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/tournament.py", "round_robin",
+                        "--players", "beginner,tal@1", "--rounds", "1", "--max-plies", "12",
+                        "--workers", "1", "--pgn", str(pgn)],
+                       capture_output=True, text=True)
+    out = json.loads(r.stdout)
+    assert out["ok"] and out["games"] == 2
+    assert {row["player"] for row in out["table"]} == {"beginner", "tal@1"}
+    with open(pgn) as f:
+        headers = [chess.pgn.read_headers(f) for _ in range(2)]
+    assert {h["White"] for h in headers} == {"beginner", "tal@1"}
+
+
+def test_sprt_cli_stops_at_max_games():
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/tournament.py", "sprt",
+                        "--a", "beginner", "--b", "beginner@1", "--max-games", "2",
+                        "--max-plies", "10", "--workers", "1"],
+                       capture_output=True, text=True)
+    out = json.loads(r.stdout)
+    assert out["games"] == 2 and out["verdict"] == "inconclusive"
+    assert out["wins"] + out["draws"] + out["losses"] == 2
+
+
+def test_sprt_cli_odd_max_games():
+    r = subprocess.run([sys.executable, f"{SCRIPTS}/tournament.py", "sprt",
+                        "--a", "beginner@1", "--b", "beginner@1", "--max-games", "3",
+                        "--max-plies", "10", "--workers", "1"],
+                       capture_output=True, text=True)
+    out = json.loads(r.stdout)
+    assert out["games"] == 3 and out["wins"] + out["draws"] + out["losses"] == 3
@@ -0,0 +1,117 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import chess
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+sys.path.insert(0, SCRIPTS)
+import common
+from common import evaluate, weights_snapshot, apply_weights, load_weights, extra_terms, pawn_key, \
+    PIECE_VALUES, PHASE_MAX
+from tune import features, weights_vector, vector_weights, game_positions, _pack, fit_k, \
+    fit_weights, mse
+
+
+def _random_games(count, seed=0):
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        board = chess.Board()
+        while not board.is_game_over() and len(board.move_stack) < 60:
+            board.push(rng.choice(list(board.legal_moves)))
+        games.append(list(board.move_stack))
+    return games
+
+
+def test_linear_model_matches_evaluate():
+    w = weights_vector(weights_snapshot())
+    for moves in _random_games(5):
+        board = chess.Board()
+        for move in moves:
+            board.push(move)
+            if board.is_game_over() or chess.popcount(board.occupied) <= 4:
+                continue
+            idx, sign, phase, fixed = features(board)
+            extra_mg, extra_eg = extra_terms(board, pawn_key(board))
+            mg = sum(w[i] * s for i, s in zip(idx, sign)) + extra_mg
+            eg = sum(w[i + len(w) // 2] * s for i, s in zip(idx, sign)) + extra_eg
+            p  = round(phase * PHASE_MAX)
+            assert int((mg * p + eg * (PHASE_MAX - p)) / PHASE_MAX) == evaluate(board)
+            assert fixed == pytest.approx((extra_mg * p + extra_eg * (PHASE_MAX - p)) / PHASE_MAX)
+
+
+def test_vector_round_trip_keeps_every_reachable_weight():
+    w = weights_vector(weights_snapshot())
+    back = weights_vector(vector_weights(w))
+    reachable = np.ones_like(w, dtype=bool)
+    for start in (0, len(w) // 2):   # middlegame, endgame block
+        reachable[start:start + 8] = reachable[start + 56:start + 64] = False   # pawns on the back ranks
+    assert np.allclose(back[reachable], w[reachable])
+
+
+def test_fit_recovers_material_signal():
+    # Results decided by a hidden "true" knight value far above the built-in one
+    rng = random.Random(1)
+    positions = []
+    for moves in _random_games(40, seed=2):
+        for idx, sign, phase, fixed, _ in game_positions(moves, 0.5, skip_plies=4):
+            knights = sum(s for i, s in zip(idx, sign) if 64 <= i < 128)
+            positions.append((idx, sign, phase, fixed, 1.0 if knights > 0 else 0.0 if knights < 0
+                              else rng.choice([0.0, 0.5, 1.0])))
+    data = _pack(positions)
+    w0 = weights_vector(weights_snapshot())
+    k  = fit_k(w0, data)
+    w  = fit_weights(w0, data, k, epochs=200, lr=2.0, l2=0.0)
+    assert mse(w, data, k) < mse(w0, data, k)
+    assert vector_weights(w)["piece_values"]["knight"] > PIECE_VALUES[chess.KNIGHT]
+
+
+def test_weights_file_versioning(tmp_path):
+    bad = tmp_path / "old.json"
+    bad.write_text(json.dumps({**weights_snapshot(), "version": 0}))
+    with pytest.raises(ValueError):
+        load_weights(str(bad))
+
+    tuned = weights_snapshot()
+    tuned["piece_values"]["knight"] = 350
+    tuned["id"] = "test"
+    try:
+        apply_weights(tuned)
+        assert PIECE_VALUES[chess.KNIGHT] == 350 and common.weights_id == "test"
+    finally:
+        apply_weights(None)
+    assert PIECE_VALUES[chess.KNIGHT] == 320 and common.weights_id == "builtin"
+
+
+def test_extract_fit_install_cli(tmp_path):
+    games = tmp_path / "games" / "users" / "alice"
+    games.mkdir(parents=True)
+    for i, moves in enumerate(_random_games(6, seed=3)):
+        (games / f"g{i}.json").write_text(json.dumps(
+            {"moves_uci": [m.uci() for m in moves], "result": ["1-0", "0-1", "1/2-1/2"][i % 3]}))
+    env = {**os.environ, "HOME": str(tmp_path)}
+
+    def run(*argv):
+        r = subprocess.run([sys.executable, f"{SCRIPTS}/tune.py", *argv],
+                           capture_output=True, text=True, env=env)
+        return json.loads(r.stdout)
+
+    positions = str(tmp_path / "pos.npz")
+    out = run("extract", "--games-dir", str(tmp_path / "games"), "--output", positions)
+    assert out["ok"] and out["games"] == 6 and out["positions"] > 0
+    fit = run("fit", "--positions", positions, "--output", str(tmp_path / "w.json"),
+              "--epochs", "20")
+    assert fit["ok"] and fit["train_error"]["after"] <= fit["train_error"]["before"]
+    assert run("install", "--weights", fit["output"])["id"] == fit["id"]
+
+    r = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {SCRIPTS!r}); "
+                        "import common; print(common.weights_id)"],
+                       capture_output=True, text=True, env=env)
+    assert r.stdout.strip() == fit["id"]
+    run("install", "--reset")
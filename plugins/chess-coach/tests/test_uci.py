@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import time
+
+import chess
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+class Uci:
+    def __init__(self):
+        self.proc = subprocess.Popen([sys.executable, f"{SCRIPTS}/uci.py"], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, text=True, bufsize=1)
+
+    def send(self, line):
+        self.proc.stdin.write(line + "\n")
+        self.proc.stdin.flush()
+
+    def until(self, prefix):
+        lines = []
+        while True:
+            line = self.proc.stdout.readline().strip()
+            lines.append(line)
+            if line.startswith(prefix):
+                return lines
+
+    def close(self):
+        self.send("quit")
+        self.proc.wait(timeout=30)
+
+
+def test_handshake_lists_personas():
+    uci = Uci()
+    uci.send("uci")
+    lines = uci.until("uciok")
+    assert "id name chess-coach" in lines
+    persona = next(l for l in lines if l.startswith("option name Persona"))
+    assert "var tal" in persona and "var none" in persona
+    uci.send("isready")
+    assert uci.until("readyok")
+    uci.close()
+
+
+def test_go_depth_and_info():
+    uci = Uci()
+    uci.send("position startpos moves e2e4 e7e5")
+    uci.send("go depth 2")
+    lines = uci.until("bestmove")
+    infos = [l.split() for l in lines if l.startswith("info depth")]
+    assert [int(i[2]) for i in infos] == [1, 2]
+    assert "nps" in infos[-1] and "pv" in infos[-1]
+    board = chess.Board()
+    board.push_uci("e2e4")
+    board.push_uci("e7e5")
+    assert chess.Move.from_uci(lines[-1].split()[1]) in board.legal_moves
+    uci.close()
+
+
+def test_mate_score_from_side_to_move():
+    uci = Uci()
+    uci.send("position fen r5k1/8/8/8/8/8/5PPP/6K1 b - - 0 1")   # Black mates with Ra1
+    uci.send("go depth 3")
+    lines = uci.until("bestmove")
+    assert "score mate 1" in [l for l in lines if l.startswith("info depth")][-1]
+    assert lines[-1].startswith("bestmove a8a1")
+    uci.close()
+
+
+def test_bad_position_keeps_the_previous_one():
+    uci = Uci()
+    uci.send("position fen r5k1/8/8/8/8/8/5PPP/6K1 b - - 0 1")
+    uci.send("position fen not/a/fen")
+    uci.send("position startpos moves e2e5")
+    uci.send("isready")
+    lines = uci.until("readyok")
+    assert sum(l.startswith("info string bad position") for l in lines) == 2
+    uci.send("go depth 3")
+    assert uci.until("bestmove")[-1].startswith("bestmove a8a1")
+    uci.close()
+
+
+def test_nodes_and_movetime_limits():
+    uci = Uci()
+    uci.send("position startpos")
+    uci.send("go nodes 500")
+    lines = uci.until("bestmove")
+    nodes = [int(l.split()[l.split().index("nodes") + 1]) for l in lines if l.startswith("info")]
+    assert all(n <= 500 for n in nodes)
+    assert lines[-1].split()[1] != "0000"
+
+    uci.send("ucinewgame")
+    uci.send("position startpos moves d2d4")
+    start = time.perf_counter()
+    uci.send("go movetime 300")
+    uci.until("bestmove")
+    assert time.perf_counter() - start < 1.5
+    uci.close()
+
+
+def test_infinite_waits_for_stop():
+    uci = Uci()
+    uci.send("setoption name Persona value petrosian")
+    uci.send("position startpos")
+    uci.send("go infinite")
+    uci.send("isready")
+    assert not any(l.startswith("bestmove") for l in uci.until("readyok"))   # waits for stop
+    uci.send("stop")
+    assert uci.until("bestmove")[-1].startswith("bestmove")
+    uci.close()